@@ -0,0 +1,164 @@
+"""
+Crawl state shared by the scrapers, stored in SQLite.
+
+For every source (e.g. "justjoinit") it keeps the last listing page that was completely processed, and for every
+fetched url the offer id, the validators sent by the server (ETag / Last-Modified) and a fingerprint of the listing
+entry the offer came from. With it a rerun only fetches new or changed offers - unchanged listing entries are
+skipped and other known urls are requested conditionally (304 Not Modified) - and an interrupted crawl resumes after
+the last page it finished.
+
+Record an offer only after it was stored in the database, so an interrupted crawl never skips an offer it lost.
+
+How to use the class:
+
+    state = CrawlState('sourced_data/crawl_state.sqlite')
+    page = state.last_page('theprotocol') + 1
+    response = requests.get(url, headers=state.conditional_headers(url))
+    if response.status_code != 304:
+        ...                                         # parse and store the offer
+        state.record(url, 'theprotocol', offer_id, etag=response.headers.get('ETag'),
+                     last_modified=response.headers.get('Last-Modified'))
+    state.set_last_page('theprotocol', page)
+    state.finish('theprotocol')                     # crawl complete, the next run starts at the first page again
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS crawl_resources (
+        url TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        offer_id TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        fingerprint TEXT,
+        fetched_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_crawl_resources_source ON crawl_resources (source, offer_id)",
+    """CREATE TABLE IF NOT EXISTS crawl_progress (
+        source TEXT PRIMARY KEY,
+        last_page INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        finished_at REAL
+    )""",
+)
+
+
+class CrawledResource(NamedTuple):
+    url: str
+    source: str
+    offer_id: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fingerprint: Optional[str] = None
+    fetched_at: Optional[float] = None
+
+
+def fingerprint(entry: Any) -> str:
+    """
+    Hash of a JSON serialisable listing entry, changes whenever any of its values does
+    """
+    return hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CrawlState:
+    """ Seen urls with their validators and crawl progress per source """
+
+    def __init__(self, path: str):
+        """
+        :param path: SQLite file, created with its tables when missing
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def get(self, url: str) -> Optional[CrawledResource]:
+        """ What is known about the url, None if it wasn't fetched yet """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT url, source, offer_id, etag, last_modified, fingerprint, fetched_at "
+                "FROM crawl_resources WHERE url = ?", (url,)).fetchone()
+        return CrawledResource(*row) if row else None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """ If-None-Match / If-Modified-Since headers for a url fetched before, empty otherwise """
+        resource = self.get(url)
+        headers = {}
+        if resource is not None and resource.etag:
+            headers['If-None-Match'] = resource.etag
+        if resource is not None and resource.last_modified:
+            headers['If-Modified-Since'] = resource.last_modified
+        return headers
+
+    def record(self, url: str, source: str, offer_id: Any = None, etag: Optional[str] = None,
+               last_modified: Optional[str] = None, fingerprint: Optional[str] = None) -> None:
+        """
+        Mark the url as fetched and stored
+
+        :param url: fetched url
+        :param source: crawled site, e.g. "justjoinit"
+        :param offer_id: id of the job offer stored from it
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        :param fingerprint: fingerprint() of the listing entry the url came from
+        """
+        self.record_many([CrawledResource(url, source, offer_id, etag, last_modified, fingerprint)])
+
+    def record_many(self, resources: Iterable[CrawledResource]) -> None:
+        """ Mark many urls as fetched and stored, in one transaction """
+        now = time.time()
+        rows = [(url, source, None if offer_id is None else str(offer_id), etag, last_modified, fingerprint,
+                 fetched_at or now)
+                for url, source, offer_id, etag, last_modified, fingerprint, fetched_at in resources]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO crawl_resources "
+                "(url, source, offer_id, etag, last_modified, fingerprint, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def seen_ids(self, source: str) -> Set[str]:
+        """ Ids of the offers stored from the source """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT offer_id FROM crawl_resources WHERE source = ? AND offer_id IS NOT NULL", (source,))
+            return {offer_id for offer_id, in rows}
+
+    def last_page(self, source: str) -> int:
+        """ Last listing page completely processed by the current crawl of the source, 0 if there is none """
+        with self.lock:
+            row = self.connection.execute("SELECT last_page FROM crawl_progress WHERE source = ?",
+                                          (source,)).fetchone()
+        return row[0] if row else 0
+
+    def set_last_page(self, source: str, page: int) -> None:
+        """ Mark the listing page as completely processed """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO crawl_progress (source, last_page, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET last_page = excluded.last_page, updated_at = excluded.updated_at",
+                (source, page, time.time()),
+            )
+
+    def finish(self, source: str) -> None:
+        """ Mark the crawl of the source as complete, the next one starts at the first page """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO crawl_progress (source, last_page, updated_at, finished_at) VALUES (?, 0, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET last_page = 0, updated_at = excluded.updated_at, "
+                "finished_at = excluded.finished_at",
+                (source, now, now),
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
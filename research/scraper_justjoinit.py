@@ -1,19 +1,215 @@
-import requests
-import json
+import asyncio
+import random
 import re
 import os
 import logging
-from template import data
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from crawl_state import CrawledResource, CrawlState, fingerprint
 from sourced_data.document_db import JobOffersDB
 
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
-logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 
 # Configuration variables
 scrapped_offers = 10000
 output_file_path = os.path.join('sourced_data/','document_db.json')
+crawl_state_path = os.path.join('sourced_data/','crawl_state.sqlite')
+source = 'justjoinit'
+base_url = "https://justjoin.it/api/offers"
+concurrency = 20            # offer detail requests in flight at once
+requests_per_second = 20    # per host
+max_retries = 5
+retry_backoff = 0.5         # seconds before the first retry, doubled for every next one
+request_timeout = 30
+batch_size = 500            # offers inserted into the database at once
+
+# Matches HTML tags in the offer descriptions
+html_tags = re.compile('<.*?>')
+
+# Responses worth trying again, anything else is a final answer
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+class Fetched(NamedTuple):
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class RateLimiter:
+    """
+    Spaces out requests to the same host, at most `rate` requests per second per host
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot: Dict[str, float] = {}
+
+    async def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def fetch_json(session: aiohttp.ClientSession, url: str, limiter: RateLimiter,
+                     headers: Optional[Dict[str, str]] = None, retries: int = max_retries,
+                     backoff: float = retry_backoff) -> Optional[Fetched]:
+    """
+    GET the url and decode the JSON response, retrying connection errors, timeouts and 429/5xx responses with
+    exponential backoff (or the server's Retry-After)
+
+    :param headers: request headers, e.g. CrawlState.conditional_headers()
+    :return: the decoded response with its validators, None if the server answered 304 Not Modified
+    :raises aiohttp.ClientError: when the request still fails after all retries
+    """
+    for attempt in range(retries + 1):
+        await limiter.wait(url)
+        delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                if response.status not in retry_statuses:
+                    response.raise_for_status() # Raises an exception for 4xx or 5xx status codes
+                    return Fetched(await response.json(content_type=None), response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+                if attempt == retries:
+                    response.raise_for_status()
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = float(retry_after)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        logger.debug(f"Retrying {url} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+async def fetch_description(session: aiohttp.ClientSession, offer_url: str, item: Dict, limiter: RateLimiter,
+                            headers: Optional[Dict[str, str]] = None) -> Optional[Fetched]:
+    """
+    Add the cleaned up description from the offer detail page to the offer. When the page didn't change since it was
+    fetched (304) the offer is left without description, so the stored one is kept
+
+    :return: the offer with the validators of the detail page, None when it couldn't be fetched or has no description
+    """
+    headers = headers or {}
+    try:
+        fetched = await fetch_json(session, offer_url, limiter, headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Skipping {offer_url}: {e!r}")
+        return None
+    except ValueError as e:
+        # the body isn't JSON, e.g. an HTML error page served with 200
+        logger.warning(f"Skipping {offer_url}, invalid JSON: {e!r}")
+        return None
+    if fetched is None:
+        return Fetched(item, headers.get('If-None-Match'), headers.get('If-Modified-Since'))
+    try:
+        # Remove all HTML tags from the description
+        item["description"] = html_tags.sub('', fetched.data["body"])
+    except (KeyError, TypeError) as e:
+        logger.warning(f"Skipping {offer_url}, no description: {e!r}")
+        return None
+    return Fetched(item, fetched.etag, fetched.last_modified)
+
+
+async def scrape(db: JobOffersDB, url: str = base_url, limit: int = scrapped_offers, workers: int = concurrency,
+                 rate: float = requests_per_second, batch: int = batch_size,
+                 state: Optional[CrawlState] = None) -> int:
+    """
+    Scrape job offers from the API into the database. Offer details are fetched by `workers` concurrent tasks
+    sharing one connection pool, offers are inserted `batch` at a time (an offer already in the database is updated)
+
+    With a crawl state only new or changed offers are fetched: offers whose listing entry is the same as when they
+    were stored are skipped, known detail pages are requested conditionally. Offers are recorded in the state once
+    they are in the database, so an interrupted crawl resumes with the offers it didn't store yet. The listing itself
+    is only recorded (and requested conditionally next time) when every offer on it is stored, i.e. no detail page
+    failed, no database write failed and no offer was left out by `limit`
+
+    :param db: database the offers are inserted into
+    :param url: offers API, e.g. a local stub server in tests
+    :param limit: maximum number of offers scraped
+    :param state: crawl state of earlier runs, None to scrape everything
+    :return: number of offers inserted or updated
+    """
+    limiter = RateLimiter(rate)
+    loop = asyncio.get_running_loop()
+    timeout = aiohttp.ClientTimeout(total=request_timeout)
+    connector = aiohttp.TCPConnector(limit=workers)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        # Get raw data from the API
+        listing = await fetch_json(session, url, limiter, state.conditional_headers(url) if state else None)
+        if listing is None:
+            logger.debug(f"No changes in {url} since the last crawl")
+            return 0
+        raw_data = listing.data[:limit]
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in raw_data:
+            offer_url = f"{url}/{item['id']}"
+            known = state.get(offer_url) if state else None
+            if known is not None and known.fingerprint == fingerprint(item):
+                continue
+            headers = state.conditional_headers(offer_url) if state else {}
+            queue.put_nowait((offer_url, dict(item), headers, fingerprint(item)))
+        total = queue.qsize()
+
+        scraped: List[Dict] = []
+        crawled: List[CrawledResource] = []
+        inserted = 0
+        # listed offers that are not in the database after this run
+        incomplete = len(listing.data) - len(raw_data)
+
+        async def insert(offers: List[Dict], resources: List[CrawledResource]) -> None:
+            nonlocal inserted, incomplete
+            # the database write runs in a thread, so fetching goes on meanwhile
+            ids = await loop.run_in_executor(None, lambda: db.insert_multiple_job_offers(offers, upsert=True))
+            if len(ids) < len(offers):
+                incomplete += len(offers) - len(ids)
+                logger.error(f"Stored {len(ids)} of {len(offers)} job offers, the rest is fetched again next run")
+            # ids come in the order of the offers, only the stored ones are marked as done
+            if state:
+                state.record_many(resources[:len(ids)])
+            inserted += len(ids)
+            logger.debug(f"Scraped {inserted}/{total} job offers.")
+
+        async def worker() -> None:
+            nonlocal incomplete
+            while True:
+                try:
+                    offer_url, item, headers, item_fingerprint = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                fetched = await fetch_description(session, offer_url, item, limiter, headers)
+                if fetched is None:
+                    incomplete += 1
+                else:
+                    scraped.append(fetched.data)
+                    crawled.append(CrawledResource(offer_url, source, item['id'], fetched.etag,
+                                                   fetched.last_modified, item_fingerprint))
+                if len(scraped) >= batch:
+                    offers, resources = scraped[:], crawled[:]
+                    scraped.clear()
+                    crawled.clear()
+                    await insert(offers, resources)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        if scraped:
+            await insert(scraped, crawled)
+        if state and not incomplete:
+            # the listing is only recorded once all its offers are stored
+            state.record(url, source, etag=listing.etag, last_modified=listing.last_modified)
+    return inserted
+
 
 def main():
     """
@@ -21,53 +217,26 @@ def main():
     To use, execute the script.
     """
     db = JobOffersDB(output_file_path)
+    state = CrawlState(crawl_state_path)
 
     try:
-        # Get raw data from the API
-        url = "https://justjoin.it/api/offers"
-        response = requests.get(url)
-        raw_data = response.json()[:scrapped_offers]
-
-        # Extract appropriate information from the raw data based on the structure stored in the template.py file and store it in the list of dictionaries
-        data = [{k: item[k] for k in item} for item in raw_data]
-        
-
-        i=0
-        # Get the offer descriptions by making additional requests to the API and clean up the HTML tags
-        for item in data:
-            offer_url = f"https://justjoin.it/api/offers/{item['id']}"
-            offer_response = requests.get(offer_url)
-            offer_response.raise_for_status() # Raises an exception for 4xx or 5xx status codes
-            offer_raw_data = offer_response.json()
-       
-            # Extract the job offer description from the fetched data
-            description = offer_raw_data["body"]
-            
-            # Remove all HTML tags from the description
-            pattern = re.compile('<.*?>')
-            result = re.sub(pattern, '', description)
-
-            # Add the cleaned description as a new key-value pair to "data"
-            item["description"] = result
-
-            # Inserts the job offer into the database
-            db.insert_job_offer(item) 
-
-             # Logs the number of job offers added
-            i=i+1
-            logging.debug("Scraped " + str(i) + "/" + str(scrapped_offers) + " job offers.")
+        started = time.monotonic()
+        inserted = asyncio.run(scrape(db, state=state))
 
         # Log success
-        logging.debug("* "*50)
-        logging.debug("Web scraper completed successfully.")
-        logging.debug(f"Obtained {len(data)} of job offers from {url}")
-        logging.debug(f"Output saved to {output_file_path}")
-        logging.debug("* "*50)
+        logger.debug("* "*50)
+        logger.debug("Web scraper completed successfully.")
+        logger.debug(f"Obtained {inserted} of job offers from {base_url} in {time.monotonic() - started:.0f}s")
+        logger.debug(f"Output saved to {output_file_path}")
+        logger.debug("* "*50)
 
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         # Handle the exception
         print("Exception request")
         print(e)
+    finally:
+        db.close()
+        state.close()
 
 
 if __name__ == "__main__":
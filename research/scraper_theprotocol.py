@@ -1,116 +1,259 @@
 import requests
-import json
 import os
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+from crawl_state import CrawledResource, CrawlState
 from sourced_data.document_db import JobOffersDB
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml parses several times faster than the built-in parser, use it when it is installed
+try:
+    import lxml  # noqa: F401
+    parser_backend = 'lxml'
+except ImportError:
+    parser_backend = 'html.parser'
 
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
-logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
 
 #Defining the output file path and base URL
 output_file_path = os.path.join('sourced_data/','document_db_protocol.json')
+crawl_state_path = os.path.join('sourced_data/','crawl_state.sqlite')
+source = 'theprotocol'
 base_url = 'https://theprotocol.it/'
 url = base_url + '?pageNumber={}'
 
-#Initializing an empty list for job listings and a page counter
-jobs = []
-page_num = 1
-
-db = JobOffersDB(output_file_path)
-while True:
-    print('Scraping page', page_num)
-    response = requests.get(url.format(page_num))
-    soup = BeautifulSoup(response.text, 'html.parser')
-    job_listings = soup.find_all('a', {'href': lambda x: x and '/szczegoly/' in x})
-    for job in job_listings:
-        job_url = base_url + job['href']
-        job_response = requests.get(job_url)
-        job_soup = BeautifulSoup(job_response.text, 'html.parser')
-        
-        
-        # Extract the job title
-        try:
-            # Extract the job title
-            title = job_soup.find('h1', class_='rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc titleClass_ttiz6zs').text.strip()
-        except:
-            # Title could not be extracted, continue to the next job listing
-            continue
-   
-        # Extract the company name
-        company_name = job_soup.find('h2', {'class': 'rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc', 'data-test':'text-offerEmployer'}).text
-
-        # Extract the street address
-        street = job_soup.find('div', {'data-test': 'text-workplaceAddress'}).text.strip()
-        
-        
-        # Extract the level
-        levels = ["trainee", "assistant", "junior", "mid", "senior", "expert", "lead", "manager", "head"]
-        for line in job_soup.find_all("div", {"class": "section_s1x3ch8k GridElement_g16c3y1q"}):
-            if any(title in line.text.lower() for title in levels):
-                level=(line.text.strip())
-        
-        operating=[]
-        # Extract the operating mode
-        operating_mode = ["praca zdalna", "praca hybrydowa", "praca stacjonarna"]
-        for line in job_soup.find_all("div", {"class": "rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc"}):
-            if any(title in line.text.lower() for title in operating_mode):
-                operating=line.text.strip()
-        
-        
-        # Extract the employment types
-        employment_types = [x.find('p', {'class': 'Contract_cxuwut9'}).text.strip() for x in job_soup.find_all('div', {'data-test': 'section-contract'})]
-        
-        
-        # Extract the salary and units
-        job_list = []
-        containers = job_soup.find_all('div', {'class': 'Container_cx7p4xk'})
-        for container in containers:
-            salary_elem = container.find('p', {'class': 'SalaryInfo_s6hpd6f'})
-            salary = salary_elem.text if salary_elem else 'No salary information available'
-            
-            contract_elem = container.find('p', {'class': 'Contract_cxuwut9', 'data-test': 'text-contractName'})
-            contract = contract_elem.text if contract_elem else 'No contract information available'
-            
-            units_elem = container.find('p', {'class': 'Units_u1ewriig', 'data-test': 'text-contractUnits'})
-            units = units_elem.text if units_elem else 'No contract units information available'
-            
-            job = {'salary': salary, 'contract': contract, 'units': units}
-            job_list.append(job)
-
-        
-        # Extract the skills
-        required_skills = []
-        skills_container = job_soup.find('div', class_='Container_cv2t83c')
-        if skills_container:
-            required_skills = [skill.text.strip() for skill in skills_container.find_all('span', class_='Label_l1fs6hs4')]
-       
-       
-        # Extract the job description
-        Description = job_soup.find('div', {'class': 'offerSection_oi4q9r7', 'id': 'TECHNOLOGY_AND_POSITION'}).text
-
-
-       
-        # Add the job listing to the jobs list
-        job_dict = {
-            'title': title,
-            'street': street,
-            'company_name': company_name,
-            'workplace_type': operating,
-            'experience_level': level,
-            'employment_types': employment_types,
-            'salary': job_list,
-            'url': job_url,
-            'skills': required_skills,
-            'description': Description
-        }
-        jobs.append(job_dict)
-        
-    
-    page_num += 1
-
-    # Save data to output file  
-    with open(output_file_path, "w") as f:
-        json.dump(jobs, f)
+#Number of pages downloaded at once, and of processes parsing them (one per core by default)
+fetch_workers = 16
+parse_workers = None
+request_timeout = 30
+
+#Responses worth downloading again in the next run, any other error means the offer is gone
+retry_statuses = {429, 500, 502, 503, 504}
+
+#Classes and attributes of the parsed elements, matched while walking each page once
+title_class = 'rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc titleClass_ttiz6zs'
+company_class = 'rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc'
+level_class = 'section_s1x3ch8k GridElement_g16c3y1q'
+operating_class = 'rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc'
+salary_container_class = 'Container_cx7p4xk'
+skills_container_class = 'Container_cv2t83c'
+description_class = 'offerSection_oi4q9r7'
+levels = ("trainee", "assistant", "junior", "mid", "senior", "expert", "lead", "manager", "head")
+operating_modes = ("praca zdalna", "praca hybrydowa", "praca stacjonarna")
+parsed_tags = SoupStrainer(['h1', 'h2', 'div'])
+job_links = SoupStrainer('a', href=lambda x: x and '/szczegoly/' in x)
+
+
+def _text(tag, name: str, attrs: Dict, default: str) -> str:
+    found = tag.find(name, attrs)
+    return found.text if found else default
+
+
+def parse_offer(html: str, job_url: str) -> Optional[Dict]:
+    """
+    Extract a job offer from its page, in a single walk over the page's h1, h2 and div elements. Runs in the parsing
+    processes, so it takes and returns plain data
+
+    :param html: offer page
+    :param job_url: url of the offer page, used as the offer id
+    :return: job offer dict, None if the page has no title
+    """
+    soup = BeautifulSoup(html, parser_backend, parse_only=parsed_tags)
+    title = company_name = street = level = description = None
+    operating = []
+    employment_types = []
+    job_list = []
+    required_skills = None
+
+    for element in soup.find_all(['h1', 'h2', 'div']):
+        classes = ' '.join(element.get('class', ()))
+        data_test = element.get('data-test')
+        if element.name == 'h1':
+            if title is None and classes == title_class:
+                title = element.text.strip()
+        elif element.name == 'h2':
+            if company_name is None and classes == company_class and data_test == 'text-offerEmployer':
+                company_name = element.text
+        elif data_test == 'text-workplaceAddress':
+            if street is None:
+                street = element.text.strip()
+        elif data_test == 'section-contract':
+            contract = element.find('p', {'class': 'Contract_cxuwut9'})
+            if contract:
+                employment_types.append(contract.text.strip())
+        elif classes == level_class:
+            # Extract the level
+            text = element.text
+            if any(name in text.lower() for name in levels):
+                level = text.strip()
+        elif classes == operating_class:
+            # Extract the operating mode
+            text = element.text
+            if any(mode in text.lower() for mode in operating_modes):
+                operating = text.strip()
+        elif salary_container_class in element.get('class', ()):
+            # Extract the salary and units
+            job_list.append({
+                'salary': _text(element, 'p', {'class': 'SalaryInfo_s6hpd6f'}, 'No salary information available'),
+                'contract': _text(element, 'p', {'class': 'Contract_cxuwut9', 'data-test': 'text-contractName'},
+                                  'No contract information available'),
+                'units': _text(element, 'p', {'class': 'Units_u1ewriig', 'data-test': 'text-contractUnits'},
+                               'No contract units information available'),
+            })
+        elif required_skills is None and skills_container_class in element.get('class', ()):
+            # Extract the skills
+            required_skills = [skill.text.strip() for skill in element.find_all('span', class_='Label_l1fs6hs4')]
+        elif description is None and element.get('id') == 'TECHNOLOGY_AND_POSITION' \
+                and description_class in element.get('class', ()):
+            description = element.text
+
+    if title is None:
+        # Title could not be extracted, skip the job listing
+        return None
+
+    return {
+        'id': job_url,
+        'title': title,
+        'street': street,
+        'company_name': company_name,
+        'workplace_type': operating,
+        'experience_level': level,
+        'employment_types': employment_types,
+        'salary': job_list,
+        'url': job_url,
+        'skills': required_skills or [],
+        'description': description
+    }
+
+
+def fetch_page(session: requests.Session, page_url: str) -> List[str]:
+    """
+    Download a listing page and return the urls of its job offers
+    """
+    response = session.get(page_url, timeout=request_timeout)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, parser_backend, parse_only=job_links)
+    return [urljoin(page_url, job['href']) for job in soup.find_all('a')]
+
+
+def fetch_offer(session: requests.Session, job_url: str,
+                headers: Dict[str, str]) -> Tuple[str, Optional[requests.Response]]:
+    """
+    Download an offer page, the response is None when the download failed
+    """
+    try:
+        return job_url, session.get(job_url, headers=headers, timeout=request_timeout)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Skipping {job_url}: {e!r}")
+        return job_url, None
+
+
+def scrape(db: JobOffersDB, state: CrawlState, page_url: str = url, fetch_workers: int = fetch_workers,
+           parse_workers: Optional[int] = parse_workers) -> int:
+    """
+    Scrape job offers page by page into the database, resuming after the last page the previous crawl finished.
+
+    Downloading is I/O bound and runs in `fetch_workers` threads sharing one connection pool, parsing is CPU bound
+    and runs in `parse_workers` processes. A page is parsed as soon as it is downloaded, and the next listing page
+    is downloaded while the offers of the current one are processed
+
+    A page counts as done only when none of its offers failed to download (connection error or retry_statuses). The crawl
+    goes on after a failed page, but the next run resumes at it
+
+    :param db: database the offers are inserted into, once per listing page
+    :param state: crawl state, offers scraped before are only downloaded again when they changed
+    :param page_url: listing page url with a {} for the page number, e.g. a local stub server in tests
+    :return: number of offers inserted or updated
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=fetch_workers, pool_maxsize=fetch_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    inserted = 0
+    complete = True
+    page_num = state.last_page(source) + 1
+    with ThreadPoolExecutor(fetch_workers) as fetcher, ProcessPoolExecutor(parse_workers) as parser:
+        listing = fetcher.submit(fetch_page, session, page_url.format(page_num))
+        while True:
+            logger.info(f"Scraping page {page_num}")
+            job_urls = listing.result()
+            if not job_urls:
+                # Past the last page, the next run starts at the first page again unless a page failed
+                if complete:
+                    state.finish(source)
+                break
+            listing = fetcher.submit(fetch_page, session, page_url.format(page_num + 1))
+
+            # Offers scraped before are only downloaded again when they changed
+            downloads = [fetcher.submit(fetch_offer, session, job_url, state.conditional_headers(job_url))
+                         for job_url in job_urls]
+            positions = {download: position for position, download in enumerate(downloads)}
+            parsing = {}
+            failed = 0
+            for download in as_completed(downloads):
+                job_url, response = download.result()
+                if response is None or response.status_code in retry_statuses:
+                    failed += 1
+                    continue
+                if response.status_code == 304:
+                    continue
+                if not response.ok:
+                    logger.warning(f"Skipping {job_url}: {response.status_code} {response.reason}")
+                    continue
+                parsing[positions[download]] = (job_url, response.headers,
+                                                parser.submit(parse_offer, response.text, job_url))
+
+            #Job listings of this page and the urls they were scraped from
+            jobs = []
+            crawled = []
+            for position in sorted(parsing):
+                job_url, headers, parsed = parsing[position]
+                job_dict = parsed.result()
+                if job_dict is None:
+                    continue
+                jobs.append(job_dict)
+                crawled.append(CrawledResource(job_url, source, job_url, headers.get('ETag'),
+                                               headers.get('Last-Modified')))
+
+            # Save the page to the database in one write, then mark it as done
+            ids = db.insert_multiple_job_offers(jobs, upsert=True)
+            # ids come in the order of the jobs, only the stored ones are marked as done
+            state.record_many(crawled[:len(ids)])
+            inserted += len(ids)
+            if len(ids) < len(jobs):
+                logger.error(f"Stored {len(ids)} of {len(jobs)} job offers of page {page_num}, "
+                             f"the next run resumes at this page")
+                break
+            if failed:
+                logger.warning(f"{failed} job offers of page {page_num} failed to download, "
+                               f"the next run resumes at this page")
+                complete = False
+            if complete:
+                state.set_last_page(source, page_num)
+            page_num += 1
+    return inserted
+
+
+def main():
+    """
+    Web scraper made to work with theprotocol.it. Scrapes job offers into the database in a specified location.
+    To use, execute the script.
+    """
+    db = JobOffersDB(output_file_path)
+    state = CrawlState(crawl_state_path)
+    try:
+        inserted = scrape(db, state)
+        logger.debug(f"Obtained {inserted} of job offers from {base_url}")
+    finally:
+        db.close()
+        state.close()
+
+
+if __name__ == "__main__":
+    main()
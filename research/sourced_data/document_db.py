@@ -8,6 +8,24 @@ How to use the class:
     1. Create an instance of the class by passing the path to the database file as an argument.
     2. Use the methods of the class to insert, update, delete and search for job offers in the database.
 
+By default every write rewrites the whole JSON file. Pass buffered=True to keep the database in memory and write it
+out (atomically, via a temporary file) every flush_every writes, flush_interval seconds after the first unwritten
+change, on flush() and on close(). Writes made directly through .db bypass the class lock and the indexes.
+
+The class keeps in-memory indexes of the stored offers (e.g. job offer id -> document ids) and the stored offers
+themselves, built when the database is opened and updated by every write made through the class, so lookups don't
+scan all documents and reads don't parse the JSON file again.
+
+DataFrames returned for all offers (get_all_job_offers and the flat, columnar get_job_offers_snapshot) are cached
+until the next write and shared by all callers, so they must not be changed in place: take a .copy() before adding
+columns or assigning values. save_snapshot() stores the columnar snapshot as Parquet next to the database file,
+load_snapshot() reads it back without parsing the database. Parquet needs pyarrow or fastparquet; without them no
+snapshot is saved (a warning is logged) and load_snapshot() returns None.
+
+For databases too big to be kept in memory, SQLiteJobOffersDB has the same methods but stores the offers in SQLite,
+with indexes on id, title, experience level, skills and salary bounds. migrate_to_sqlite() copies an existing JSON
+file into a new SQLite database once, open_job_offers_db() picks the backend from the file extension.
+
 Example:
 
     from document_db import JobOffersDB
@@ -15,22 +33,333 @@ Example:
     job_offers_db = JobOffersDB('job_offers_db.json')
     # insert a job offer into the database
     job_offers_db.insert_job_offer(job_offer)
+
+    # analytics: columnar snapshot, read from Parquet while it is up to date
+    job_offers_db.save_snapshot()
+    offers = load_snapshot('job_offers_db.json')
+    if offers is None:
+        offers = JobOffersDB('job_offers_db.json').get_job_offers_snapshot()
+
+    # scraper / analytics session writing the file at most every 1000 writes or 10 seconds
+    job_offers_db = JobOffersDB('job_offers_db.json', buffered=True, flush_every=1000, flush_interval=10.0)
+    ...
+    job_offers_db.close()
+
+    # move to SQLite, then open it the same way
+    migrate_to_sqlite('job_offers_db.json', 'job_offers_db.sqlite')
+    job_offers_db = open_job_offers_db('job_offers_db.sqlite')
 """
 
+import bisect
+import functools
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
 from tinydb import TinyDB, Query
-from typing import List, Dict, Mapping, cast
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import Storage
+from tinydb.table import Document
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Mapping, Optional, Set, Tuple, cast
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+
+class AtomicJSONStorage(Storage):
+    """
+    TinyDB JSON storage replacing the file atomically: data is written to a temporary file in the same directory,
+    which is then renamed over the database file, so a crash never leaves a half-written database
+    """
+
+    def __init__(self, path: str, encoding: Optional[str] = None, **kwargs: Any):
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+        if not os.path.exists(path):
+            open(path, 'a', encoding=encoding).close()
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with open(self.path, encoding=self.encoding) as file:
+            content = file.read()
+        return json.loads(content) if content.strip() else None
+
+    def write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding=self.encoding) as file:
+                json.dump(data, file, **self.kwargs)
+                file.flush()
+                os.fsync(file.fileno())
+            # mkstemp creates the file readable by the owner only, keep the permissions of the database file
+            if os.path.exists(self.path):
+                os.chmod(temporary_path, stat.S_IMODE(os.stat(self.path).st_mode))
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+
+class BufferedStorage(CachingMiddleware):
+    """
+    TinyDB middleware keeping the database in memory. It is written out every flush_every writes,
+    flush_interval seconds after the first unwritten change, and on flush() and close()
+    """
+
+    def __init__(self, storage_cls=AtomicJSONStorage, flush_every: int = 100, flush_interval: Optional[float] = 5.0,
+                 lock: Optional[threading.RLock] = None):
+        """
+        :param storage_cls: storage the data is written to
+        :param flush_every: number of writes kept in memory before the data is written out
+        :param flush_interval: seconds after the first unwritten change the data is written out, None to disable
+        :param lock: lock held while writing out, it must also be held while the database is modified
+        """
+        super().__init__(storage_cls)
+        self.WRITE_CACHE_SIZE = flush_every
+        self.flush_interval = flush_interval
+        self.lock = lock or threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+
+    def write(self, data: Dict[str, Dict[str, Any]]) -> None:
+        with self.lock:
+            super().write(data)
+            if self._cache_modified_count and self.flush_interval and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            super().flush()
+
+
+def synchronized(method):
+    """
+    Run the method holding the database lock, so the indexes stay consistent and buffered data isn't written out
+    while it is modified
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def snapshot_path(db_path: str) -> str:
+    """
+    Path of the Parquet snapshot kept next to the database file, e.g. document_db.parquet for document_db.json
+    """
+    return os.path.splitext(db_path)[0] + '.parquet'
+
+
+def flatten_job_offers(documents: Iterable[Tuple[int, Mapping]]) -> pd.DataFrame:
+    """
+    Turn job offers into a flat table, one row per offer indexed by document id: plain fields as they are, the
+    level of each skill in a skill_<name> column, the salary of each employment type in salary_from_<type>,
+    salary_to_<type> and salary_currency_<type> columns, other nested fields as JSON text
+
+    :param documents: (document id, job offer) pairs
+    :return: df of the flattened job offers
+    """
+    rows = []
+    for doc_id, job_offer in documents:
+        row: Dict[str, Any] = {'doc_id': doc_id}
+        for key, value in job_offer.items():
+            if key == 'skills' and isinstance(value, list):
+                for skill in value:
+                    if isinstance(skill, Mapping):
+                        row[f"skill_{skill.get('name')}"] = skill.get('level')
+            elif key == 'employment_types' and isinstance(value, list):
+                for employment_type in value:
+                    salary = employment_type.get('salary') if isinstance(employment_type, Mapping) else None
+                    if isinstance(salary, Mapping) and salary:
+                        kind = employment_type.get('type')
+                        row[f'salary_from_{kind}'] = salary.get('from')
+                        row[f'salary_to_{kind}'] = salary.get('to')
+                        row[f'salary_currency_{kind}'] = salary.get('currency')
+            elif isinstance(value, (dict, list)):
+                row[key] = json.dumps(value)
+            else:
+                row[key] = value
+        rows.append(row)
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).set_index('doc_id')
+
+
+def load_snapshot(db_path: str, path: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Read the Parquet snapshot saved with save_snapshot() for the database file
+
+    :param db_path: path to the database file
+    :param path: path to the snapshot, next to the database file by default
+    :return: df of the flattened job offers, None if there is no snapshot, the database was written after it or
+        Parquet support (pyarrow or fastparquet) isn't installed
+    """
+    path = path or snapshot_path(db_path)
+    if not os.path.exists(path):
+        return None
+    # SQLite in WAL mode writes to the -wal file first
+    written = [os.path.getmtime(file) for file in (db_path, db_path + '-wal') if os.path.exists(file)]
+    if written and os.path.getmtime(path) < max(written):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except ImportError as e:
+        logger.info(f"Not reading the snapshot {path}, no Parquet support: {e}")
+        return None
+
 
 class JobOffersDB:
 
     # TinyDB query object used to search for job offers in the database
     JobOffer = Query()
 
-    def __init__(self, db_path: str):
-        self.db = TinyDB(db_path)
+    def __init__(self, db_path: str, buffered: bool = False, flush_every: int = 100,
+                 flush_interval: Optional[float] = 5.0):
+        """
+        :param db_path: path to the TinyDB JSON file
+        :param buffered: keep the database in memory and write it out in the background, see BufferedStorage
+        :param flush_every: in buffered mode, number of writes kept in memory before the file is written
+        :param flush_interval: in buffered mode, seconds after the first unwritten change the file is written
+        """
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        if buffered:
+            self.db = TinyDB(db_path, storage=BufferedStorage(AtomicJSONStorage, flush_every, flush_interval, self.lock))
+        else:
+            self.db = TinyDB(db_path)
+        # job offer id -> TinyDB document ids, in insertion order (the same offer id may be stored more than once)
+        self.id_index: Dict[Any, List[int]] = {}
+        # offer title -> TinyDB document ids
+        self.title_index: Dict[Any, List[int]] = {}
+        # (salary from, salary to, doc_id) of every employment type with a salary, sorted; the few salaries with
+        # "to" below "from" (e.g. "to" missing) are kept apart, so a range scan can stop at "from" > upper limit
+        self.salary_index: List[Tuple[float, float, int]] = []
+        self.irregular_salaries: List[Tuple[float, float, int]] = []
+        # doc_id -> (salary from, salary to) of its employment types
+        self.salaries: Dict[int, List[Tuple[float, float]]] = {}
+        # skill name -> skill level -> TinyDB document ids
+        self.skill_index: Dict[str, Dict[Any, Set[int]]] = {}
+        # doc_id -> (skill name, skill level) of its skills, and doc_id -> job offer id
+        self.skills: Dict[int, List[Tuple[str, Any]]] = {}
+        self.offer_ids: Dict[int, Any] = {}
+        # doc_id -> stored job offer, reads are served from here instead of the storage
+        self.documents: Dict[int, Dict] = {}
+        # DataFrames of all offers, cleared by every write
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.rebuild_indexes()
+
+    # Indexes
+    @synchronized
+    def rebuild_indexes(self) -> None:
+        """
+        Build the indexes from the documents stored in the database. They are kept current by the methods of this
+        class, call this again after the file was changed by someone else
+        """
+        self.id_index = {}
+        self.title_index = {}
+        self.salary_index = []
+        self.irregular_salaries = []
+        self.salaries = {}
+        self.skill_index = {}
+        self.skills = {}
+        self.offer_ids = {}
+        self.documents = {}
+        self.frames = {}
+        for document in self.db:
+            self._index_document(document.doc_id, document, sort=False)
+        self.salary_index.sort()
+
+    def _get_documents(self, doc_ids: Iterable[int]) -> List[Document]:
+        # copies, so the caller can't change the stored offers
+        return [Document(self.documents[doc_id], doc_id) for doc_id in doc_ids if doc_id in self.documents]
+
+    @staticmethod
+    def _salary_ranges(job_offer: Mapping) -> Iterator[Tuple[float, float]]:
+        for employment_type in job_offer.get('employment_types') or []:
+            # theprotocol.it offers list employment types as plain names
+            salary = employment_type.get('salary') if isinstance(employment_type, Mapping) else None
+            if salary:
+                yield salary.get('from') or 0, salary.get('to') or 0
+
+    def _index_document(self, doc_id: int, job_offer: Mapping, sort: bool = True) -> None:
+        self.frames.clear()
+        bisect.insort(self.id_index.setdefault(job_offer.get('id'), []), doc_id)
+        self.offer_ids[doc_id] = job_offer.get('id')
+        self.documents[doc_id] = dict(job_offer)
+        skills = self.skills[doc_id] = [(skill.get('name'), skill.get('level'))
+                                        for skill in job_offer.get('skills') or [] if isinstance(skill, Mapping)]
+        for name, level in skills:
+            self.skill_index.setdefault(name, {}).setdefault(level, set()).add(doc_id)
+        bisect.insort(self.title_index.setdefault(job_offer.get('title'), []), doc_id)
+        salaries = self.salaries[doc_id] = list(self._salary_ranges(job_offer))
+        for salary_from, salary_to in salaries:
+            if salary_to < salary_from:
+                self.irregular_salaries.append((salary_from, salary_to, doc_id))
+            elif sort:
+                bisect.insort(self.salary_index, (salary_from, salary_to, doc_id))
+            else:
+                self.salary_index.append((salary_from, salary_to, doc_id))
+
+    @staticmethod
+    def _remove_from(index: Dict[Any, List[int]], key: Any, doc_id: int) -> None:
+        doc_ids = index.get(key, [])
+        if doc_id in doc_ids:
+            doc_ids.remove(doc_id)
+        if not doc_ids:
+            index.pop(key, None)
+
+    def _unindex_document(self, doc_id: int, job_offer: Mapping) -> None:
+        self.frames.clear()
+        self._remove_from(self.id_index, job_offer.get('id'), doc_id)
+        self.offer_ids.pop(doc_id, None)
+        self.documents.pop(doc_id, None)
+        for name, level in self.skills.pop(doc_id, []):
+            levels = self.skill_index.get(name, {})
+            levels.get(level, set()).discard(doc_id)
+            if not levels.get(level, True):
+                del levels[level]
+            if not levels:
+                self.skill_index.pop(name, None)
+        self._remove_from(self.title_index, job_offer.get('title'), doc_id)
+        for salary_from, salary_to in self.salaries.pop(doc_id, []):
+            entry = (salary_from, salary_to, doc_id)
+            if salary_to < salary_from:
+                self.irregular_salaries.remove(entry)
+                continue
+            position = bisect.bisect_left(self.salary_index, entry)
+            if position < len(self.salary_index) and self.salary_index[position] == entry:
+                del self.salary_index[position]
+
+    def _salary_matches(self, doc_id: int, salary_from: float, salary_to: float) -> bool:
+        return any(salary_from <= low and high <= salary_to for low, high in self.salaries.get(doc_id, []))
+
+    def _salary_range_bounds(self, salary_from: float, salary_to: float) -> Tuple[int, int]:
+        start = bisect.bisect_left(self.salary_index, (salary_from,))
+        end = bisect.bisect_right(self.salary_index, (salary_to, float('inf')))
+        return start, end
+
+    def _salary_range_size(self, salary_from: float, salary_to: float) -> int:
+        start, end = self._salary_range_bounds(salary_from, salary_to)
+        return max(end - start, 0) + len(self.irregular_salaries)
+
+    def _doc_ids_in_salary_range(self, salary_from: float, salary_to: float) -> List[int]:
+        start, end = self._salary_range_bounds(salary_from, salary_to)
+        doc_ids = {doc_id for _, high, doc_id in self.salary_index[start:end] if high <= salary_to}
+        doc_ids.update(doc_id for low, high, doc_id in self.irregular_salaries
+                       if salary_from <= low and high <= salary_to)
+        return sorted(doc_ids)
 
     # CRUD
+    @synchronized
     def insert_job_offer(self, job_offer: Dict) -> int:
         """
         insert single job offer into db
@@ -39,30 +368,81 @@ class JobOffersDB:
         :return: ID of inserted job offer
         """
         try:
-            return self.db.insert(job_offer)
+            doc_id = self.db.insert(job_offer)
+            self._index_document(doc_id, job_offer)
+            return doc_id
         except Exception as e:
             print(f"Error inserting job offer: {e}")
             return -1
 
     # CRUD
-    def insert_multiple_job_offers(self, job_offers: List[Dict]) -> List[int]:
+    @synchronized
+    def insert_multiple_job_offers(self, job_offers: Iterable[Dict], upsert: bool = False,
+                                   batch_size: Optional[int] = None) -> List[int]:
         """
-        insert multiple job offers into db
+        insert multiple job offers into db, writing the database once per batch instead of once per offer
 
         :param job_offers: list of dicts with job offers
-        :return: list of IDs of inserted job offers
+        :param upsert: update offers whose id is already stored (or repeated in job_offers) instead of storing them
+            again, the fields of the new offer are merged into the stored one
+        :param batch_size: number of offers written at once, all of them by default
+        :return: list of IDs of inserted (or updated) job offers, in the order of job_offers
         """
         try:
+            job_offers = list(job_offers)
+            size = batch_size or len(job_offers) or 1
             inserted_ids = []
-            for job_offer in job_offers:
-                inserted_id = self.db.insert(job_offer)
-                inserted_ids.append(inserted_id)
+            for start in range(0, len(job_offers), size):
+                inserted_ids.extend(self._insert_batch(job_offers[start:start + size], upsert))
             return inserted_ids
         except Exception as e:
             print(f"Error inserting multiple job offers: {e}")
             return []
 
+    def _insert_batch(self, job_offers: List[Dict], upsert: bool) -> List[int]:
+        new_offers: List[Dict] = []
+        updates: Dict[Any, Dict] = {}
+        # where each offer ended up: ('new', position in new_offers) or ('stored', job offer id)
+        positions: List[Tuple[str, Any]] = []
+        pending: Dict[Any, int] = {}
+        for job_offer in job_offers:
+            offer_id = job_offer.get('id')
+            if upsert and offer_id is not None and offer_id in self.id_index:
+                updates.setdefault(offer_id, {}).update(job_offer)
+                positions.append(('stored', offer_id))
+            elif upsert and offer_id is not None and offer_id in pending:
+                position = pending[offer_id]
+                new_offers[position] = {**new_offers[position], **job_offer}
+                positions.append(('new', position))
+            else:
+                pending[offer_id] = len(new_offers)
+                positions.append(('new', len(new_offers)))
+                new_offers.append(job_offer)
+
+        updated_documents: List[Tuple[int, Dict, Dict]] = []
+        if updates:
+            doc_ids = [doc_id for offer_id in updates for doc_id in self.id_index[offer_id]]
+            # TinyDB passes the documents to the function without their doc_ids, in the order of doc_ids
+            targets = iter(doc_ids)
+
+            def apply_update(document: Dict) -> None:
+                old_document = dict(document)
+                document.update(updates[document['id']])
+                updated_documents.append((next(targets), old_document, dict(document)))
+            self.db.update(apply_update, doc_ids=doc_ids)
+        new_doc_ids = self.db.insert_multiple(new_offers) if new_offers else []
+
+        for doc_id, old_document, _ in updated_documents:
+            self._unindex_document(doc_id, old_document)
+        for doc_id, _, document in updated_documents:
+            self._index_document(doc_id, document, sort=False)
+        for doc_id, job_offer in zip(new_doc_ids, new_offers):
+            self._index_document(doc_id, job_offer, sort=False)
+        self.salary_index.sort()
+        return [new_doc_ids[where] if kind == 'new' else self.id_index[where][0] for kind, where in positions]
+
     # CRUD
+    @synchronized
     def update_job_offer(self, job_offer_id: int, updated_data: Dict) -> bool:
         """
         Update a job offer in the TinyDB database based on the job_offer_id.
@@ -72,12 +452,21 @@ class JobOffersDB:
         :return: True if job offer was updated, False if not
         """
         try:
-            return bool(self.db.update(updated_data, self.JobOffer.id == job_offer_id))
+            doc_ids = list(self.id_index.get(job_offer_id, []))
+            if not doc_ids:
+                return False
+            documents = self._get_documents(doc_ids)
+            updated = self.db.update(updated_data, doc_ids=doc_ids)
+            for document in documents:
+                self._unindex_document(document.doc_id, document)
+                self._index_document(document.doc_id, {**document, **updated_data})
+            return bool(updated)
         except Exception as e:
             print(f"Error updating job offer: {e}")
             return False
 
     # Analytics
+    @synchronized
     def get_job_offers_by_salary_range(self, salary_from: int, salary_to: int) -> pd.DataFrame:
         """
         Get all job offers with a salary between given range
@@ -87,17 +476,12 @@ class JobOffersDB:
         :return: df of searched job offers
         """
 
-        job_offers = self.db.search(
-            self.JobOffer['employment_types'].any(
-                lambda e: e['salary']
-                and e['salary'].get('from', 0) >= salary_from
-                and e['salary'].get('to', 0) <= salary_to
-            )
-        )
+        job_offers = self._get_documents(self._doc_ids_in_salary_range(salary_from, salary_to))
 
         return pd.DataFrame(job_offers)
 
     # Analytics
+    @synchronized
     def get_job_offers_by_title_and_salary_range(self, title: str, salary_from: int, salary_to: int) -> pd.DataFrame:
         """
         Get all job offers with the given title and salary range
@@ -108,23 +492,37 @@ class JobOffersDB:
         :return: df of searched job offers
         """
 
-        job_offers = self.db.search(
-            (self.JobOffer['title'] == title) & self.JobOffer['employment_types'].any(
-                lambda e: e['salary']
-                and e['salary'].get('from', 0) >= salary_from
-                and e['salary'].get('to', 0) <= salary_to
-            )
-        )
+        titled = self.title_index.get(title, [])
+        if self._salary_range_size(salary_from, salary_to) < len(titled):
+            titled = set(titled)
+            doc_ids = [doc_id for doc_id in self._doc_ids_in_salary_range(salary_from, salary_to) if doc_id in titled]
+        else:
+            doc_ids = [doc_id for doc_id in titled if self._salary_matches(doc_id, salary_from, salary_to)]
+        job_offers = self._get_documents(doc_ids)
         return pd.DataFrame(job_offers)
 
     # Analytics
-    def get_all_job_offers(self) -> pd.DataFrame:
+    @synchronized
+    def get_job_offers_by_experience_level(self, experience_level: str) -> pd.DataFrame:
         """
-        return all job offers in the database as a pandas dataframe
+        Get all job offers for the given experience level, e.g. "junior"
 
-        :return: df of all job offers
+        :param experience_level: experience level to search for
+        :return: df of searched job offers
         """
-        all_job_offers = self.db.all()
+        doc_ids = sorted(doc_id for doc_id, document in self.documents.items()
+                         if document.get('experience_level') == experience_level)
+        return pd.DataFrame(self._get_documents(doc_ids))
+
+    @synchronized
+    def _cached_frame(self, name: str, build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        if name not in self.frames:
+            self.frames[name] = build()
+        # shared by all callers, not copied: they must not change it in place
+        return self.frames[name]
+
+    def _build_all_job_offers(self) -> pd.DataFrame:
+        all_job_offers = self._get_documents(sorted(self.documents))
         if all_job_offers:
             columns = list(all_job_offers[0].keys())
             df = pd.DataFrame(all_job_offers, columns=columns)
@@ -133,12 +531,49 @@ class JobOffersDB:
             return pd.DataFrame()
 
     # Analytics
+    def get_all_job_offers(self) -> pd.DataFrame:
+        """
+        return all job offers in the database as a pandas dataframe, cached until the next write (don't change it in
+        place, see the module docstring)
+
+        :return: df of all job offers
+        """
+        return self._cached_frame('all', self._build_all_job_offers)
+
+    # Analytics
+    def get_job_offers_snapshot(self) -> pd.DataFrame:
+        """
+        return all job offers as a flat, columnar dataframe (see flatten_job_offers), cached until the next write
+        (don't change it in place, see the module docstring)
+
+        :return: df of the flattened job offers
+        """
+        return self._cached_frame('snapshot', lambda: flatten_job_offers(sorted(self.documents.items())))
+
+    def save_snapshot(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Save the columnar snapshot as Parquet, needs pyarrow or fastparquet
+
+        :param path: path to the snapshot, next to the database file by default
+        :return: path of the saved snapshot, None if Parquet support isn't installed
+        """
+        path = path or snapshot_path(self.db_path)
+        try:
+            self.get_job_offers_snapshot().to_parquet(path)
+        except ImportError as e:
+            logger.warning(f"Snapshot not saved, install pyarrow or fastparquet for Parquet support: {e}")
+            return None
+        return path
+
+    # Analytics
+    @synchronized
     def get_number_of_job_offers(self) -> int:
         """
         return number of job offers in the database
         """
-        return len(self.db.all())
+        return len(self.offer_ids)
 
+    @synchronized
     def get_job_offer_by_id(self, job_offer_id: int) -> Dict:
         """
         Get a job offer from the database based on the job_offer_id.
@@ -146,13 +581,14 @@ class JobOffersDB:
         :param job_offer_id: ID of job offer to be returned
         :return: dict with job offer
         """
-        result = self.db.search(self.JobOffer.id == job_offer_id)
-        if result:
-            return result[0]
+        doc_ids = self.id_index.get(job_offer_id)
+        if doc_ids:
+            return self._get_documents(doc_ids[:1])[0]
         else:
             return None
 
     # Analytics
+    @synchronized
     def count_offers_with_skill(self, skill: str) -> int:
         """
         Count number of job offers that contain the given skill
@@ -160,9 +596,72 @@ class JobOffersDB:
         :param skill: skill to search for
         :return: number of job offers with the given skill
         """
-        return len(self.db.search(self.JobOffer['skills'].any(lambda s: s['name'] == skill)))
+        return len(self._doc_ids_with_skill(skill))
+
+    def _doc_ids_with_skill(self, skill: str, min_level: Optional[int] = None) -> Set[int]:
+        levels = self.skill_index.get(skill, {})
+        if min_level is not None:
+            levels = {level: doc_ids for level, doc_ids in levels.items()
+                      if isinstance(level, (int, float)) and level >= min_level}
+        if len(levels) == 1:
+            return next(iter(levels.values()))
+        return set().union(*levels.values())
+
+    def _doc_ids_with_skills(self, skills: Iterable[str], match_all: bool, min_level: Optional[int]) -> Set[int]:
+        doc_id_sets = sorted((self._doc_ids_with_skill(skill, min_level) for skill in skills), key=len)
+        if not doc_id_sets:
+            return set()
+        if match_all:
+            return set(doc_id_sets[0]).intersection(*doc_id_sets[1:])
+        return set().union(*doc_id_sets)
+
+    # Analytics
+    @synchronized
+    def count_offers_with_skills(self, skills: Optional[Iterable[str]] = None,
+                                 min_level: Optional[int] = None) -> Dict[str, int]:
+        """
+        Count job offers for many skills at once, from the skill index
+
+        :param skills: skills to count, all skills found in the offers by default
+        :param min_level: only count offers requiring at least this level of the skill
+        :return: dict skill -> number of job offers with the skill
+        """
+        if skills is None:
+            skills = self.skill_index.keys()
+        return {skill: len(self._doc_ids_with_skill(skill, min_level)) for skill in skills}
+
+    # Analytics
+    @synchronized
+    def get_offer_ids_with_skills(self, skills: Iterable[str], match_all: bool = True,
+                                  min_level: Optional[int] = None) -> Set[Any]:
+        """
+        Get ids of job offers with all (AND) or any (OR) of the given skills. The results are sets, so more complex
+        conditions can be built with & and |, e.g. Python AND (Django OR Flask):
+        db.get_offer_ids_with_skills(['Python']) & db.get_offer_ids_with_skills(['Django', 'Flask'], match_all=False)
+
+        :param skills: skill names
+        :param match_all: True for offers with all the skills, False for offers with any of them
+        :param min_level: only take into account skills required at least at this level
+        :return: set of job offer ids
+        """
+        return {self.offer_ids[doc_id] for doc_id in self._doc_ids_with_skills(skills, match_all, min_level)}
+
+    # Analytics
+    @synchronized
+    def get_job_offers_with_skills(self, skills: Iterable[str], match_all: bool = True,
+                                   min_level: Optional[int] = None) -> pd.DataFrame:
+        """
+        Get job offers with all (AND) or any (OR) of the given skills
+
+        :param skills: skill names
+        :param match_all: True for offers with all the skills, False for offers with any of them
+        :param min_level: only take into account skills required at least at this level
+        :return: df of searched job offers
+        """
+        return pd.DataFrame(self._get_documents(sorted(self._doc_ids_with_skills(skills, match_all, min_level))))
 
     # CRUD
+    @synchronized
     def delete_job_offer(self, job_offer_id: str) -> bool:
         """
         Delete a job offer from the database based on the job_offer_id.
@@ -170,17 +669,510 @@ class JobOffersDB:
         :param job_offer_id: ID of job offer to be deleted
         :return: True if job offer was deleted, False if not
         """
-        return bool(self.db.remove(self.JobOffer.id == job_offer_id))
+        doc_ids = list(self.id_index.get(job_offer_id, []))
+        if not doc_ids:
+            return False
+        documents = self._get_documents(doc_ids)
+        removed = self.db.remove(doc_ids=doc_ids)
+        for document in documents:
+            self._unindex_document(document.doc_id, document)
+        return bool(removed)
 
     # CRUD
+    @synchronized
     def delete_all_job_offers(self) -> None:
         """
         Delete all job offers from the database
         """
         self.db.truncate()
+        self.rebuild_indexes()
 
+    @synchronized
     def close(self) -> None:
         """
-        Close the database connection
+        Close the database connection, writing out buffered data
         """
         self.db.close()
+
+    @synchronized
+    def flush(self) -> None:
+        """
+        Write out data kept in memory in buffered mode, does nothing otherwise
+        """
+        if isinstance(self.db.storage, CachingMiddleware):
+            self.db.storage.flush()
+
+
+# SQLite backend
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+# job_offers holds the documents as JSON text, generated columns expose the fields that are searched for. Skills and
+# salaries are lists inside a document, so they are kept in their own tables, filled by triggers on every write
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_offers (
+    doc_id INTEGER PRIMARY KEY,
+    document TEXT NOT NULL CHECK (json_valid(document)),
+    offer_id GENERATED ALWAYS AS (json_extract(document, '$.id')) VIRTUAL,
+    title GENERATED ALWAYS AS (json_extract(document, '$.title')) VIRTUAL,
+    experience_level GENERATED ALWAYS AS (json_extract(document, '$.experience_level')) VIRTUAL
+);
+CREATE INDEX IF NOT EXISTS idx_job_offers_offer_id ON job_offers (offer_id);
+CREATE INDEX IF NOT EXISTS idx_job_offers_title ON job_offers (title);
+CREATE INDEX IF NOT EXISTS idx_job_offers_experience_level ON job_offers (experience_level);
+
+CREATE TABLE IF NOT EXISTS job_offer_skills (
+    doc_id INTEGER NOT NULL,
+    name,
+    level
+);
+CREATE INDEX IF NOT EXISTS idx_job_offer_skills_name ON job_offer_skills (name, level, doc_id);
+CREATE INDEX IF NOT EXISTS idx_job_offer_skills_doc_id ON job_offer_skills (doc_id);
+
+CREATE TABLE IF NOT EXISTS job_offer_salaries (
+    doc_id INTEGER NOT NULL,
+    salary_from REAL NOT NULL,
+    salary_to REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_offer_salaries_range ON job_offer_salaries (salary_from, salary_to, doc_id);
+CREATE INDEX IF NOT EXISTS idx_job_offer_salaries_doc_id ON job_offer_salaries (doc_id);
+
+CREATE TRIGGER IF NOT EXISTS job_offers_insert AFTER INSERT ON job_offers BEGIN
+    {insert_skills}
+    {insert_salaries}
+END;
+CREATE TRIGGER IF NOT EXISTS job_offers_update AFTER UPDATE OF document ON job_offers BEGIN
+    DELETE FROM job_offer_skills WHERE doc_id = OLD.doc_id;
+    DELETE FROM job_offer_salaries WHERE doc_id = OLD.doc_id;
+    {insert_skills}
+    {insert_salaries}
+END;
+CREATE TRIGGER IF NOT EXISTS job_offers_delete AFTER DELETE ON job_offers BEGIN
+    DELETE FROM job_offer_skills WHERE doc_id = OLD.doc_id;
+    DELETE FROM job_offer_salaries WHERE doc_id = OLD.doc_id;
+END;
+"""
+
+# rows of the skill and salary tables for the documents {documents} (NEW in the triggers, or all rows of {source}),
+# the same entries the TinyDB indexes take: skills that are objects, employment types with a non-empty salary
+SQLITE_INSERT_SKILLS = """
+    INSERT INTO job_offer_skills (doc_id, name, level)
+    SELECT {documents}.doc_id, json_extract(skill.value, '$.name'), json_extract(skill.value, '$.level')
+    FROM {source}json_each({documents}.document, '$.skills') AS skill
+    WHERE skill.type = 'object';"""
+SQLITE_INSERT_SALARIES = """
+    INSERT INTO job_offer_salaries (doc_id, salary_from, salary_to)
+    SELECT {documents}.doc_id,
+           coalesce(json_extract(employment.value, '$.salary.from'), 0),
+           coalesce(json_extract(employment.value, '$.salary.to'), 0)
+    FROM {source}json_each({documents}.document, '$.employment_types') AS employment
+    WHERE json_type(employment.value, '$.salary') = 'object' AND json_extract(employment.value, '$.salary') != '{{}}';"""
+
+
+def _sql_value(value: Any) -> Any:
+    # values taken from a DataFrame are numpy scalars, which sqlite3 can't bind
+    return value.item() if hasattr(value, 'item') else value
+
+
+class SQLiteJobOffersDB:
+    """
+    Job offers stored in SQLite with the JSON1 functions, with the same public methods as JobOffersDB.
+
+    Only the searched fields are read from disk: offer id, title and experience level are indexed generated columns,
+    skills and salary bounds are indexed tables kept current by triggers. Each write is one transaction, so the
+    file stays consistent and other processes can read it while a scraper writes (WAL journal).
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        """
+        :param db_path: path to the SQLite file, created with its tables and indexes when missing
+        :param timeout: seconds to wait for a lock held by another connection
+        """
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SQLITE_SCHEMA.format(
+            insert_skills=SQLITE_INSERT_SKILLS.format(documents='NEW', source=''),
+            insert_salaries=SQLITE_INSERT_SALARIES.format(documents='NEW', source=''),
+        ))
+        # DataFrames of all offers, and the database version they were built from
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.frames_version: Optional[Tuple[int, int]] = None
+
+    # Indexes
+    @synchronized
+    def rebuild_indexes(self) -> None:
+        """
+        Fill the skill and salary tables again from the stored documents, e.g. after documents were changed with
+        triggers disabled
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM job_offer_skills")
+            self.connection.execute("DELETE FROM job_offer_salaries")
+            self.connection.execute(SQLITE_INSERT_SKILLS.format(documents='job_offers', source='job_offers, '))
+            self.connection.execute(SQLITE_INSERT_SALARIES.format(documents='job_offers', source='job_offers, '))
+
+    @synchronized
+    def _select_documents(self, where: str = "", params: Iterable = ()) -> List[Dict]:
+        rows = self.connection.execute(f"SELECT document FROM job_offers {where} ORDER BY doc_id",
+                                       [_sql_value(param) for param in params])
+        return [json.loads(document) for document, in rows]
+
+    @synchronized
+    def _stored_offers(self, job_offer_id: Any) -> List[Tuple[int, Dict]]:
+        rows = self.connection.execute("SELECT doc_id, document FROM job_offers WHERE offer_id = ? ORDER BY doc_id",
+                                       (_sql_value(job_offer_id),))
+        return [(doc_id, json.loads(document)) for doc_id, document in rows]
+
+    def _insert(self, job_offer: Dict) -> int:
+        return self.connection.execute("INSERT INTO job_offers (document) VALUES (?)",
+                                       (json.dumps(job_offer),)).lastrowid
+
+    def _update(self, job_offer_id: Any, updated_data: Dict) -> List[int]:
+        stored = self._stored_offers(job_offer_id)
+        self.connection.executemany("UPDATE job_offers SET document = ? WHERE doc_id = ?",
+                                    [(json.dumps({**document, **updated_data}), doc_id) for doc_id, document in stored])
+        return [doc_id for doc_id, _ in stored]
+
+    @staticmethod
+    def _skill_filter(skills: List[str], min_level: Optional[int]) -> Tuple[str, List]:
+        where = f"name IN ({', '.join('?' * len(skills))})"
+        if min_level is not None:
+            # levels that aren't numbers never satisfy a minimum level
+            where += " AND typeof(level) IN ('integer', 'real') AND level >= ?"
+            return where, [*skills, min_level]
+        return where, list(skills)
+
+    def _doc_ids_with_skills(self, skills: List[str], match_all: bool, min_level: Optional[int]) -> Tuple[str, List]:
+        # subquery selecting the doc_ids of offers with all / any of the skills
+        where, params = self._skill_filter(skills, min_level)
+        if match_all:
+            return (f"SELECT doc_id FROM job_offer_skills WHERE {where} GROUP BY doc_id "
+                    f"HAVING COUNT(DISTINCT name) = ?", [*params, len(set(skills))])
+        return f"SELECT doc_id FROM job_offer_skills WHERE {where}", params
+
+    # CRUD
+    @synchronized
+    def insert_job_offer(self, job_offer: Dict) -> int:
+        """
+        insert single job offer into db
+
+        :param job_offer: job offert dict
+        :return: ID of inserted job offer
+        """
+        try:
+            with self.connection:
+                return self._insert(job_offer)
+        except Exception as e:
+            print(f"Error inserting job offer: {e}")
+            return -1
+
+    # CRUD
+    @synchronized
+    def insert_multiple_job_offers(self, job_offers: Iterable[Dict], upsert: bool = False,
+                                   batch_size: Optional[int] = None) -> List[int]:
+        """
+        insert multiple job offers into db, one transaction per batch
+
+        :param job_offers: list of dicts with job offers
+        :param upsert: update offers whose id is already stored (or repeated in job_offers) instead of storing them
+            again, the fields of the new offer are merged into the stored one
+        :param batch_size: number of offers written at once, all of them by default
+        :return: list of IDs of inserted (or updated) job offers, in the order of job_offers
+        """
+        try:
+            job_offers = list(job_offers)
+            size = batch_size or len(job_offers) or 1
+            inserted_ids = []
+            for start in range(0, len(job_offers), size):
+                with self.connection:
+                    for job_offer in job_offers[start:start + size]:
+                        updated = self._update(job_offer['id'], job_offer) if upsert and job_offer.get('id') is not None else []
+                        inserted_ids.append(updated[0] if updated else self._insert(job_offer))
+            return inserted_ids
+        except Exception as e:
+            print(f"Error inserting multiple job offers: {e}")
+            return []
+
+    # CRUD
+    @synchronized
+    def update_job_offer(self, job_offer_id: int, updated_data: Dict) -> bool:
+        """
+        Update a job offer in the SQLite database based on the job_offer_id.
+
+        :param job_offer_id: ID of job offer to be updated
+        :param updated_data: dict containing the updated job offer
+        :return: True if job offer was updated, False if not
+        """
+        try:
+            with self.connection:
+                return bool(self._update(job_offer_id, updated_data))
+        except Exception as e:
+            print(f"Error updating job offer: {e}")
+            return False
+
+    # Analytics
+    def get_job_offers_by_salary_range(self, salary_from: int, salary_to: int) -> pd.DataFrame:
+        """
+        Get all job offers with a salary between given range
+
+        :param salary_from: lower limit of the salary
+        :param salary_to: upper limit
+        :return: df of searched job offers
+        """
+        return pd.DataFrame(self._select_documents(
+            "WHERE doc_id IN (SELECT doc_id FROM job_offer_salaries WHERE salary_from >= ? AND salary_to <= ?)",
+            (salary_from, salary_to),
+        ))
+
+    # Analytics
+    def get_job_offers_by_title_and_salary_range(self, title: str, salary_from: int, salary_to: int) -> pd.DataFrame:
+        """
+        Get all job offers with the given title and salary range
+
+        :param title: offer title to search for
+        :param salary_from: lower limit of the salary
+        :param salary_to: upper limit
+        :return: df of searched job offers
+        """
+        return pd.DataFrame(self._select_documents(
+            "WHERE title = ? AND doc_id IN "
+            "(SELECT doc_id FROM job_offer_salaries WHERE salary_from >= ? AND salary_to <= ?)",
+            (title, salary_from, salary_to),
+        ))
+
+    # Analytics
+    def get_job_offers_by_experience_level(self, experience_level: str) -> pd.DataFrame:
+        """
+        Get all job offers for the given experience level, e.g. "junior"
+
+        :param experience_level: experience level to search for
+        :return: df of searched job offers
+        """
+        return pd.DataFrame(self._select_documents("WHERE experience_level = ?", (experience_level,)))
+
+    @synchronized
+    def _cached_frame(self, name: str, build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        # total_changes counts the writes of this connection, data_version changes with commits of other connections
+        version = (self.connection.total_changes, self.connection.execute("PRAGMA data_version").fetchone()[0])
+        if version != self.frames_version:
+            self.frames, self.frames_version = {}, version
+        if name not in self.frames:
+            self.frames[name] = build()
+        # shared by all callers, not copied: they must not change it in place
+        return self.frames[name]
+
+    def _build_all_job_offers(self) -> pd.DataFrame:
+        all_job_offers = self._select_documents()
+        if all_job_offers:
+            columns = list(all_job_offers[0].keys())
+            return pd.DataFrame(all_job_offers, columns=columns)
+        else:
+            return pd.DataFrame()
+
+    # Analytics
+    def get_all_job_offers(self) -> pd.DataFrame:
+        """
+        return all job offers in the database as a pandas dataframe, cached until the next write (don't change it in
+        place, see the module docstring)
+
+        :return: df of all job offers
+        """
+        return self._cached_frame('all', self._build_all_job_offers)
+
+    # Analytics
+    def get_job_offers_snapshot(self) -> pd.DataFrame:
+        """
+        return all job offers as a flat, columnar dataframe (see flatten_job_offers), cached until the next write
+        (don't change it in place, see the module docstring)
+
+        :return: df of the flattened job offers
+        """
+        def build() -> pd.DataFrame:
+            rows = self.connection.execute("SELECT doc_id, document FROM job_offers ORDER BY doc_id")
+            return flatten_job_offers((doc_id, json.loads(document)) for doc_id, document in rows)
+        return self._cached_frame('snapshot', build)
+
+    def save_snapshot(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Save the columnar snapshot as Parquet, needs pyarrow or fastparquet
+
+        :param path: path to the snapshot, next to the database file by default
+        :return: path of the saved snapshot, None if Parquet support isn't installed
+        """
+        path = path or snapshot_path(self.db_path)
+        try:
+            self.get_job_offers_snapshot().to_parquet(path)
+        except ImportError as e:
+            logger.warning(f"Snapshot not saved, install pyarrow or fastparquet for Parquet support: {e}")
+            return None
+        return path
+
+    # Analytics
+    @synchronized
+    def get_number_of_job_offers(self) -> int:
+        """
+        return number of job offers in the database
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM job_offers").fetchone()[0]
+
+    def get_job_offer_by_id(self, job_offer_id: int) -> Dict:
+        """
+        Get a job offer from the database based on the job_offer_id.
+
+        :param job_offer_id: ID of job offer to be returned
+        :return: dict with job offer
+        """
+        stored = self._stored_offers(job_offer_id)
+        return stored[0][1] if stored else None
+
+    # Analytics
+    def count_offers_with_skill(self, skill: str) -> int:
+        """
+        Count number of job offers that contain the given skill
+
+        :param skill: skill to search for
+        :return: number of job offers with the given skill
+        """
+        return self.count_offers_with_skills([skill])[skill]
+
+    # Analytics
+    @synchronized
+    def count_offers_with_skills(self, skills: Optional[Iterable[str]] = None,
+                                 min_level: Optional[int] = None) -> Dict[str, int]:
+        """
+        Count job offers for many skills at once, from the skill table
+
+        :param skills: skills to count, all skills found in the offers by default
+        :param min_level: only count offers requiring at least this level of the skill
+        :return: dict skill -> number of job offers with the skill
+        """
+        if skills is not None:
+            skills = list(skills)
+            where, params = self._skill_filter(skills, min_level)
+        elif min_level is not None:
+            where, params = "typeof(level) IN ('integer', 'real') AND level >= ?", [min_level]
+        else:
+            where, params = "1", []
+        counts = dict(self.connection.execute(
+            f"SELECT name, COUNT(DISTINCT doc_id) FROM job_offer_skills WHERE {where} GROUP BY name", params))
+        if skills is None:
+            return counts
+        return {skill: counts.get(skill, 0) for skill in skills}
+
+    # Analytics
+    @synchronized
+    def get_offer_ids_with_skills(self, skills: Iterable[str], match_all: bool = True,
+                                  min_level: Optional[int] = None) -> Set[Any]:
+        """
+        Get ids of job offers with all (AND) or any (OR) of the given skills, see JobOffersDB.get_offer_ids_with_skills
+
+        :param skills: skill names
+        :param match_all: True for offers with all the skills, False for offers with any of them
+        :param min_level: only take into account skills required at least at this level
+        :return: set of job offer ids
+        """
+        skills = list(skills)
+        if not skills:
+            return set()
+        subquery, params = self._doc_ids_with_skills(skills, match_all, min_level)
+        rows = self.connection.execute(f"SELECT offer_id FROM job_offers WHERE doc_id IN ({subquery})", params)
+        return {offer_id for offer_id, in rows}
+
+    # Analytics
+    def get_job_offers_with_skills(self, skills: Iterable[str], match_all: bool = True,
+                                   min_level: Optional[int] = None) -> pd.DataFrame:
+        """
+        Get job offers with all (AND) or any (OR) of the given skills
+
+        :param skills: skill names
+        :param match_all: True for offers with all the skills, False for offers with any of them
+        :param min_level: only take into account skills required at least at this level
+        :return: df of searched job offers
+        """
+        skills = list(skills)
+        if not skills:
+            return pd.DataFrame()
+        subquery, params = self._doc_ids_with_skills(skills, match_all, min_level)
+        return pd.DataFrame(self._select_documents(f"WHERE doc_id IN ({subquery})", params))
+
+    # CRUD
+    @synchronized
+    def delete_job_offer(self, job_offer_id: str) -> bool:
+        """
+        Delete a job offer from the database based on the job_offer_id.
+
+        :param job_offer_id: ID of job offer to be deleted
+        :return: True if job offer was deleted, False if not
+        """
+        with self.connection:
+            removed = self.connection.execute("DELETE FROM job_offers WHERE offer_id = ?", (_sql_value(job_offer_id),))
+        return removed.rowcount > 0
+
+    # CRUD
+    @synchronized
+    def delete_all_job_offers(self) -> None:
+        """
+        Delete all job offers from the database
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM job_offer_skills")
+            self.connection.execute("DELETE FROM job_offer_salaries")
+            self.connection.execute("DELETE FROM job_offers")
+
+    @synchronized
+    def close(self) -> None:
+        """
+        Close the database connection
+        """
+        self.connection.close()
+
+    def flush(self) -> None:
+        """
+        Every write is committed right away, nothing to do
+        """
+
+
+def open_job_offers_db(db_path: str, **kwargs: Any):
+    """
+    Open the job offers database with the backend matching the file: SQLiteJobOffersDB for .db, .sqlite and .sqlite3
+    files, JobOffersDB (TinyDB) otherwise
+
+    :param db_path: path to the database file
+    :param kwargs: passed on to the backend, e.g. buffered=True for JobOffersDB
+    """
+    if os.path.splitext(db_path)[1].lower() in SQLITE_SUFFIXES:
+        return SQLiteJobOffersDB(db_path, **kwargs)
+    return JobOffersDB(db_path, **kwargs)
+
+
+def migrate_to_sqlite(json_path: str, sqlite_path: str, batch_size: int = 10000) -> int:
+    """
+    Copy all job offers of a TinyDB JSON file (or a JSON list of offers) into a new SQLite database, keeping their
+    document ids. The JSON file is left as it is
+
+    :param json_path: TinyDB JSON file written by JobOffersDB
+    :param sqlite_path: SQLite file to create, must not hold any job offers yet
+    :param batch_size: number of offers written per transaction
+    :return: number of copied job offers
+    """
+    with open(json_path, encoding='utf-8') as file:
+        data = json.load(file)
+    if isinstance(data, list):
+        documents = list(enumerate(data, start=1))
+    else:
+        documents = sorted((int(doc_id), document) for doc_id, document in data.get('_default', {}).items())
+
+    db = SQLiteJobOffersDB(sqlite_path)
+    try:
+        if db.get_number_of_job_offers():
+            raise ValueError(f"{sqlite_path} already holds job offers")
+        for start in range(0, len(documents), batch_size):
+            with db.connection:
+                db.connection.executemany("INSERT INTO job_offers (doc_id, document) VALUES (?, ?)",
+                                          [(doc_id, json.dumps(document))
+                                           for doc_id, document in documents[start:start + batch_size]])
+    finally:
+        db.close()
+    return len(documents)
@@ -5,7 +5,11 @@ import pandas as pd
 import sys
 import pathlib
 sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
-from document_db import JobOffersDB
+import json
+import os
+import tempfile
+from unittest import mock
+from document_db import AtomicJSONStorage, JobOffersDB, SQLiteJobOffersDB, load_snapshot, migrate_to_sqlite
 
 
 class TestJobOffersDB(unittest.TestCase):
@@ -157,6 +161,259 @@ class TestJobOffersDB(unittest.TestCase):
         # Close the test database
         cls.test_job_offers_db.close()
 
+
+def synthetic_job_offers(count, seed=0):
+    # job offers covering the indexed fields: repeated titles and levels, skills with levels, salaries that are
+    # missing, partial ("to" missing) or regular
+    rng = random.Random(seed)
+    titles = ['Data Engineer', 'Python Developer', 'Analyst']
+    levels = ['junior', 'mid', 'senior']
+    skill_names = ['Python', 'SQL', 'Spark', 'Docker', 'Go']
+    job_offers = []
+    for i in range(count):
+        employment_types = []
+        for kind in rng.sample(['b2b', 'permanent'], rng.randint(1, 2)):
+            low = rng.randrange(5000, 25000, 1000)
+            salary = rng.choice([None, {'from': low, 'currency': 'pln'},
+                                 {'from': low, 'to': low + rng.randrange(0, 10000, 1000), 'currency': 'pln'}])
+            employment_types.append({'type': kind, 'salary': salary})
+        job_offers.append({
+            'id': f'offer-{i}',
+            'title': rng.choice(titles),
+            'experience_level': rng.choice(levels),
+            'skills': [{'name': name, 'level': rng.randint(1, 5)} for name in rng.sample(skill_names, 2)],
+            'employment_types': employment_types,
+        })
+    return job_offers
+
+
+def offer_ids(df):
+    return sorted(df['id']) if len(df) else []
+
+
+class TestJobOffersDBIndexes(unittest.TestCase):
+    # every indexed query is checked against a scan of all offers, also after updates and deletes
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = JobOffersDB(os.path.join(self.tmp_dir.name, 'test_indexes.json'))
+        self.db.insert_multiple_job_offers(synthetic_job_offers(60))
+        self.db.update_job_offer('offer-3', {'title': 'Analyst', 'skills': [{'name': 'Rust', 'level': 4}]})
+        self.db.insert_multiple_job_offers([{'id': 'offer-5', 'experience_level': 'senior'}], upsert=True)
+        self.db.delete_job_offer('offer-7')
+
+    def scan(self, condition):
+        return sorted(job_offer['id'] for job_offer in self.db.db.all() if condition(job_offer))
+
+    @staticmethod
+    def in_range(job_offer, salary_from, salary_to):
+        return any(salary_from <= (employment_type['salary'].get('from') or 0)
+                   and (employment_type['salary'].get('to') or 0) <= salary_to
+                   for employment_type in job_offer['employment_types'] if employment_type['salary'])
+
+    def test_salary_range(self):
+        for salary_from, salary_to in ((0, 10000), (10000, 20000), (15000, 40000), (0, 0)):
+            self.assertEqual(offer_ids(self.db.get_job_offers_by_salary_range(salary_from, salary_to)),
+                             self.scan(lambda job_offer: self.in_range(job_offer, salary_from, salary_to)))
+
+    def test_title_and_salary_range(self):
+        self.assertEqual(offer_ids(self.db.get_job_offers_by_title_and_salary_range('Analyst', 8000, 30000)),
+                         self.scan(lambda job_offer: job_offer['title'] == 'Analyst'
+                                   and self.in_range(job_offer, 8000, 30000)))
+
+    def test_experience_level(self):
+        self.assertEqual(offer_ids(self.db.get_job_offers_by_experience_level('senior')),
+                         self.scan(lambda job_offer: job_offer['experience_level'] == 'senior'))
+
+    def test_skills(self):
+        def has(job_offer, skill, min_level=0):
+            return any(s['name'] == skill and s['level'] >= min_level for s in job_offer['skills'])
+
+        self.assertEqual(self.db.count_offers_with_skill('Python'), len(self.scan(lambda o: has(o, 'Python'))))
+        self.assertEqual(self.db.count_offers_with_skills(['Rust', 'Go'], min_level=3),
+                         {'Rust': len(self.scan(lambda o: has(o, 'Rust', 3))),
+                          'Go': len(self.scan(lambda o: has(o, 'Go', 3)))})
+        self.assertEqual(sorted(self.db.get_offer_ids_with_skills(['Python', 'SQL'])),
+                         self.scan(lambda o: has(o, 'Python') and has(o, 'SQL')))
+        self.assertEqual(offer_ids(self.db.get_job_offers_with_skills(['Spark', 'Docker'], match_all=False)),
+                         self.scan(lambda o: has(o, 'Spark') or has(o, 'Docker')))
+
+    def test_lookup_by_id(self):
+        self.assertEqual(self.db.get_job_offer_by_id('offer-3')['title'], 'Analyst')
+        self.assertEqual(self.db.get_job_offer_by_id('offer-5')['experience_level'], 'senior')
+        self.assertIsNone(self.db.get_job_offer_by_id('offer-7'))
+        self.assertEqual(self.db.get_number_of_job_offers(), 59)
+
+    def test_reads_do_not_parse_the_file(self):
+        with mock.patch.object(self.db.db.storage, 'read', side_effect=AssertionError('storage read')):
+            self.assertIsNotNone(self.db.get_job_offer_by_id('offer-1'))
+            self.assertEqual(len(self.db.get_job_offers_with_skills(['Python'])),
+                             self.db.count_offers_with_skill('Python'))
+
+    def test_indexes_match_reopened_database(self):
+        reopened = JobOffersDB(self.db.db_path)
+
+        self.assertEqual(reopened.id_index, self.db.id_index)
+        self.assertEqual(reopened.skill_index, self.db.skill_index)
+        self.assertEqual(sorted(reopened.salary_index), sorted(self.db.salary_index))
+        self.assertEqual(reopened.documents, self.db.documents)
+        reopened.close()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+
+class TestSQLiteJobOffersDB(unittest.TestCase):
+    # the SQLite backend answers every query like the JSON one
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_db = JobOffersDB(os.path.join(self.tmp_dir.name, 'test_backend.json'))
+        self.sqlite_db = SQLiteJobOffersDB(os.path.join(self.tmp_dir.name, 'test_backend.sqlite'))
+        for db in (self.json_db, self.sqlite_db):
+            db.insert_multiple_job_offers(synthetic_job_offers(60))
+            db.insert_multiple_job_offers([{'id': 'offer-2', 'title': 'Analyst'}], upsert=True)
+            db.update_job_offer('offer-4', {'experience_level': 'junior'})
+            db.delete_job_offer('offer-6')
+
+    def assertSameResults(self, query):
+        self.assertEqual(query(self.sqlite_db), query(self.json_db))
+
+    def test_queries(self):
+        self.assertSameResults(lambda db: db.get_number_of_job_offers())
+        self.assertSameResults(lambda db: db.get_job_offer_by_id('offer-2'))
+        self.assertSameResults(lambda db: db.get_job_offer_by_id('offer-6'))
+        self.assertSameResults(lambda db: offer_ids(db.get_job_offers_by_salary_range(10000, 20000)))
+        self.assertSameResults(lambda db: offer_ids(db.get_job_offers_by_title_and_salary_range('Analyst', 0, 30000)))
+        self.assertSameResults(lambda db: offer_ids(db.get_job_offers_by_experience_level('junior')))
+        self.assertSameResults(lambda db: db.count_offers_with_skill('SQL'))
+        self.assertSameResults(lambda db: db.count_offers_with_skills(min_level=3))
+        self.assertSameResults(lambda db: db.get_offer_ids_with_skills(['Python', 'Go'], match_all=False))
+        self.assertSameResults(lambda db: offer_ids(db.get_job_offers_with_skills(['Python', 'SQL'], min_level=2)))
+
+    def test_all_job_offers(self):
+        sqlite_df = self.sqlite_db.get_all_job_offers()
+        json_df = self.json_db.get_all_job_offers()
+
+        self.assertEqual(sqlite_df.to_dict('records'), json_df.to_dict('records'))
+
+    def test_migrate_to_sqlite(self):
+        migrated_path = os.path.join(self.tmp_dir.name, 'test_migrated.sqlite')
+        self.json_db.close()
+        migrate_to_sqlite(self.json_db.db_path, migrated_path)
+        migrated = SQLiteJobOffersDB(migrated_path)
+
+        self.assertEqual(migrated.get_all_job_offers().to_dict('records'),
+                         self.sqlite_db.get_all_job_offers().to_dict('records'))
+        migrated.close()
+
+    def tearDown(self):
+        self.json_db.close()
+        self.sqlite_db.close()
+        self.tmp_dir.cleanup()
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'test_storage.json')
+
+    def stored_ids(self):
+        with open(self.path) as file:
+            content = file.read()
+        return sorted(document['id'] for document in json.loads(content)['_default'].values()) if content else []
+
+    def test_buffered_writes_on_flush(self):
+        db = JobOffersDB(self.path, buffered=True, flush_every=1000, flush_interval=None)
+        db.insert_multiple_job_offers(synthetic_job_offers(3))
+        db.insert_job_offer({'id': 'offer-3'})
+
+        self.assertEqual(self.stored_ids(), [])
+        self.assertEqual(db.get_number_of_job_offers(), 4)
+        db.flush()
+        self.assertEqual(self.stored_ids(), ['offer-0', 'offer-1', 'offer-2', 'offer-3'])
+        db.close()
+
+    def test_buffered_writes_on_close(self):
+        db = JobOffersDB(self.path, buffered=True, flush_every=1000, flush_interval=None)
+        db.insert_multiple_job_offers(synthetic_job_offers(3))
+        db.delete_job_offer('offer-1')
+        db.close()
+
+        self.assertEqual(self.stored_ids(), ['offer-0', 'offer-2'])
+
+    def test_buffered_writes_every_n_writes(self):
+        db = JobOffersDB(self.path, buffered=True, flush_every=2, flush_interval=None)
+        db.insert_job_offer({'id': 'offer-0'})
+        self.assertEqual(self.stored_ids(), [])
+        db.insert_job_offer({'id': 'offer-1'})
+        self.assertEqual(self.stored_ids(), ['offer-0', 'offer-1'])
+        db.close()
+
+    def test_failed_write_keeps_the_file(self):
+        storage = AtomicJSONStorage(self.path)
+        storage.write({'_default': {'1': {'id': 'offer-0'}}})
+        with self.assertRaises(TypeError):
+            storage.write({'_default': {'1': {'id': object()}}})
+
+        self.assertEqual(self.stored_ids(), ['offer-0'])
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['test_storage.json'])
+
+    def test_write_keeps_file_permissions(self):
+        storage = AtomicJSONStorage(self.path)
+        os.chmod(self.path, 0o644)
+        storage.write({'_default': {'1': {'id': 'offer-0'}}})
+
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+class TestCachedFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'test_frames.json')
+        self.db = JobOffersDB(self.path)
+        self.db.insert_multiple_job_offers(synthetic_job_offers(10))
+
+    def test_frames_are_cached_until_the_next_write(self):
+        with mock.patch.object(self.db, '_build_all_job_offers', wraps=self.db._build_all_job_offers) as build:
+            self.assertEqual(len(self.db.get_all_job_offers()), 10)
+            self.assertEqual(len(self.db.get_all_job_offers()), 10)
+            self.assertEqual(build.call_count, 1)
+
+            self.assertIs(self.db.get_all_job_offers(), self.db.get_all_job_offers())
+            self.db.insert_job_offer({'id': 'offer-10'})
+            self.assertEqual(len(self.db.get_all_job_offers()), 11)
+            self.assertEqual(build.call_count, 2)
+
+    def test_snapshot_columns(self):
+        snapshot = self.db.get_job_offers_snapshot()
+        job_offer = self.db.get_job_offer_by_id('offer-0')
+        doc_id = self.db.id_index['offer-0'][0]
+
+        for skill in job_offer['skills']:
+            self.assertEqual(snapshot.loc[doc_id, f"skill_{skill['name']}"], skill['level'])
+        self.assertEqual(len(snapshot), 10)
+
+    def test_parquet_snapshot(self):
+        path = self.db.save_snapshot()
+        if path is None:
+            self.skipTest('Parquet support (pyarrow or fastparquet) is not installed')
+
+        pd.testing.assert_frame_equal(load_snapshot(self.path), self.db.get_job_offers_snapshot())
+        # the database written after the snapshot makes it stale
+        os.utime(path, (0, 0))
+        self.assertIsNone(load_snapshot(self.path))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
     
 if __name__ == '__main__':
     unittest.main()
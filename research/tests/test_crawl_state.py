@@ -0,0 +1,53 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from crawl_state import CrawledResource, CrawlState, fingerprint
+
+
+class TestCrawlState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(pathlib.Path(self.tmp_dir.name) / 'test_crawl_state.sqlite')
+        self.state = CrawlState(self.path)
+
+    def test_conditional_headers(self):
+        self.assertEqual(self.state.conditional_headers('https://example.com/1'), {})
+
+        self.state.record('https://example.com/1', 'example', 1, etag='"v1"',
+                          last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(self.state.conditional_headers('https://example.com/1'), {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+        })
+
+    def test_seen_ids(self):
+        self.state.record_many([CrawledResource(f'https://example.com/{i}', 'example', i) for i in range(3)])
+        self.state.record('https://other.com/1', 'other', 'a')
+
+        self.assertEqual(self.state.seen_ids('example'), {'0', '1', '2'})
+        self.assertEqual(self.state.get('https://other.com/1').offer_id, 'a')
+
+    def test_last_page_survives_restart(self):
+        self.assertEqual(self.state.last_page('example'), 0)
+        self.state.set_last_page('example', 7)
+        self.state.close()
+
+        self.state = CrawlState(self.path)
+        self.assertEqual(self.state.last_page('example'), 7)
+        self.state.finish('example')
+        self.assertEqual(self.state.last_page('example'), 0)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint({'a': 1, 'b': [2]}), fingerprint({'b': [2], 'a': 1}))
+        self.assertNotEqual(fingerprint({'a': 1}), fingerprint({'a': 2}))
+
+    def tearDown(self):
+        self.state.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import unittest
+import pathlib
+import sys
+import tempfile
+from unittest import mock
+from aiohttp import web
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from crawl_state import CrawlState
+from scraper_justjoinit import scrape
+from sourced_data.document_db import JobOffersDB
+
+
+class TestScraperJustJoinIt(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # local stub of the justjoin.it API: 50 offers listed with an ETag of their content, every offer detail
+        # fails once with 503 before it is served, then with an ETag
+        self.offers = [{'id': f'offer-{i}', 'title': f'Developer {i}', 'skills': []} for i in range(50)]
+        self.requests = {}
+        self.listing_responses = []
+
+        async def offers(request):
+            etag = '"{}"'.format(hashlib.md5(json.dumps(self.offers).encode()).hexdigest())
+            if request.headers.get('If-None-Match') == etag:
+                self.listing_responses.append(304)
+                raise web.HTTPNotModified()
+            self.listing_responses.append(200)
+            return web.json_response(self.offers, headers={'ETag': etag})
+
+        async def offer(request):
+            offer_id = request.match_info['id']
+            self.requests[offer_id] = self.requests.get(offer_id, 0) + 1
+            if offer_id == 'offer-missing':
+                raise web.HTTPNotFound()
+            if offer_id == 'offer-html':
+                return web.Response(text='<html>Maintenance</html>', content_type='text/html')
+            if offer_id == 'offer-no-body':
+                return web.json_response({'title': 'No description'})
+            if self.requests[offer_id] == 1:
+                raise web.HTTPServiceUnavailable()
+            etag = f'"{offer_id}-v1"'
+            if request.headers.get('If-None-Match') == etag:
+                raise web.HTTPNotModified()
+            return web.json_response({'body': f'<p>About <b>{offer_id}</b></p>'}, headers={'ETag': etag})
+
+        app = web.Application()
+        app.router.add_get('/api/offers', offers)
+        app.router.add_get('/api/offers/{id}', offer)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}/api/offers'
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = JobOffersDB(str(pathlib.Path(self.tmp_dir.name) / 'test_scraper.json'))
+        self.state = CrawlState(str(pathlib.Path(self.tmp_dir.name) / 'test_crawl_state.sqlite'))
+
+    async def test_scrape(self):
+        inserted = await scrape(self.db, self.url, workers=8, rate=0, batch=20)
+
+        self.assertEqual(inserted, 50)
+        self.assertEqual(self.db.get_number_of_job_offers(), 50)
+        self.assertEqual(self.db.get_job_offer_by_id('offer-7')['description'], 'About offer-7')
+        # every failed request was retried once
+        self.assertEqual(set(self.requests.values()), {2})
+
+    async def test_scrape_limit(self):
+        inserted = await scrape(self.db, self.url, limit=10, rate=0)
+
+        self.assertEqual(inserted, 10)
+        self.assertEqual(len(self.requests), 10)
+
+    async def test_rescrape_updates_offers(self):
+        await scrape(self.db, self.url, rate=0)
+        self.offers[0]['title'] = 'Senior Developer 0'
+        await scrape(self.db, self.url, rate=0)
+
+        self.assertEqual(self.db.get_number_of_job_offers(), 50)
+        self.assertEqual(self.db.get_job_offer_by_id('offer-0')['title'], 'Senior Developer 0')
+
+    async def test_missing_offer_is_skipped(self):
+        self.offers.append({'id': 'offer-missing', 'title': 'Gone', 'skills': []})
+        inserted = await scrape(self.db, self.url, rate=0)
+
+        self.assertEqual(inserted, 50)
+        self.assertIsNone(self.db.get_job_offer_by_id('offer-missing'))
+        # a 404 is not retried
+        self.assertEqual(self.requests['offer-missing'], 1)
+
+    async def test_malformed_offer_is_skipped(self):
+        self.offers.append({'id': 'offer-html', 'title': 'HTML', 'skills': []})
+        self.offers.append({'id': 'offer-no-body', 'title': 'No body', 'skills': []})
+        inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        self.assertEqual(inserted, 50)
+        self.assertIsNone(self.db.get_job_offer_by_id('offer-html'))
+        self.assertIsNone(self.db.get_job_offer_by_id('offer-no-body'))
+        self.assertIsNone(self.state.get(self.url))
+
+    async def test_rerun_fetches_only_changed_offers(self):
+        await scrape(self.db, self.url, rate=0, state=self.state)
+        self.offers[0]['title'] = 'Senior Developer 0'
+        inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        self.assertEqual(inserted, 1)
+        self.assertEqual(self.requests['offer-0'], 3)
+        self.assertEqual(self.requests['offer-1'], 2)
+        # the detail page didn't change (304), the stored description is kept
+        job_offer = self.db.get_job_offer_by_id('offer-0')
+        self.assertEqual(job_offer['title'], 'Senior Developer 0')
+        self.assertEqual(job_offer['description'], 'About offer-0')
+
+    async def test_interrupted_crawl_resumes(self):
+        await scrape(self.db, self.url, limit=10, rate=0, state=self.state)
+        inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        self.assertEqual(inserted, 40)
+        self.assertEqual(self.db.get_number_of_job_offers(), 50)
+        self.assertEqual(set(self.requests.values()), {2})
+        # the listing wasn't recorded after the limited run, so it was fetched in full again
+        self.assertEqual(self.listing_responses, [200, 200])
+
+    async def test_unchanged_listing_is_not_crawled(self):
+        await scrape(self.db, self.url, rate=0, state=self.state)
+        inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        self.assertEqual(inserted, 0)
+        self.assertEqual(self.listing_responses, [200, 304])
+        self.assertEqual(set(self.requests.values()), {2})
+
+    async def test_failed_offer_is_fetched_next_run(self):
+        self.offers.append({'id': 'offer-missing', 'title': 'Gone', 'skills': []})
+        await scrape(self.db, self.url, rate=0, state=self.state)
+        self.assertIsNone(self.state.get(self.url))
+
+        inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        # the listing is requested in full again and only the missing offer is retried
+        self.assertEqual(inserted, 0)
+        self.assertEqual(self.listing_responses, [200, 200])
+        self.assertEqual(self.requests['offer-missing'], 2)
+        self.assertEqual(self.requests['offer-0'], 2)
+
+    async def test_failed_insert_is_not_recorded(self):
+        with mock.patch.object(self.db, 'insert_multiple_job_offers', return_value=[]):
+            inserted = await scrape(self.db, self.url, rate=0, state=self.state)
+
+        self.assertEqual(inserted, 0)
+        self.assertEqual(self.state.seen_ids('justjoinit'), set())
+        self.assertIsNone(self.state.get(self.url))
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        self.db.close()
+        self.state.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import http.server
+import pathlib
+import sys
+import tempfile
+import threading
+from unittest import mock
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from crawl_state import CrawlState
+from scraper_theprotocol import parse_offer, scrape
+from sourced_data.document_db import JobOffersDB
+
+offer_page = """<html><body>
+<h1 class="rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc titleClass_ttiz6zs"> {title} </h1>
+<h2 class="rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc" data-test="text-offerEmployer">ACME</h2>
+<div data-test="text-workplaceAddress"> Prosta 1, Warszawa </div>
+<div class="section_s1x3ch8k GridElement_g16c3y1q"><p>Benefity</p></div>
+<div class="section_s1x3ch8k GridElement_g16c3y1q"> Mid, Senior </div>
+<div class="rootClass_rpqnjlt body1_b1gato5c initial_i1m6fsnc"> Praca zdalna </div>
+<div data-test="section-contract"><p class="Contract_cxuwut9"> B2B </p></div>
+<div class="Container_cx7p4xk">
+  <p class="SalaryInfo_s6hpd6f">20 000 - 25 000 zł</p>
+  <p class="Contract_cxuwut9" data-test="text-contractName">B2B</p>
+  <p class="Units_u1ewriig" data-test="text-contractUnits">netto / mies.</p>
+</div>
+<div class="Container_cv2t83c"><span class="Label_l1fs6hs4"> Python </span><span class="Label_l1fs6hs4">SQL</span></div>
+<div class="offerSection_oi4q9r7" id="TECHNOLOGY_AND_POSITION">Build data pipelines</div>
+</body></html>"""
+
+
+class TestParseOffer(unittest.TestCase):
+
+    def test_parse_offer(self):
+        job_offer = parse_offer(offer_page.format(title='Data Engineer'), 'https://theprotocol.it/szczegoly/1')
+
+        self.assertEqual(job_offer, {
+            'id': 'https://theprotocol.it/szczegoly/1',
+            'title': 'Data Engineer',
+            'street': 'Prosta 1, Warszawa',
+            'company_name': 'ACME',
+            'workplace_type': 'Praca zdalna',
+            'experience_level': 'Mid, Senior',
+            'employment_types': ['B2B'],
+            'salary': [{'salary': '20 000 - 25 000 zł', 'contract': 'B2B', 'units': 'netto / mies.'}],
+            'url': 'https://theprotocol.it/szczegoly/1',
+            'skills': ['Python', 'SQL'],
+            'description': 'Build data pipelines',
+        })
+
+    def test_page_without_title_is_skipped(self):
+        self.assertIsNone(parse_offer('<html><body><div>Not found</div></body></html>', 'https://theprotocol.it/x'))
+
+
+class TestScraperTheProtocol(unittest.TestCase):
+
+    def setUp(self):
+        # local stub of theprotocol.it: 2 listing pages with 5 offers each, offer pages are served with an ETag
+        self.requests = []
+        # offer paths answered with the given status once
+        self.errors = {}
+        test = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                test.requests.append(self.path)
+                if self.path.startswith('/?pageNumber='):
+                    page = int(self.path.split('=')[1])
+                    links = ''.join(f'<a href="/szczegoly/{page}-{i}">offer</a>' for i in range(5)) if page <= 2 else ''
+                    body, headers = f'<html><body><a href="/firmy">company</a>{links}</body></html>', {}
+                elif self.path in test.errors:
+                    self.send_response(test.errors.pop(self.path))
+                    self.end_headers()
+                    return
+                else:
+                    etag = f'"{self.path}"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    body, headers = offer_page.format(title=f'Offer {self.path}'), {'ETag': etag}
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/?pageNumber={{}}'
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = JobOffersDB(str(pathlib.Path(self.tmp_dir.name) / 'test_scraper.json'))
+        self.state = CrawlState(str(pathlib.Path(self.tmp_dir.name) / 'test_crawl_state.sqlite'))
+
+    def test_scrape(self):
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 10)
+        self.assertEqual(self.db.get_number_of_job_offers(), 10)
+        job_offer = self.db.get_job_offer_by_id(self.url.split('?')[0] + 'szczegoly/2-3')
+        self.assertEqual(job_offer['title'], 'Offer /szczegoly/2-3')
+        # the crawl is complete, the next one starts at the first page
+        self.assertEqual(self.state.last_page('theprotocol'), 0)
+
+    def test_rescrape_downloads_only_changed_offers(self):
+        scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 0)
+        self.assertEqual(self.db.get_number_of_job_offers(), 10)
+
+    def test_interrupted_crawl_resumes(self):
+        self.state.set_last_page('theprotocol', 1)
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 5)
+        self.assertNotIn('/?pageNumber=1', self.requests)
+
+    def test_failed_download_is_fetched_again(self):
+        self.errors['/szczegoly/2-1'] = 503
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 9)
+        # page 2 isn't done, the next run resumes at it
+        self.assertEqual(self.state.last_page('theprotocol'), 1)
+        self.requests.clear()
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 1)
+        self.assertNotIn('/?pageNumber=1', self.requests)
+        self.assertEqual(self.db.get_number_of_job_offers(), 10)
+        self.assertEqual(self.state.last_page('theprotocol'), 0)
+
+    def test_missing_offer_is_skipped(self):
+        self.errors['/szczegoly/1-4'] = 404
+        inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 9)
+        self.assertIsNone(self.db.get_job_offer_by_id(self.url.split('?')[0] + 'szczegoly/1-4'))
+        self.assertEqual(self.state.last_page('theprotocol'), 0)
+
+    def test_failed_insert_is_not_recorded(self):
+        with mock.patch.object(self.db, 'insert_multiple_job_offers', return_value=[]):
+            inserted = scrape(self.db, self.state, self.url, fetch_workers=4, parse_workers=2)
+
+        self.assertEqual(inserted, 0)
+        self.assertEqual(self.state.seen_ids('theprotocol'), set())
+        # the page wasn't stored, the next run starts with it again
+        self.assertEqual(self.state.last_page('theprotocol'), 0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.db.close()
+        self.state.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,53 @@
-from .general import *
-from .profiler import *
+"""
+Logging, profiling, metrics, tracing and auditing helpers.
+
+The names of the submodules are re-exported lazily: a submodule is imported the first time one of its names is used,
+so e.g. importing wdp.custom_loggers.metrics doesn't open the general log file, import matplotlib for the profiler or
+start the auditor. Only config is imported right away (and metrics_server when METRICS_SERVER is set, so the endpoint
+starts with the package).
+"""
+import importlib
+
 from .config import *
+from . import config
+
+# submodule -> names re-exported from it
+_exports = {
+    'general': ('level_to_log', 'dir_path', 'data_folder', 'LOG_PATH', 'parameters', 'DecoratorAwareFormatter',
+                'configure_logging', 'GenericLogger', 'get_default_logger', 'LazyArguments', 'log'),
+    'shipping': ('BoundedQueueHandler', 'BatchingQueueListener', 'enable_queue_logging', 'disable_queue_logging'),
+    'sampling': ('SamplingFilter', 'EveryNFilter', 'IntervalFilter', 'RateLimitFilter'),
+    'profiler': ('profiling_enabled', 'profiler_mode', 'sample_rate', 'stack_interval', 'trace_memory',
+                 'top_allocations', 'metrics_enabled', 'metrics_export_interval', 'console_profiler', 'txt_profiler',
+                 'json_profiler', 'plot_profiler', 'TXT_PROFILER_PATH', 'JSON_PROFILER_PATH', 'NDJSON_PROFILER_PATH',
+                 'PLOT_PROFILER_PATH', 'sort_method', 'dir_path', 'plot_profiler_path', 'json_profiler_path',
+                 'txt_profiler_path', 'ndjson_profiler_path', 'profiler_store', 'aggregator', 'metrics_exporter',
+                 'get_time', 'describe_call_memory', 'print_to_console', 'log_to_json', 'read_profiler_logs',
+                 'log_to_txt', 'percentile_series', 'plot', 'get_stack_sampler', 'record_metrics', 'export_metrics',
+                 'memory_tracking', 'sampled_call', 'stack_sampled_call', 'profile'),
+    'metrics_server': ('render_metrics', 'MetricsServer', 'start_metrics_server', 'stop_metrics_server'),
+    'tracing': ('TraceContext', 'Span', 'span', 'traced', 'bind', 'add_span', 'current_context', 'enable_tracing',
+                'disable_tracing', 'flush_spans', 'export_chrome_trace'),
+    'auditor': ('AuditEvent', 'Auditor', 'audit', 'get_auditor'),
+}
+# a name exported by several submodules comes from the last one
+_submodule_of = {name: submodule for submodule, names in _exports.items() for name in names}
+
+__all__ = tuple(_submodule_of) + tuple(name for name in dir(config) if name.isupper())
+
+
+def __getattr__(name):
+    submodule = _submodule_of.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{submodule}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
+if config.METRICS_SERVER:
+    from . import metrics_server
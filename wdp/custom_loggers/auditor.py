@@ -1 +1,253 @@
-# who and whend accessed sensitive information e.g. salary
+"""
+Auditor recording who accessed sensitive information, e.g. salary, and when.
+
+Audit events are structured (timestamp, user, action, resource, resource id, details). Recording one only puts a
+tuple on a bounded queue, so it can be done on every salary read. A background writer thread stores the events
+in batches, one SQLite transaction per batch. The store is indexed by user, by resource and by time, so queries
+for one user, one resource or one time range only read matching rows, even with tens of millions of events.
+
+When the queue is full new events are dropped and counted (Auditor.dropped), the caller never waits. Events of
+a batch that could not be stored are logged and counted as well (Auditor.failed).
+
+Usage:
+    from wdp.custom_loggers.auditor import audit, get_auditor
+
+    audit("jsmith", "read", "Employees.salary", resource_id=42, details={"view": "dashboard"})
+
+    auditor = get_auditor()
+    auditor.flush()                                                   # waits until queued events are stored
+    auditor.query(user="jsmith", since=time.time() - 24 * 3600)
+    auditor.query(resource="Employees.salary", resource_id=42, limit=100)
+    auditor.count(resource="Employees.salary", since=start, until=end)
+
+    Events are stored in AUDIT_DB_PATH in the logs folder, see config.py.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from wdp.custom_loggers import config
+
+__all__ = (
+    'AuditEvent',
+    'Auditor',
+    'audit',
+    'get_auditor',
+)
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(os.path.abspath(__file__))
+audit_db_path = os.path.join(dir_path, config.SUB_FOLDER, config.AUDIT_DB_PATH)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS audit_events (
+        event_id INTEGER PRIMARY KEY,
+        timestamp REAL NOT NULL,
+        user TEXT NOT NULL,
+        action TEXT NOT NULL,
+        resource TEXT NOT NULL,
+        resource_id TEXT,
+        details TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_user ON audit_events (user, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_resource ON audit_events (resource, resource_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_timestamp ON audit_events (timestamp)",
+)
+
+_auditor: Optional["Auditor"] = None
+_auditor_lock = threading.Lock()
+
+
+class AuditEvent(NamedTuple):
+    event_id: int
+    timestamp: float
+    user: str
+    action: str
+    resource: str
+    resource_id: Optional[str]
+    details: Optional[dict]
+
+
+class Auditor:
+    """ Batched, indexed store of audit events """
+
+    def __init__(self, path: str = audit_db_path, batch_size: int = config.AUDIT_BATCH_SIZE,
+                 flush_interval: float = config.AUDIT_FLUSH_INTERVAL, max_queue: int = config.AUDIT_QUEUE_SIZE):
+        """
+        :param path: SQLite database file, created with its indexes when missing
+        :param batch_size: maximum number of events stored in one transaction
+        :param flush_interval: seconds a partial batch waits for more events before it is stored
+        :param max_queue: maximum number of events waiting for the writer thread, 0 for no limit
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped: int = 0
+        self.failed: int = 0
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        connection = self._connect()
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        connection.close()
+        self._writer = threading.Thread(target=self._run, name="wdp-auditor", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def record(self, user: str, action: str, resource: str, resource_id: Any = None,
+               details: Optional[dict] = None, timestamp: Optional[float] = None) -> None:
+        """
+        Queues one event, never blocks
+
+        :param user: who accessed the data
+        :param action: what was done, e.g. "read", "update", "export"
+        :param resource: what was accessed, e.g. "Employees.salary"
+        :param resource_id: which record, e.g. the employee_id
+        :param details: any JSON serialisable context
+        :param timestamp: unix time of the access, now by default
+        """
+        event = (timestamp if timestamp is not None else time.time(), user, action, resource,
+                 None if resource_id is None else str(resource_id), details)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            # a partial batch waits up to flush_interval for more events, flush() and close() store it right away
+            deadline = time.monotonic() + self.flush_interval
+            batch, markers = [], []
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stopping or markers or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._store(connection, batch)
+                except Exception:
+                    # a failing batch must not kill the writer thread
+                    self.failed += len(batch)
+                    logger.exception("Could not store %d audit events", len(batch))
+            for marker in markers:
+                marker.set()
+        connection.close()
+
+    @staticmethod
+    def _store(connection: sqlite3.Connection, batch: list[tuple]) -> None:
+        rows = [(timestamp, user, action, resource, resource_id,
+                 json.dumps(details, default=str) if details is not None else None)
+                for timestamp, user, action, resource, resource_id, details in batch]
+        with connection:
+            connection.executemany(
+                "INSERT INTO audit_events (timestamp, user, action, resource, resource_id, details) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until all events queued so far are stored, returns False on timeout """
+        if not self._writer.is_alive():
+            return False
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def close(self) -> None:
+        """ Stores queued events and stops the writer thread """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    @staticmethod
+    def _where(user: Optional[str], action: Optional[str], resource: Optional[str], resource_id: Any,
+               since: Optional[float], until: Optional[float]) -> tuple[str, list]:
+        conditions, params = [], []
+        for column, value in (("user", user), ("action", action), ("resource", resource)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if resource_id is not None:
+            conditions.append("resource_id = ?")
+            params.append(str(resource_id))
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def query(self, user: Optional[str] = None, resource: Optional[str] = None, resource_id: Any = None,
+              action: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = 1000) -> list[AuditEvent]:
+        """
+        Stored events matching all given filters, newest first. Events still queued are not included, call
+        flush() first to see them
+
+        :param since: earliest timestamp (inclusive)
+        :param until: latest timestamp (exclusive)
+        :param limit: maximum number of events returned, None for all
+        """
+        where, params = self._where(user, action, resource, resource_id, since, until)
+        query = f"SELECT * FROM audit_events{where} ORDER BY timestamp DESC, event_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        connection = self._connect()
+        try:
+            rows = connection.execute(query, params).fetchall()
+        finally:
+            connection.close()
+        return [AuditEvent(*row[:6], json.loads(row[6]) if row[6] is not None else None) for row in rows]
+
+    def count(self, user: Optional[str] = None, resource: Optional[str] = None, resource_id: Any = None,
+              action: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None) -> int:
+        """ Number of stored events matching all given filters """
+        where, params = self._where(user, action, resource, resource_id, since, until)
+        connection = self._connect()
+        try:
+            return connection.execute(f"SELECT COUNT(*) FROM audit_events{where}", params).fetchone()[0]
+        finally:
+            connection.close()
+
+
+def get_auditor() -> Auditor:
+    """ Returns the shared auditor, starting it on first use """
+    global _auditor
+    if _auditor is None:
+        with _auditor_lock:
+            if _auditor is None:
+                _auditor = Auditor()
+                atexit.register(_auditor.close)
+    return _auditor
+
+
+def audit(user: str, action: str, resource: str, resource_id: Any = None, details: Optional[dict] = None) -> None:
+    """ Records an access with the shared auditor, does nothing when AUDIT_ENABLED is off """
+    if config.AUDIT_ENABLED:
+        get_auditor().record(user, action, resource, resource_id, details)
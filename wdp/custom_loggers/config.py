@@ -9,17 +9,60 @@ FUNC_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - Message: %(message)s
                        " from module %(module)s, line %(lineno)s"
 GENERAL_LOG_PATH = "general_logs.txt"
 
+# ----------- LOG SHIPPING -----------
+
+QUEUE_LOGGING = False  # hands records to a background writer thread instead of writing them in the caller
+QUEUE_MAX_SIZE = 10000  # maximum number of records waiting for the writer thread
+QUEUE_FULL_POLICY = "drop"  # "drop" discards records when the queue is full, "block" waits for free space
+QUEUE_BLOCK_TIMEOUT = 1.0  # seconds to wait for free space with the "block" policy before dropping, None waits forever
+QUEUE_BATCH_SIZE = 100  # maximum number of records written by the writer thread before flushing handlers
+QUEUE_STOP_TIMEOUT = 5.0  # seconds to wait for free space for the stop signal when shipping stops
+
+# ----------- AUDITOR -----------
+
+AUDIT_ENABLED = True  # records access to sensitive data passed to audit()
+AUDIT_DB_PATH: str = "auditor_logs.db"  # SQLite store of audit events, indexed by user, resource and time
+AUDIT_BATCH_SIZE = 500  # maximum number of audit events stored in one transaction
+AUDIT_FLUSH_INTERVAL = 1.0  # seconds a partial batch waits for more events before it is stored
+AUDIT_QUEUE_SIZE = 100000  # maximum number of audit events waiting to be stored, newer ones are dropped
+
+# ----------- TRACING -----------
+
+TRACING_ENABLED = False  # records hierarchical spans of instrumented stages (e.g. the data converter pipeline)
+TRACE_PATH: str = "traces.ndjson"  # JSON lines file with finished spans, shared by all processes
+TRACE_MAX_BYTES: int = 10 * 1024 * 1024  # rotates the trace file when it grows past this size
+TRACE_BACKUP_COUNT: int = 3  # number of rotated trace files kept
+
 # ----------- PROFILER LOG -----------
 
 PROFILING_ENABLED = True  # enables profiling
 
+PROFILER_MODE = "full"  # "full" profiles every call, "sampled" profiles a fraction of calls, "stack" samples stacks
+PROFILER_SAMPLE_RATE = 0.01  # fraction of calls profiled with cProfile in "sampled" mode
+PROFILER_STACK_INTERVAL = 0.005  # seconds between stack samples in "stack" mode
+PROFILER_FLUSH_INTERVAL = 60.0  # seconds between flushes of aggregated results in "sampled" and "stack" modes
+PROFILER_TOP_ENTRIES = 20  # number of functions / stacks kept per profiled function in aggregated results
+
+METRICS_ENABLED = True  # records call counts, cumulative time and latency histograms of profiled calls in all modes
+METRICS_EXPORT_INTERVAL = 60.0  # seconds between latency histogram snapshots appended to the JSON lines file, 0 disables
+METRICS_SERVER = False  # serves the metrics in Prometheus / OpenMetrics text format from a background HTTP thread
+METRICS_SERVER_HOST = "127.0.0.1"  # interface the metrics endpoint listens on
+METRICS_SERVER_PORT = 9464  # port of the metrics endpoint, scraped at http://host:port/metrics
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
 CONSOLE_PROFILER = True  # enables printing to console
 TXT_PROFILER = True  # enables saving to readable txt file
-JSON_PROFILER = True  # enables saving to JSON
+JSON_PROFILER = True  # enables saving to JSON lines (one JSON object per line, appended)
 PLOT_PROFILER = False  # enables png plot
 
 SORT_METHOD = "cumulative"
 
+PROFILER_TRACE_MEMORY = True  # measures net and peak allocation of profiled calls with tracemalloc
+PROFILER_TOP_ALLOCATIONS = 0  # number of top allocation sites (by line) reported per call, 0 disables snapshots
+
 PROFILER_TXT_PROFILER_PATH: str = "profiler_logs.txt"
-PROFILER_JSON_PROFILER_PATH: str = "profiler_logs.json"
+PROFILER_JSON_PROFILER_PATH: str = "profiler_logs.json"  # legacy JSON array, still read by the profiler reader
+PROFILER_NDJSON_PROFILER_PATH: str = "profiler_logs.ndjson"
+PROFILER_NDJSON_MAX_BYTES: int = 10 * 1024 * 1024  # rotates the JSON lines file when it grows past this size
+PROFILER_NDJSON_BACKUP_COUNT: int = 5  # number of rotated files kept (profiler_logs.ndjson.1 ... .5)
 PROFILER_PLOT_PROFILER_PATH: str = "profiler_plot.png"
\ No newline at end of file
@@ -31,6 +31,7 @@ Usage:
         return a + b
 
     Logs are saved to "general_logs.txt" file and printed to console
+    With QUEUE_LOGGING enabled in config.py, they are written by a background thread (see shipping.py)
     The logs include time, level, the function name, class name (if in class method), and arguments passed to the function.
 
     You can configure path, log format and custom messages in config.py file
@@ -40,8 +41,12 @@ import logging
 import functools
 import inspect
 import os
+import sys
+import threading
 from wdp.custom_loggers import config
-from typing import Union
+from wdp.custom_loggers.shipping import enable_queue_logging
+from wdp.custom_loggers.sampling import SamplingFilter
+from typing import Optional, Union
 
 level_to_log: int = logging.DEBUG
 
@@ -57,6 +62,40 @@ parameters: dict[str, Union[int, str, list[logging.Handler]]] = {
     ]
 }
 
+_configure_lock = threading.Lock()
+_configured: bool = False
+
+
+class DecoratorAwareFormatter(logging.Formatter):
+    """
+    Formatter using DECORATOR_LOG_FORMAT for records emitted by @log and FUNC_LOG_FORMAT for all other records,
+    so the decorator doesn't have to swap handler formatters around every call
+    """
+    def __init__(self) -> None:
+        super().__init__(config.FUNC_LOG_FORMAT)
+        self.decorator_formatter = logging.Formatter(config.DECORATOR_LOG_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "from_log_decorator", False):
+            return self.decorator_formatter.format(record)
+        return super().format(record)
+
+
+def configure_logging() -> None:
+    """ Configures the root logger with the parameters, only the first call has any effect """
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if not _configured:
+            logging.basicConfig(**parameters, format=config.FUNC_LOG_FORMAT)
+            formatter = DecoratorAwareFormatter()
+            for handler in parameters['handlers']:
+                handler.setFormatter(formatter)
+            if config.QUEUE_LOGGING:
+                enable_queue_logging()
+            _configured = True
+
 
 class GenericLogger:
     def __init__(self) -> None:
@@ -64,7 +103,7 @@ class GenericLogger:
         Initializes the GenericLogger class with string FUNC_LOG_FORMAT and configures logging with the parameters
         """
         self.logger_format: str = config.FUNC_LOG_FORMAT
-        logging.basicConfig(**parameters, format=self.logger_format)
+        configure_logging()
         self.logger: logging.Logger = logging.getLogger(__name__)
 
     @staticmethod
@@ -82,11 +121,50 @@ def get_default_logger(use_decorator_format: bool = True) -> logging.Logger:
     return GenericLogger().get_logger(use_decorator_format=use_decorator_format)
 
 
+class LazyArguments:
+    """ Formats call arguments only when a handler actually emits the record """
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args: tuple, kwargs: dict) -> None:
+        self.args = args
+        self.kwargs = kwargs
+
+    @staticmethod
+    def _repr(value) -> str:
+        # a broken __repr__ of an argument must not lose the log record
+        try:
+            return repr(value)
+        except Exception:
+            return f"<unrepresentable {type(value).__name__}>"
+
+    def __str__(self) -> str:
+        args_repr = [self._repr(a) for a in self.args]
+        kwargs_repr = [f"{k}={self._repr(v)}" for k, v in self.kwargs.items()]
+        return ", ".join(args_repr + kwargs_repr) or "No args"
+
+
+def _find_logger_in_args(args: tuple, kwargs: dict) -> Union[GenericLogger, logging.Logger, None]:
+    """ Returns the first logger passed to the function or stored as an attribute of its first argument """
+    for value in args:
+        if isinstance(value, (logging.Logger, GenericLogger)):
+            return value
+    for value in kwargs.values():
+        if isinstance(value, (logging.Logger, GenericLogger)):
+            return value
+    attributes = getattr(args[0], "__dict__", None) if args else None
+    if attributes:
+        for value in attributes.values():
+            if isinstance(value, (logging.Logger, GenericLogger)):
+                return value
+    return None
+
+
 def log(
     function=None, *,
     new_logger: Union[GenericLogger, logging.Logger] = None,
     level: int = logging.DEBUG,
-    message="No message"
+    message="No message",
+    sampler: Optional[SamplingFilter] = None
 ):
     """
         :param function: callable = None
@@ -94,59 +172,60 @@ def log(
             The new logger instance to use, by default None.
         :param level: int, optional
         :param message: str, optional
+        :param sampler: EveryNFilter, IntervalFilter or RateLimitFilter, optional
+            Logs only the calls let through by the filter, the next logged call reports how many were skipped
         :return: logging.Logger
             A logger instance
         This is a decorator function that logs messages for a given function.
         It takes any function to decorate, a logger object, a log level, and a message as arguments
+
+        Everything that doesn't change between calls (qualified name, definition line, message template, logger)
+        is resolved once when the function is decorated. When the logger isn't enabled for the level, the wrapper
+        only does the level check, and arguments are repr'd only when a handler formats the record.
         """
 
     def decorator_log(func):
+        name = func.__name__
+        code = getattr(func, "__code__", None)
+        lineno = code.co_firstlineno if code else inspect.getsourcelines(func)[1]
+        template = (f" Message: {message}, Class: {func.__qualname__}, Function: {name}, called with args:"
+                    .replace("%", "%%") + " %s, from module %s, called from line %s, executed at line " + str(lineno)
+                    + "%s")
+        sample_key = (func.__module__, func.__qualname__)
+        extra = {"from_log_decorator": True}
+        default_logger = None
+
+        def resolve_logger(args, kwargs) -> logging.Logger:
+            nonlocal default_logger
+            configure_logging()
+            logger_container = new_logger or _find_logger_in_args(args, kwargs)
+            if isinstance(logger_container, logging.Logger):
+                return logger_container
+            if default_logger is None:
+                default_logger = GenericLogger().get_logger(name, use_decorator_format=False)
+            return default_logger
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            frame = inspect.currentframe().f_back
-            filename = inspect.getframeinfo(frame).filename
-            module_name = filename.split('/')[-1].split('.')[0]
-            line_number = inspect.getframeinfo(frame).lineno
-            lineno = inspect.getsourcelines(func)[1]
-
-            logger: logging.Logger = get_default_logger(use_decorator_format=False)
-            try:
-                if not new_logger:
-                    first_arg = args[0] if args else None
-                    logger_params = [x for x in (*args, *kwargs.values()) if isinstance(x, (logging.Logger, GenericLogger))]
-                    if hasattr(first_arg, "__dict__"):
-                        logger_params += [x for x in first_arg.__dict__.values() if isinstance(x, (logging.Logger, GenericLogger))]
-                    logger_container = logger_params[0] if logger_params else GenericLogger()
-                else:
-                    logger_container = new_logger
-
-                if isinstance(logger_container, GenericLogger):
-                    logger = logger_container.get_logger(func.__name__, use_decorator_format=False)
-                else:
-                    logger = logger_container
-
-                args_repr = [repr(a) for a in args]
-                kwargs_repr = [f"{k}={v!r}" for k, v in kwargs.items()]
-                arguments = ", ".join(args_repr + kwargs_repr)
-
-                if not arguments:
-                    arguments = "No args"
-
-                get_default_logger(use_decorator_format=True)
-                logger.log(level, f" Message: {message}, Class: {func.__qualname__}, Function: {func.__name__}, called with args:"
-                                  f" {arguments}, from module {module_name}, called from line {line_number}, executed at line {lineno}")
-                get_default_logger(use_decorator_format=False)
-            except Exception as err:
-                logger.info(f"Exception raised in {func.__name__} during args shuffling. Exception: {str(err)}")
-                pass  # as it's just a logger, I don't want it to cause any interruptions before logging
+            logger = resolve_logger(args, kwargs)
+            if logger.isEnabledFor(level):
+                suppressed = sampler.check(sample_key) if sampler is not None else 0
+                if suppressed is not None:
+                    try:
+                        caller = sys._getframe(1)
+                        module_name = os.path.basename(caller.f_code.co_filename).split('.')[0]
+                        logger.log(level, template, LazyArguments(args, kwargs), module_name, caller.f_lineno,
+                                   SamplingFilter.summary(suppressed), extra=extra)
+                    except Exception as err:
+                        logger.info(f"Exception raised in {name} during args shuffling. Exception: {str(err)}")
+                        pass  # as it's just a logger, I don't want it to cause any interruptions before logging
 
             try:
                 # in case decorated function raise any exception log it, and then reraise
-                result = func(*args, **kwargs)
-                return result
+                return func(*args, **kwargs)
             except Exception as err:
-                logger.exception(f"Exception raised in {func.__name__}. Exception: {str(err)}. Details:")
-                raise err
+                logger.exception(f"Exception raised in {name}. Exception: {str(err)}. Details:")
+                raise
         return wrapper
 
     if not function:
@@ -0,0 +1,126 @@
+"""
+Per-call memory measurement for the @profile decorator, based on tracemalloc.
+
+For every measured call it reports:
+    net  - memory allocated by the call and still alive when it returns (negative when it freed more than it kept)
+    peak - highest amount of memory allocated during the call, above the level at its start
+    top allocations (optional) - source lines with the largest net allocation, from tracemalloc snapshots
+
+tracemalloc is started by the first measured call and stopped when the last running one returns, so code outside
+profiled functions doesn't pay for tracing. Nested measured calls are supported, each thread keeps its own stack of
+calls: a child's peak is carried over into its parent in the same thread. The peak counter is shared by the whole
+process, so before a call resets it the peak reached so far is carried over into every running call of every thread.
+tracemalloc traces the whole process, so allocations made by other threads during the call are attributed to it as
+well.
+
+Usage:
+    from wdp.custom_loggers.memory_tracker import track_memory
+
+    with track_memory(top_allocations=5) as memory:
+        convert_data(buf)
+    print(memory.net_mb, memory.peak_mb, memory.top_allocations)
+"""
+import contextlib
+import threading
+import tracemalloc
+from typing import Iterator, Optional
+
+__all__ = (
+    'CallMemory',
+    'track_memory',
+)
+
+_lock = threading.RLock()
+_running: list["CallMemory"] = []  # calls of all threads
+_local = threading.local()  # .stack holds the calls of the current thread, innermost last
+_owns_tracing: bool = False
+
+
+class CallMemory:
+    """ Memory results of one call, filled in when the call returns """
+
+    def __init__(self, start: int) -> None:
+        self.start: int = start
+        self.highest: int = start
+        self.net: int = 0
+        self.peak: int = 0
+        self.top_allocations: list[dict] = []
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def net_mb(self) -> float:
+        return self.net / 1024 / 1024
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 1024 / 1024
+
+    def as_dict(self) -> dict:
+        result = {"memory_net": round(self.net_mb, 4), "memory_peak": round(self.peak_mb, 4)}
+        if self.top_allocations:
+            result["top_allocations"] = self.top_allocations
+        return result
+
+
+def _stack() -> list[CallMemory]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+
+@contextlib.contextmanager
+def track_memory(top_allocations: int = 0) -> Iterator[CallMemory]:
+    """
+    Measures net and peak allocation of the code in the with block
+
+    :param top_allocations: number of allocation sites (by line) to report, 0 skips the snapshots
+    """
+    global _owns_tracing
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        for running in _running:
+            running.highest = max(running.highest, peak)
+        tracemalloc.reset_peak()
+        memory = CallMemory(current)
+        _running.append(memory)
+        _stack().append(memory)
+    if top_allocations:
+        memory.snapshot = _snapshot()
+    try:
+        yield memory
+    finally:
+        after = _snapshot() if top_allocations else None
+        with _lock:
+            current, peak = tracemalloc.get_traced_memory()
+            memory.highest = max(memory.highest, peak)
+            _running.remove(memory)
+            stack = _stack()
+            stack.remove(memory)
+            if stack:
+                stack[-1].highest = max(stack[-1].highest, memory.highest)
+            if not _running and _owns_tracing:
+                tracemalloc.stop()
+                _owns_tracing = False
+        memory.net = current - memory.start
+        memory.peak = memory.highest - memory.start
+        if after is not None:
+            memory.top_allocations = [
+                {
+                    "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_diff_kb": round(stat.size_diff / 1024, 2),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in after.compare_to(memory.snapshot, "lineno")[:top_allocations]
+            ]
+            memory.snapshot = None
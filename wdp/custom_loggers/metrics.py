@@ -0,0 +1,295 @@
+"""
+In-process metrics registry fed by the profiler.
+
+The registry holds counters and latency histograms keyed by metric name and labels. Histograms use HDR-style
+log-linear buckets: values are recorded in whole microseconds, the first 128 microseconds get one bucket each and
+every further power of two is split into 64 buckets, so any percentile is accurate to about 1.6% while a histogram
+takes at most a few hundred integers no matter how many values it has seen.
+
+Every @profile call is recorded with REGISTRY.observe_call, which updates:
+    wdp_function_calls_total{function="..."}              - number of calls
+    wdp_function_time_seconds_total{function="..."}       - cumulative wall time
+    wdp_function_duration_seconds{function="..."}         - latency histogram
+
+Usage:
+    from wdp.custom_loggers.metrics import REGISTRY
+
+    REGISTRY.snapshot()                         # current values with p50/p90/p95/p99 of every histogram
+    REGISTRY.histogram("wdp_function_duration_seconds", function="convert_data").percentile(95)
+
+    A MetricsExporter thread appends window snapshots (values and histogram buckets of the last interval) to the
+    profiler JSON lines file every METRICS_EXPORT_INTERVAL seconds, so percentiles over any time range can be
+    computed later with window_percentiles().
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+__all__ = (
+    'Counter',
+    'Histogram',
+    'MetricsRegistry',
+    'MetricsExporter',
+    'REGISTRY',
+    'window_percentiles',
+)
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKET_COUNT = SUB_BUCKET_COUNT >> 1
+UNITS_PER_SECOND = 1_000_000
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def bucket_index(value: int) -> int:
+    """ Index of the HDR bucket holding a value given in microseconds """
+    if value < SUB_BUCKET_COUNT:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * HALF_SUB_BUCKET_COUNT + (value >> shift) - HALF_SUB_BUCKET_COUNT
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """ Lowest and highest value (in microseconds) falling into the bucket """
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index - SUB_BUCKET_COUNT) // HALF_SUB_BUCKET_COUNT + 1
+    mantissa = (index - SUB_BUCKET_COUNT) % HALF_SUB_BUCKET_COUNT + HALF_SUB_BUCKET_COUNT
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Counter:
+    """ Monotonic counter """
+
+    def __init__(self) -> None:
+        self.value: float = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """ Latency histogram with HDR-style log-linear buckets, values in seconds """
+
+    def __init__(self) -> None:
+        self.buckets: dict[int, int] = {}
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bucket_index(int(seconds * UNITS_PER_SECOND))
+        with self._lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """ Value in seconds below which the given percent of observations fall, None when empty """
+        with self._lock:
+            buckets = sorted(self.buckets.items())
+            count, highest = self.count, self.max
+        if not count:
+            return None
+        rank = min(count, max(1, math.ceil(percent / 100 * count)))
+        seen = 0
+        for index, bucket_count in buckets:
+            seen += bucket_count
+            if seen >= rank:
+                value = bucket_bounds(index)[1] / UNITS_PER_SECOND
+                return min(value, highest) if highest is not None else value
+        return highest
+
+    def count_below(self, seconds: float) -> int:
+        """
+        Estimated number of observations not above the given value. Buckets below it count in full, the bucket
+        holding it counts in proportion to the part of its range that is not above the value (its observations are
+        assumed to be spread evenly), the total is rounded to a whole number
+        """
+        limit = int(seconds * UNITS_PER_SECOND)
+        total = 0.0
+        with self._lock:
+            for index, count in self.buckets.items():
+                low, high = bucket_bounds(index)
+                if high <= limit:
+                    total += count
+                elif low <= limit:
+                    total += count * (limit - low + 1) / (high - low + 1)
+        return round(total)
+
+    def copy(self) -> "Histogram":
+        copied = Histogram()
+        with self._lock:
+            copied.buckets = dict(self.buckets)
+            copied.count, copied.sum, copied.min, copied.max = self.count, self.sum, self.min, self.max
+        return copied
+
+    def subtract(self, earlier: "Histogram") -> "Histogram":
+        """ Observations made since the earlier copy of this histogram (min and max are bucket estimates) """
+        window = Histogram()
+        for index, count in self.buckets.items():
+            difference = count - earlier.buckets.get(index, 0)
+            if difference > 0:
+                window.buckets[index] = difference
+        window.count = self.count - earlier.count
+        window.sum = self.sum - earlier.sum
+        if window.buckets:
+            window.min = bucket_bounds(min(window.buckets))[0] / UNITS_PER_SECOND
+            window.max = bucket_bounds(max(window.buckets))[1] / UNITS_PER_SECOND
+        return window
+
+    def merge(self, buckets: dict[int, int], total: float = 0.0) -> None:
+        """ Adds bucket counts, e.g. read back from an exported snapshot """
+        with self._lock:
+            for index, count in buckets.items():
+                index = int(index)
+                self.buckets[index] = self.buckets.get(index, 0) + count
+                self.count += count
+                low, high = bucket_bounds(index)
+                self.min = low / UNITS_PER_SECOND if self.min is None else min(self.min, low / UNITS_PER_SECOND)
+                self.max = high / UNITS_PER_SECOND if self.max is None else max(self.max, high / UNITS_PER_SECOND)
+            self.sum += total
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict[str, Any]:
+        result: dict[str, Any] = {"count": self.count, "sum": round(self.sum, 6), "min": self.min, "max": self.max}
+        for percent in percentiles:
+            result[f"p{percent:g}"] = self.percentile(percent)
+        return result
+
+
+MetricKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class MetricsRegistry:
+    """ Named counters and histograms with optional labels """
+
+    def __init__(self) -> None:
+        self.counters: dict[MetricKey, Counter] = {}
+        self.histograms: dict[MetricKey, Histogram] = {}
+        self.descriptions: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, labels: dict[str, Any]) -> MetricKey:
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def describe(self, name: str, description: str) -> None:
+        """ Sets the help text of a metric """
+        self.descriptions[name] = description
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        key = self.key(name, labels)
+        counter = self.counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(key, Counter())
+        return counter
+
+    def histogram(self, name: str, **labels: Any) -> Histogram:
+        key = self.key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe_call(self, function_name: str, seconds: float) -> None:
+        """ Records one call of a profiled function """
+        self.counter("wdp_function_calls_total", function=function_name).inc()
+        self.counter("wdp_function_time_seconds_total", function=function_name).inc(seconds)
+        self.histogram("wdp_function_duration_seconds", function=function_name).observe(seconds)
+
+    def snapshot(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict[str, Any]:
+        """ Current values of all counters and summaries of all histograms """
+        with self._lock:
+            counters = list(self.counters.items())
+            histograms = list(self.histograms.items())
+        return {
+            "timestamp": time.time(),
+            "counters": [{"name": name, "labels": dict(labels), "value": counter.value}
+                         for (name, labels), counter in counters],
+            "histograms": [{"name": name, "labels": dict(labels), **histogram.summary(percentiles)}
+                           for (name, labels), histogram in histograms],
+        }
+
+
+class MetricsExporter(threading.Thread):
+    """ Daemon thread passing window snapshots of a registry's histograms to a sink every interval """
+
+    def __init__(self, registry: MetricsRegistry, sink: Callable[[dict], Any], interval: float) -> None:
+        super().__init__(name="wdp-metrics-exporter", daemon=True)
+        self.registry = registry
+        self.sink = sink
+        self.interval = interval
+        self._previous: dict[MetricKey, Histogram] = {}
+        self._previous_time = time.time()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.export()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def export(self) -> list[dict]:
+        """ Sends one {"metrics_snapshot": ...} entry per histogram that changed since the previous export """
+        with self._lock:
+            now = time.time()
+            entries = []
+            for key, histogram in list(self.registry.histograms.items()):
+                current = histogram.copy()
+                window = current.subtract(self._previous.get(key, Histogram()))
+                self._previous[key] = current
+                if not window.count:
+                    continue
+                name, labels = key
+                entries.append({"metrics_snapshot": {
+                    "timestamp": now,
+                    "window_start": self._previous_time,
+                    "name": name,
+                    "labels": dict(labels),
+                    **window.summary(),
+                    "buckets": window.buckets,
+                }})
+            self._previous_time = now
+        for entry in entries:
+            self.sink(entry)
+        return entries
+
+
+def window_percentiles(entries: Iterable[dict], function_name: str, since: float = 0.0,
+                       until: Optional[float] = None, percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+                       name: str = "wdp_function_duration_seconds") -> dict[str, Any]:
+    """
+    Merges exported window snapshots of one function's latency histogram and summarises them, e.g. the p95 of
+    convert_data over the last hour: window_percentiles(read_profiler_logs(), "convert_data", time.time() - 3600)
+
+    :param entries: profiler JSON lines entries
+    :param function_name: function label of the histogram
+    :param since: earliest window end (unix timestamp) taken into account
+    :param until: latest window end taken into account, None for no limit
+    """
+    merged = Histogram()
+    for entry in entries:
+        snapshot = entry.get("metrics_snapshot") if isinstance(entry, dict) else None
+        if not snapshot or snapshot.get("name") != name or snapshot["labels"].get("function") != function_name:
+            continue
+        if snapshot["timestamp"] < since or (until is not None and snapshot["timestamp"] > until):
+            continue
+        merged.merge(snapshot["buckets"], snapshot.get("sum", 0.0))
+    return merged.summary(percentiles)
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("wdp_function_calls_total", "Number of calls of profiled functions")
+REGISTRY.describe("wdp_function_time_seconds_total", "Cumulative wall time of profiled functions")
+REGISTRY.describe("wdp_function_duration_seconds", "Wall time of profiled function calls")
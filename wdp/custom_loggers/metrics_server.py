@@ -0,0 +1,161 @@
+"""
+Prometheus / OpenMetrics endpoint for the metrics registry.
+
+Serves everything recorded in metrics.REGISTRY - profiled function calls, data converter throughput and database
+call latencies - in the text exposition format from a small HTTP server running in a daemon thread, so monitoring
+can scrape ingestion rate and latency instead of parsing log files. Scrapers asking for
+application/openmetrics-text get the OpenMetrics flavour, everyone else the Prometheus 0.0.4 text format.
+
+Histograms are exposed with the cumulative buckets given in METRICS_BUCKETS (seconds). They are derived from the
+registry's HDR histograms at scrape time, so the bucket layout can be changed without touching the recording side.
+A bound falling inside an HDR bucket gets a share of that bucket's count in proportion to the part of its range below
+the bound.
+
+Usage:
+    Set METRICS_SERVER = True in config.py to start the endpoint when the package is imported, or start it yourself:
+
+    from wdp.custom_loggers import start_metrics_server, stop_metrics_server
+
+    start_metrics_server(port=9464)     # http://127.0.0.1:9464/metrics
+    stop_metrics_server()
+"""
+import http.server
+import threading
+from typing import Iterable, Optional
+
+from wdp.custom_loggers import config
+from wdp.custom_loggers.metrics import REGISTRY, MetricsRegistry
+
+__all__ = (
+    'render_metrics',
+    'MetricsServer',
+    'start_metrics_server',
+    'stop_metrics_server',
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_server: Optional["MetricsServer"] = None
+_server_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Iterable[tuple[str, str]], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(registry: MetricsRegistry = REGISTRY, buckets: Iterable[float] = config.METRICS_BUCKETS,
+                   openmetrics: bool = False) -> str:
+    """
+    Renders all counters and histograms of the registry in the text exposition format
+
+    :param registry: registry to render
+    :param buckets: upper bounds (seconds) of the cumulative histogram buckets, +Inf is always added
+    :param openmetrics: renders the OpenMetrics flavour (counter families without _total, trailing # EOF)
+    """
+    bounds = sorted(buckets)
+    families: dict[str, list] = {}
+    for (name, labels), counter in sorted(registry.counters.items()):
+        families.setdefault(name, []).append((labels, counter))
+    lines = []
+    for name, series in families.items():
+        family = name[:-len("_total")] if openmetrics and name.endswith("_total") else name
+        if name in registry.descriptions:
+            lines.append(f"# HELP {family} {_escape(registry.descriptions[name])}")
+        lines.append(f"# TYPE {family} counter")
+        for labels, counter in series:
+            lines.append(f"{name}{_labels(labels)} {_number(counter.value)}")
+
+    families = {}
+    for (name, labels), histogram in sorted(registry.histograms.items()):
+        families.setdefault(name, []).append((labels, histogram.copy()))
+    for name, series in families.items():
+        if name in registry.descriptions:
+            lines.append(f"# HELP {name} {_escape(registry.descriptions[name])}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series:
+            for bound in bounds:
+                lines.append(f"{name}_bucket{_labels(labels, le=_number(float(bound)))} {histogram.count_below(bound)}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(float(histogram.sum))}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = render_metrics(self.registry, openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class MetricsServer(threading.Thread):
+    """ Daemon thread serving the registry on http://host:port/metrics """
+
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = REGISTRY) -> None:
+        super().__init__(name="wdp-metrics-server", daemon=True)
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self.httpd = http.server.ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    def run(self) -> None:
+        self.httpd.serve_forever()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_metrics_server(host: str = config.METRICS_SERVER_HOST, port: int = config.METRICS_SERVER_PORT,
+                         registry: MetricsRegistry = REGISTRY) -> MetricsServer:
+    """ Starts the metrics endpoint, or returns the running one. Port 0 picks a free port (see .address) """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = MetricsServer(host, port, registry)
+            _server.start()
+        return _server
+
+
+def stop_metrics_server() -> None:
+    """ Stops the metrics endpoint started with start_metrics_server """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.stop()
+            _server = None
+
+
+if config.METRICS_SERVER:
+    start_metrics_server()
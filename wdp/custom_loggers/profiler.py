@@ -18,23 +18,56 @@ Usage:
     def my_function(arg1, arg2):
         pass
 
-    Profiler saves data by default to json file and prints it to the console, but it also can dump readable
-    logs to text file and plot the most important values exporting it to png file.
+    Profiler saves data by default to an append-only JSON lines file and prints it to the console, but it also can
+    dump readable logs to text file and plot the most important values exporting it to png file.
+
+    Saved results can be streamed back with read_profiler_logs():
+
+    for entry in read_profiler_logs():
+        print(entry["captured_data"]["function_name"])
+
+    Profiling every call with cProfile is expensive. For long-running code set PROFILER_MODE in config.py to
+    "sampled" (cProfile runs only for PROFILER_SAMPLE_RATE of the calls) or "stack" (a background thread samples
+    stacks every PROFILER_STACK_INTERVAL seconds). Both modes aggregate results in memory and append a summary
+    per function every PROFILER_FLUSH_INTERVAL seconds, see sampling_profiler.py.
+
+    Besides process RSS, every profiled call reports the memory it allocated (net) and its peak allocation, measured
+    with tracemalloc (PROFILER_TRACE_MEMORY). Set PROFILER_TOP_ALLOCATIONS to also list the source lines that
+    allocated the most, see memory_tracker.py.
+
+    In every mode calls also feed the in-process metrics registry (call counts, cumulative time and latency
+    histograms, see metrics.py). Histogram snapshots are appended every METRICS_EXPORT_INTERVAL seconds and at exit,
+    or on demand with export_metrics(), and plot() charts p50/p95/p99 latency over time from them.
 
     You can customise behaviour and change log path in a config.py file
 """
+import atexit
 import cProfile
 import pstats
-import json
+import random
+import threading
+import time
 import psutil
 import os
 import functools
+import contextlib
 import datetime
 import matplotlib.pyplot as plt
-from typing import Any, Callable
+from typing import Any, Callable, Iterable, Iterator, Optional
 import wdp.custom_loggers.config as config
+from wdp.custom_loggers.profiler_store import NDJSONStore
+from wdp.custom_loggers.sampling_profiler import ProfileAggregator, StackSampler
+from wdp.custom_loggers.memory_tracker import CallMemory, track_memory
+from wdp.custom_loggers.metrics import REGISTRY, Histogram, MetricsExporter
 
 profiling_enabled: bool = config.PROFILING_ENABLED
+profiler_mode: str = config.PROFILER_MODE
+sample_rate: float = config.PROFILER_SAMPLE_RATE
+stack_interval: float = config.PROFILER_STACK_INTERVAL
+trace_memory: bool = config.PROFILER_TRACE_MEMORY
+top_allocations: int = config.PROFILER_TOP_ALLOCATIONS
+metrics_enabled: bool = config.METRICS_ENABLED
+metrics_export_interval: float = config.METRICS_EXPORT_INTERVAL
 
 console_profiler: bool = config.CONSOLE_PROFILER
 txt_profiler: bool = config.TXT_PROFILER
@@ -43,6 +76,7 @@ plot_profiler: bool = config.PLOT_PROFILER
 
 TXT_PROFILER_PATH: str = config.PROFILER_TXT_PROFILER_PATH
 JSON_PROFILER_PATH: str = config.PROFILER_JSON_PROFILER_PATH
+NDJSON_PROFILER_PATH: str = config.PROFILER_NDJSON_PROFILER_PATH
 PLOT_PROFILER_PATH: str = config.PROFILER_PLOT_PROFILER_PATH
 SUB_FOLDER: str = config.SUB_FOLDER
 sort_method: str = config.SORT_METHOD
@@ -51,6 +85,36 @@ dir_path = os.path.dirname(os.path.abspath(__file__))
 plot_profiler_path = os.path.join(dir_path, SUB_FOLDER, PLOT_PROFILER_PATH)
 json_profiler_path = os.path.join(dir_path, SUB_FOLDER, JSON_PROFILER_PATH)
 txt_profiler_path = os.path.join(dir_path, SUB_FOLDER, TXT_PROFILER_PATH)
+ndjson_profiler_path = os.path.join(dir_path, SUB_FOLDER, NDJSON_PROFILER_PATH)
+
+profiler_store = NDJSONStore(
+    ndjson_profiler_path,
+    max_bytes=config.PROFILER_NDJSON_MAX_BYTES,
+    backup_count=config.PROFILER_NDJSON_BACKUP_COUNT,
+    legacy_path=json_profiler_path,
+)
+
+aggregator = ProfileAggregator(
+    lambda summary: profiler_store.append(summary) if json_profiler else None,
+    flush_interval=config.PROFILER_FLUSH_INTERVAL,
+    top_entries=config.PROFILER_TOP_ENTRIES,
+    sort_method=sort_method,
+    stack_interval=stack_interval,
+)
+atexit.register(aggregator.flush)
+
+metrics_exporter = MetricsExporter(
+    REGISTRY,
+    lambda entry: profiler_store.append(entry) if json_profiler else None,
+    interval=metrics_export_interval,
+)
+atexit.register(metrics_exporter.export)
+
+_sampling = threading.local()
+_stack_sampler_lock = threading.Lock()
+_stack_sampler: StackSampler | None = None
+_metrics_exporter_lock = threading.Lock()
+_metrics_exporter_started: bool = False
 
 
 def get_time():
@@ -60,18 +124,30 @@ def get_time():
     return now_str, timestamp
 
 
-def print_to_console(func: Callable, memory: float, stats: pstats.Stats) -> None:
+def describe_call_memory(call_memory: Optional[CallMemory]) -> str:
+    """ Readable lines with net and peak allocation of a call and its top allocation sites """
+    if call_memory is None:
+        return ""
+    lines = [f"Allocated (net): {call_memory.net_mb:.4f} MB, peak: {call_memory.peak_mb:.4f} MB"]
+    for allocation in call_memory.top_allocations:
+        lines.append(f"    {allocation['site']}: {allocation['size_diff_kb']} KB in {allocation['count_diff']} blocks")
+    return "\n".join(lines) + "\n"
+
+
+def print_to_console(func: Callable, memory: float, stats: pstats.Stats,
+                     call_memory: Optional[CallMemory] = None) -> None:
     """ Prints profiler statistics and memory usage to console """
     now_str = get_time()[0]
     print("=" * 10, f"Stats for function: {func.__name__}", "=" * 10)
     stats.strip_dirs()
     stats.sort_stats(sort_method).print_stats()
-    print(f"Memory usage: {memory:.2f} MB\n")
+    print(f"Memory usage: {memory:.2f} MB")
+    print(describe_call_memory(call_memory))
     print("=" * 10, f"Generated {now_str}", "=" * 10)
 
 
-def log_to_json(func: Callable, memory: float, stats: pstats.Stats) -> None:
-    """ Logs profiler statistics and memory usage to a JSON file """
+def log_to_json(func: Callable, memory: float, stats: pstats.Stats, call_memory: Optional[CallMemory] = None) -> None:
+    """ Appends profiler statistics and memory usage to the JSON lines file """
     now_str = get_time()[0]
     timestamp = get_time()[1]
     string = {
@@ -84,21 +160,18 @@ def log_to_json(func: Callable, memory: float, stats: pstats.Stats) -> None:
             'calls': stats.total_calls,
         }
     }
-    try:
-        with open(json_profiler_path, mode="r") as file:
-            try:
-                data = json.load(file)
-            except json.decoder.JSONDecodeError:
-                data = []
-    except FileNotFoundError:
-        data = []
-    finally:
-        data.append(string)
-        with open(json_profiler_path, mode="w") as file:
-            json.dump(data, file, indent=4)
+    if call_memory is not None:
+        string["captured_data"].update(call_memory.as_dict())
+    profiler_store.append(string)
+
 
+def read_profiler_logs(include_rotated: bool = True) -> Iterator[dict]:
+    """ Streams saved profiler entries, oldest first, including rotated files and the legacy JSON file """
+    return profiler_store.read(include_rotated=include_rotated)
 
-def log_to_txt(profiler: cProfile.Profile, memory: float, func: Callable) -> None:
+
+def log_to_txt(profiler: cProfile.Profile, memory: float, func: Callable,
+               call_memory: Optional[CallMemory] = None) -> None:
     """ Logs profiler statistics and memory usage to a text file """
     now_str = get_time()[0]
     with open(txt_profiler_path, 'a') as file:
@@ -107,50 +180,147 @@ def log_to_txt(profiler: cProfile.Profile, memory: float, func: Callable) -> Non
         file.write("\n" + "=" * 30 + f" Stats for function: {func.__name__} " + "=" * 30 + "\n")
         stats.sort_stats(sort_method).print_stats()
         file.write(f"Memory usage: {memory:.2f} MB\n")
+        file.write(describe_call_memory(call_memory))
         file.write("=" * 30 + f" Generated {now_str} " + "=" * 30 + "\n")
 
 
+def percentile_series(entries: Iterable[dict], window: float = 60.0) -> dict[str, list[tuple]]:
+    """
+    Latency percentiles over time per function: (window end, calls, p50, p95, p99) tuples built from exported
+    metrics snapshots, or from per-call entries grouped into windows for functions without snapshots
+    """
+    snapshots: dict[str, list] = {}
+    per_call: dict[str, dict[int, Histogram]] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        snapshot = entry.get("metrics_snapshot")
+        if snapshot and snapshot.get("name") == "wdp_function_duration_seconds":
+            snapshots.setdefault(snapshot["labels"].get("function"), []).append(
+                (snapshot["timestamp"], snapshot["count"], snapshot.get("p50"), snapshot.get("p95"), snapshot.get("p99"))
+            )
+            continue
+        captured = entry.get("captured_data", {})
+        if all(key in captured for key in ["timestamp", "function_name", "time_usage"]):
+            windows = per_call.setdefault(captured["function_name"], {})
+            histogram = windows.setdefault(int(captured["timestamp"] // window), Histogram())
+            histogram.observe(captured["time_usage"])
+    series = {name: sorted(points) for name, points in snapshots.items()}
+    for name, windows in per_call.items():
+        if name in series:
+            continue
+        series[name] = [
+            ((index + 1) * window, histogram.count,
+             histogram.percentile(50), histogram.percentile(95), histogram.percentile(99))
+            for index, histogram in sorted(windows.items())
+        ]
+    return series
+
+
 def plot() -> None:
-    """ Creates a plot based on the profiling results """
-    if not os.path.exists(json_profiler_path):
-        print("Cannot plot. Profiler data file does not exist")
+    """ Plots p50/p95/p99 latency and number of calls over time for every profiled function """
+    series = percentile_series(read_profiler_logs(), metrics_export_interval or 60.0)
+    if not series:
+        print("Cannot plot. Profiler data file does not exist, is empty or does not contain valid keys")
         return
 
-    with open(json_profiler_path, "r") as f:
-        try:
-            data = json.load(f)
-            if not all(key in data[0]["captured_data"] for key in ["function_name", "memory_usage", "time_usage", "calls"]):
-                print("Cannot plot. Profiler data file does not contain valid keys")
-                return
-        except (json.JSONDecodeError, IndexError):
-            print("Cannot plot. Profiler data file is empty or corrupted")
-            return
-
-    memory_data = [(entry["captured_data"]["function_name"], entry["captured_data"]["memory_usage"]) for entry in data]
-    time_data = [(entry["captured_data"]["function_name"], entry["captured_data"]["time_usage"]) for entry in data]
-    calls_data = [(entry["captured_data"]["function_name"], entry["captured_data"]["calls"]) for entry in data]
-
-    fig, (ax1, ax2, ax3) = plt.subplots(3, figsize=(10, 10))
-
-    ax1.plot([entry[0] for entry in memory_data], [entry[1] for entry in memory_data], 'o-')
-    ax1.set_title("Memory Usage")
+    fig, (ax1, ax2) = plt.subplots(2, figsize=(10, 10))
+
+    for name, points in series.items():
+        times = [datetime.datetime.fromtimestamp(point[0]) for point in points]
+        line, = ax1.plot(times, [point[2] for point in points], 'o-', label=f"{name} p50")
+        ax1.plot(times, [point[3] for point in points], '--', color=line.get_color(), label=f"{name} p95")
+        ax1.plot(times, [point[4] for point in points], ':', color=line.get_color(), label=f"{name} p99")
+        ax2.plot(times, [point[1] for point in points], 'o-', color=line.get_color(), label=name)
+
+    ax1.set_title("Latency Percentiles")
     ax1.set_xlabel("Time")
-    ax1.set_ylabel("Memory Usage (MB)")
+    ax1.set_ylabel("Time (s)")
+    ax1.legend(fontsize="small")
 
-    ax2.plot([entry[0] for entry in time_data], [entry[1] for entry in time_data], 'o-')
-    ax2.set_title("Time Usage")
+    ax2.set_title("Number of Function Calls")
     ax2.set_xlabel("Time")
-    ax2.set_ylabel("Time (s)")
-
-    ax3.plot([entry[0] for entry in calls_data], [entry[1] for entry in calls_data], 'o-')
-    ax3.set_title("Number of Function Calls")
-    ax3.set_xlabel("Time")
-    ax3.set_ylabel("Number of Calls")
+    ax2.set_ylabel("Calls per window")
+    ax2.legend(fontsize="small")
 
+    fig.autofmt_xdate()
     plt.tight_layout()
     plt.savefig(plot_profiler_path)
 
 
+def get_stack_sampler() -> StackSampler:
+    """ Returns the stack sampling thread, starting it on first use """
+    global _stack_sampler
+    if _stack_sampler is None:
+        with _stack_sampler_lock:
+            if _stack_sampler is None:
+                _stack_sampler = StackSampler(aggregator, stack_interval)
+                _stack_sampler.start()
+    return _stack_sampler
+
+
+def record_metrics(func: Callable, elapsed: float) -> None:
+    """ Adds the call to the metrics registry and starts the periodic snapshot export on first use """
+    global _metrics_exporter_started
+    if not metrics_enabled:
+        return
+    REGISTRY.observe_call(func.__qualname__, elapsed)
+    if not _metrics_exporter_started and metrics_export_interval > 0:
+        with _metrics_exporter_lock:
+            if not _metrics_exporter_started:
+                metrics_exporter.start()
+                _metrics_exporter_started = True
+
+
+def export_metrics() -> list[dict]:
+    """ Appends latency histogram snapshots of the calls made since the previous export """
+    return metrics_exporter.export()
+
+
+def memory_tracking() -> contextlib.AbstractContextManager[Optional[CallMemory]]:
+    """ tracemalloc measurement of the call when PROFILER_TRACE_MEMORY is enabled, otherwise a no-op """
+    if trace_memory:
+        return track_memory(top_allocations)
+    return contextlib.nullcontext()
+
+
+def sampled_call(func: Callable, args: tuple, kwargs: dict) -> Any:
+    """ Runs cProfile for a random fraction of calls and times the rest, results go to the aggregator """
+    profiler = None
+    call_memory = None
+    if not getattr(_sampling, "active", False) and random.random() < sample_rate:
+        profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        if profiler is None:
+            return func(*args, **kwargs)
+        _sampling.active = True
+        try:
+            with memory_tracking() as call_memory:
+                return profiler.runcall(func, *args, **kwargs)
+        finally:
+            _sampling.active = False
+    finally:
+        elapsed = time.perf_counter() - start
+        aggregator.record_call(func.__qualname__, elapsed, profiler, call_memory)
+        record_metrics(func, elapsed)
+        aggregator.maybe_flush()
+
+
+def stack_sampled_call(func: Callable, args: tuple, kwargs: dict) -> Any:
+    """ Times the call and lets the stack sampling thread see it while it runs """
+    sampler = get_stack_sampler()
+    sampler.enter(func.__qualname__, getattr(func, "__code__", None))
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sampler.exit()
+        elapsed = time.perf_counter() - start
+        aggregator.record_call(func.__qualname__, elapsed)
+        record_metrics(func, elapsed)
+
+
 def profile(func) -> Callable:
     """Decorator that profiles the execution of a function
 
@@ -162,17 +332,24 @@ def profile(func) -> Callable:
     """
     @functools.wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if profiling_enabled and profiler_mode == "sampled":
+            return sampled_call(func, args, kwargs)
+        if profiling_enabled and profiler_mode == "stack":
+            return stack_sampled_call(func, args, kwargs)
         if profiling_enabled:
             profiler = cProfile.Profile()
-            result = profiler.runcall(func, *args, **kwargs)
+            start = time.perf_counter()
+            with memory_tracking() as call_memory:
+                result = profiler.runcall(func, *args, **kwargs)
+            record_metrics(func, time.perf_counter() - start)
             stats = pstats.Stats(profiler)
             memory_usage = psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
             if console_profiler:
-                print_to_console(func, memory_usage, stats)
+                print_to_console(func, memory_usage, stats, call_memory)
             if txt_profiler:
-                log_to_txt(profiler, memory_usage, func)
+                log_to_txt(profiler, memory_usage, func, call_memory)
             if json_profiler:
-                log_to_json(func, memory_usage, stats)
+                log_to_json(func, memory_usage, stats, call_memory)
             if plot_profiler:
                 plot()
         else:
@@ -0,0 +1,112 @@
+"""
+Append-only JSON lines storage for profiler results.
+
+Every entry is serialised to a single line and appended with one write to a file opened in append mode, so adding
+an entry costs the same no matter how long the history is, and several processes can write to the same file
+without corrupting it. When the file grows past max_bytes it is rotated like logging's RotatingFileHandler:
+profiler_logs.ndjson -> profiler_logs.ndjson.1 -> ... -> profiler_logs.ndjson.<backup_count>.
+
+With rotation, the size check, rotation and write hold an exclusive lock on <path>.lock (fcntl.flock), so
+processes sharing the file don't rotate it twice. Where fcntl is missing (Windows) the lock only covers the
+threads of one process, so a rotating store must then be written by a single process.
+
+Usage:
+    from wdp.custom_loggers.profiler_store import NDJSONStore
+
+    store = NDJSONStore("profiler_logs.ndjson")
+    store.append({"captured_data": {...}})
+    for entry in store.read():      # oldest first, rotated files included
+        ...
+"""
+import contextlib
+import json
+import os
+import threading
+from typing import Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+__all__ = (
+    'NDJSONStore',
+)
+
+
+class NDJSONStore:
+    def __init__(self, path: str, max_bytes: int = 0, backup_count: int = 0, legacy_path: Optional[str] = None):
+        """
+        :param path: path of the JSON lines file
+        :param max_bytes: size after which the file is rotated, 0 disables rotation
+        :param backup_count: number of rotated files kept
+        :param legacy_path: optional JSON array file (the old profiler format) read before the JSON lines files
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict[str, Any]) -> None:
+        """ Appends one entry as a single line """
+        data = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        rotating = self.max_bytes and self.backup_count
+        with self._lock, self._file_lock() if rotating else contextlib.nullcontext():
+            if rotating:
+                try:
+                    if os.path.getsize(self.path) + len(data) > self.max_bytes:
+                        self._rotate()
+                except FileNotFoundError:
+                    pass
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        # the size seen by one process stays valid until it wrote, no other process rotates in between
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{self.path}.lock", os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _rotate(self) -> None:
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def files(self) -> list[str]:
+        """ Existing JSON lines files, oldest first """
+        rotated = [f"{self.path}.{index}" for index in range(self.backup_count, 0, -1)]
+        return [path for path in rotated + [self.path] if os.path.exists(path)]
+
+    def read(self, include_rotated: bool = True) -> Iterator[dict[str, Any]]:
+        """
+        Streams entries back, oldest first. Lines that can't be parsed (e.g. cut off by a crash) are skipped
+
+        :param include_rotated: also read rotated files and the legacy JSON array
+        """
+        if include_rotated and self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r") as file:
+                try:
+                    yield from json.load(file)
+                except json.JSONDecodeError:
+                    pass
+        paths = self.files() if include_rotated else [self.path] if os.path.exists(self.path) else []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
@@ -0,0 +1,133 @@
+"""
+Sampling and rate-limiting filters for logging in hot loops.
+
+Each filter keeps a separate budget per call site (logger name, file and line), so a chatty line in a loop is
+thinned out without hiding other messages of the same logger. Suppressed records are counted, and the next record
+let through from the same call site carries a summary such as "[999 similar messages suppressed]".
+
+Filters:
+    EveryNFilter(n)              - lets through the 1st, (n+1)th, (2n+1)th ... record
+    IntervalFilter(seconds)      - lets through at most one record per interval
+    RateLimitFilter(rate, per)   - token bucket, at most `rate` records per `per` seconds with bursts up to `burst`
+
+Usage:
+    Attach a filter to a logger:
+
+    logger = logging.getLogger("scraper")
+    logger.addFilter(EveryNFilter(1000))
+
+    Or pass it to the @log decorator, in which case suppressed calls skip building the log record entirely:
+
+    @log(sampler=IntervalFilter(5.0))
+    def parse_record(record):
+        pass
+"""
+import abc
+import logging
+import threading
+import time
+from typing import Hashable, Optional
+
+__all__ = (
+    'SamplingFilter',
+    'EveryNFilter',
+    'IntervalFilter',
+    'RateLimitFilter',
+)
+
+
+class SamplingFilter(logging.Filter, abc.ABC):
+    """ Base class counting suppressed records per call site, subclasses decide in _allow """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.suppressed: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _allow(self, key: Hashable, now: float) -> bool:
+        """ Whether the occurrence of the key at monotonic time `now` is let through, called under the lock """
+
+    def check(self, key: Hashable) -> Optional[int]:
+        """
+        Decides about one occurrence of the key
+
+        :param key: identifies the call site
+        :return: None when the occurrence is suppressed, otherwise the number suppressed since the previous one
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._allow(key, now):
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return None
+            return self.suppressed.pop(key, 0)
+
+    def pending(self) -> dict[Hashable, int]:
+        """ Numbers of records suppressed since the last record let through, per call site """
+        with self._lock:
+            return dict(self.suppressed)
+
+    @staticmethod
+    def summary(count: int) -> str:
+        return f" [{count} similar messages suppressed]" if count else ""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        count = self.check((record.name, record.pathname, record.lineno))
+        if count is None:
+            return False
+        if count:
+            record.msg = f"{record.msg}{self.summary(count)}"
+        return True
+
+
+class EveryNFilter(SamplingFilter):
+    """ Lets through one record out of every n from the same call site """
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise ValueError("n must be a positive integer")
+        super().__init__()
+        self.n = n
+        self.seen: dict[Hashable, int] = {}
+
+    def _allow(self, key: Hashable, now: float) -> bool:
+        seen = self.seen.get(key, 0)
+        self.seen[key] = seen + 1
+        return seen % self.n == 0
+
+
+class IntervalFilter(SamplingFilter):
+    """ Lets through at most one record per interval (in seconds) from the same call site """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__()
+        self.interval = interval
+        self.last: dict[Hashable, float] = {}
+
+    def _allow(self, key: Hashable, now: float) -> bool:
+        last = self.last.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+        self.last[key] = now
+        return True
+
+
+class RateLimitFilter(SamplingFilter):
+    """ Token bucket allowing `rate` records per `per` seconds from the same call site, with bursts up to `burst` """
+
+    def __init__(self, rate: float, per: float = 1.0, burst: Optional[float] = None) -> None:
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate and per must be positive")
+        super().__init__()
+        self.refill = rate / per
+        self.capacity = burst if burst is not None else rate
+        self.buckets: dict[Hashable, tuple[float, float]] = {}
+
+    def _allow(self, key: Hashable, now: float) -> bool:
+        tokens, updated = self.buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return False
+        self.buckets[key] = (tokens - 1, now)
+        return True
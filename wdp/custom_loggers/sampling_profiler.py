@@ -0,0 +1,198 @@
+"""
+Low-overhead profiling modes for the @profile decorator.
+
+"sampled" mode runs cProfile only for a random fraction of calls (PROFILER_SAMPLE_RATE); all other calls just
+have their wall time measured. "stack" mode never runs cProfile: a background thread looks at the stacks of
+threads that are inside a profiled function every PROFILER_STACK_INTERVAL seconds and counts where they are.
+
+In both modes results are aggregated in memory per profiled function and written out as one summary every
+PROFILER_FLUSH_INTERVAL seconds (and at interpreter exit) instead of one report per call, which makes it cheap
+enough to keep profiling on in production.
+
+Summaries are appended to the profiler JSON lines file as {"aggregated_data": {...}} entries holding the call count,
+number of sampled calls, total and maximum wall time, and either the top cProfile entries ("sampled") or the most
+frequent stacks with their estimated time ("stack").
+"""
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from types import CodeType
+from typing import Any, Callable, Optional
+
+__all__ = (
+    'ProfileAggregator',
+    'StackSampler',
+)
+
+
+class _FunctionAggregate:
+    __slots__ = ("calls", "sampled_calls", "stack_samples", "total_time", "max_time", "max_memory_peak",
+                 "stats", "stacks")
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.sampled_calls: int = 0
+        self.stack_samples: int = 0
+        self.total_time: float = 0.0
+        self.max_time: float = 0.0
+        self.max_memory_peak: Optional[float] = None
+        self.stats: Optional[pstats.Stats] = None
+        self.stacks: collections.Counter = collections.Counter()
+
+
+class ProfileAggregator:
+    """ Collects per-function results between flushes """
+
+    def __init__(self, sink: Callable[[dict], Any], flush_interval: float, top_entries: int,
+                 sort_method: str = "cumulative", stack_interval: float = 0.0) -> None:
+        """
+        :param sink: callable receiving each flushed summary, e.g. NDJSONStore.append
+        :param flush_interval: seconds between automatic flushes
+        :param top_entries: number of cProfile entries / stacks kept per function in a summary
+        :param sort_method: pstats sort key used to pick the top cProfile entries
+        :param stack_interval: seconds between stack samples, used to estimate time spent in each stack
+        """
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.top_entries = top_entries
+        self.sort_method = sort_method
+        self.stack_interval = stack_interval
+        self._functions: dict[str, _FunctionAggregate] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _aggregate(self, name: str) -> _FunctionAggregate:
+        aggregate = self._functions.get(name)
+        if aggregate is None:
+            aggregate = self._functions[name] = _FunctionAggregate()
+        return aggregate
+
+    def record_call(self, name: str, elapsed: float, profiler: Optional[cProfile.Profile] = None,
+                    call_memory: Optional[Any] = None) -> None:
+        """ Adds one call, with its cProfile results and memory_tracker.CallMemory when the call was sampled """
+        with self._lock:
+            aggregate = self._aggregate(name)
+            aggregate.calls += 1
+            aggregate.total_time += elapsed
+            aggregate.max_time = max(aggregate.max_time, elapsed)
+            if profiler is not None:
+                aggregate.sampled_calls += 1
+                if aggregate.stats is None:
+                    aggregate.stats = pstats.Stats(profiler)
+                else:
+                    aggregate.stats.add(profiler)
+            if call_memory is not None:
+                aggregate.max_memory_peak = max(aggregate.max_memory_peak or 0.0, call_memory.peak_mb)
+
+    def record_stack(self, name: str, stack: str) -> None:
+        """ Adds one stack sample taken inside the function """
+        with self._lock:
+            aggregate = self._aggregate(name)
+            aggregate.stack_samples += 1
+            aggregate.stacks[stack] += 1
+
+    def maybe_flush(self) -> None:
+        """ Flushes if the flush interval has passed since the previous flush """
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> list[dict]:
+        """ Writes one summary per function to the sink and starts a new aggregation window """
+        with self._lock:
+            functions, self._functions = self._functions, {}
+            window = time.monotonic() - self._last_flush
+            self._last_flush = time.monotonic()
+        summaries = []
+        for name, aggregate in functions.items():
+            summary = {
+                "timestamp": time.time(),
+                "function_name": name,
+                "window_seconds": round(window, 3),
+                "calls": aggregate.calls,
+                "sampled_calls": aggregate.sampled_calls,
+                "total_time": round(aggregate.total_time, 6),
+                "max_time": round(aggregate.max_time, 6),
+            }
+            if aggregate.max_memory_peak is not None:
+                summary["max_memory_peak"] = round(aggregate.max_memory_peak, 4)
+            if aggregate.stats is not None:
+                summary["top_functions"] = self._top_functions(aggregate.stats)
+            if aggregate.stacks:
+                summary["stack_samples"] = aggregate.stack_samples
+                summary["top_stacks"] = [
+                    {"stack": stack, "samples": samples, "estimated_time": round(samples * self.stack_interval, 6)}
+                    for stack, samples in aggregate.stacks.most_common(self.top_entries)
+                ]
+            summaries.append({"aggregated_data": summary})
+            self.sink(summaries[-1])
+        return summaries
+
+    def _top_functions(self, stats: pstats.Stats) -> list[dict]:
+        stats.sort_stats(self.sort_method)
+        entries = []
+        for function in stats.fcn_list[:self.top_entries]:
+            _, calls, total_time, cumulative_time, _ = stats.stats[function]
+            entries.append({
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "total_time": round(total_time, 6),
+                "cumulative_time": round(cumulative_time, 6),
+            })
+        return entries
+
+
+class StackSampler(threading.Thread):
+    """ Daemon thread sampling the stacks of threads that are inside profiled functions """
+
+    def __init__(self, aggregator: ProfileAggregator, interval: float) -> None:
+        super().__init__(name="wdp-stack-sampler", daemon=True)
+        self.aggregator = aggregator
+        self.interval = interval
+        self._active: dict[int, list[tuple[str, CodeType]]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def enter(self, name: str, code: CodeType) -> None:
+        """ Marks the current thread as running the profiled function """
+        with self._lock:
+            self._active.setdefault(threading.get_ident(), []).append((name, code))
+
+    def exit(self) -> None:
+        """ Marks the end of the innermost profiled call of the current thread """
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._active.get(thread_id)
+            if stack:
+                stack.pop()
+                if not stack:
+                    del self._active[thread_id]
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+            self.aggregator.maybe_flush()
+
+    def sample(self) -> None:
+        """ Takes one sample of every thread currently inside a profiled function """
+        with self._lock:
+            active = {thread_id: stack[-1] for thread_id, stack in self._active.items()}
+        if not active:
+            return
+        frames = sys._current_frames()
+        for thread_id, (name, code) in active.items():
+            frame = frames.get(thread_id)
+            names = []
+            while frame is not None:
+                names.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                if frame.f_code is code:
+                    break
+                frame = frame.f_back
+            if frame is not None:
+                self.aggregator.record_stack(name, ";".join(reversed(names)))
@@ -0,0 +1,202 @@
+"""
+Non-blocking log shipping for custom_loggers.
+
+In queue mode the root logger gets a single handler that only puts records on a bounded queue. A background
+writer thread takes them off in batches and passes them to the real handlers (the file and console handlers
+from general.py), flushing each handler once per batch instead of once per record. Logging calls then never
+wait on disk or terminal I/O.
+
+When the queue is full, records are dropped (QUEUE_FULL_POLICY = "drop") or the caller waits up to
+QUEUE_BLOCK_TIMEOUT seconds for free space (QUEUE_FULL_POLICY = "block"). Dropped records are counted and
+reported when shipping stops.
+
+Usage:
+    Set QUEUE_LOGGING = True in config.py, or switch it on at runtime:
+
+    from wdp.custom_loggers import enable_queue_logging, disable_queue_logging
+
+    enable_queue_logging(max_size=50_000, policy="block")
+    ...
+    disable_queue_logging()  # writes out everything still queued and restores the original handlers
+
+    The writer thread is also stopped (and the queue drained) when the interpreter exits.
+"""
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Optional
+from wdp.custom_loggers import config
+
+__all__ = (
+    'BoundedQueueHandler',
+    'BatchingQueueListener',
+    'enable_queue_logging',
+    'disable_queue_logging',
+)
+
+POLICIES = ("drop", "block")
+
+_lock = threading.Lock()
+_listener: Optional["BatchingQueueListener"] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+_replaced_handlers: list[logging.Handler] = []
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """ Puts records on a bounded queue, dropping or blocking when it is full """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = config.QUEUE_FULL_POLICY,
+                 block_timeout: Optional[float] = config.QUEUE_BLOCK_TIMEOUT) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {POLICIES}")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped: int = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merges the arguments into the message, so the record shows the state at the time of the call, and leaves
+        the formatting (timestamps, tracebacks) to the writer thread. Works on a copy, other handlers of the
+        record's logger still get it unchanged
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """ Writer thread that handles queued records in batches and flushes its handlers once per batch """
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler,
+                 batch_size: int = config.QUEUE_BATCH_SIZE,
+                 stop_timeout: Optional[float] = config.QUEUE_STOP_TIMEOUT) -> None:
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = max(1, batch_size)
+        self.stop_timeout = stop_timeout
+
+    def enqueue_sentinel(self) -> None:
+        """ Waits for free space for the stop signal, a full queue raises queue.Full only after stop_timeout """
+        self.queue.put(self._sentinel, timeout=self.stop_timeout)
+
+    def _monitor(self) -> None:
+        log_queue = self.queue
+        has_task_done = hasattr(log_queue, "task_done")
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+            self.flush()
+            if has_task_done:
+                for _ in batch:
+                    log_queue.task_done()
+            if stop:
+                break
+
+    def handle(self, record: logging.LogRecord) -> None:
+        """ Writes the record to stream handlers without flushing, other handlers get it as usual """
+        for handler in self.handlers:
+            if record.levelno < handler.level or not handler.filter(record):
+                continue
+            stream = getattr(handler, "stream", None)
+            if not isinstance(handler, logging.StreamHandler) or stream is None:
+                handler.handle(record)
+                continue
+            try:
+                message = handler.format(record)
+                handler.acquire()
+                try:
+                    stream.write(message + handler.terminator)
+                finally:
+                    handler.release()
+            except Exception:
+                handler.handleError(record)
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass  # a failing flush must not kill the writer thread
+
+
+def enable_queue_logging(
+    max_size: int = config.QUEUE_MAX_SIZE,
+    policy: str = config.QUEUE_FULL_POLICY,
+    batch_size: int = config.QUEUE_BATCH_SIZE,
+    block_timeout: Optional[float] = config.QUEUE_BLOCK_TIMEOUT,
+) -> BatchingQueueListener:
+    """
+    Moves the root logger's handlers behind a bounded queue served by a background writer thread
+
+    :param max_size: maximum number of records waiting in the queue
+    :param policy: "drop" or "block", what to do with records when the queue is full
+    :param batch_size: maximum number of records written before handlers are flushed
+    :param block_timeout: seconds to wait for free space with the "block" policy, None waits forever
+    :return: the running listener
+    """
+    global _listener, _queue_handler, _replaced_handlers
+    with _lock:
+        if _listener is not None:
+            return _listener
+        root = logging.getLogger()
+        log_queue: queue.Queue = queue.Queue(maxsize=max_size)
+        _queue_handler = BoundedQueueHandler(log_queue, policy=policy, block_timeout=block_timeout)
+        _replaced_handlers = list(root.handlers)
+        _listener = BatchingQueueListener(log_queue, *_replaced_handlers, batch_size=batch_size)
+        for handler in _replaced_handlers:
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        _listener.start()
+        return _listener
+
+
+def disable_queue_logging() -> None:
+    """ Stops the writer thread after it has written all queued records and restores the original handlers """
+    global _listener, _queue_handler, _replaced_handlers
+    with _lock:
+        if _listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        try:
+            _listener.stop()
+        except queue.Full:
+            # the writer thread is stuck, it is left to finish the queue on its own (or die with the interpreter)
+            _listener._thread = None
+            pending = _listener.queue.qsize()
+        else:
+            pending = 0
+        for handler in _replaced_handlers:
+            root.addHandler(handler)
+        if _queue_handler.dropped:
+            root.warning("Queue logging dropped %d records because the queue was full", _queue_handler.dropped)
+        if pending:
+            root.warning("Queue logging could not stop its writer thread in time, %d records were still queued",
+                         pending)
+        _listener, _queue_handler, _replaced_handlers = None, None, []
+
+
+atexit.register(disable_queue_logging)
@@ -0,0 +1,76 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+import time
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.auditor import Auditor
+
+
+class TestAuditor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # cleanups run last in first out, the auditors are closed before their directory is removed
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = str(pathlib.Path(self.tmp_dir.name) / 'test_auditor.db')
+
+    def auditor(self, **kwargs):
+        auditor = Auditor(self.path, **kwargs)
+        self.addCleanup(auditor.close)
+        return auditor
+
+    def test_full_batch_is_stored_without_flush(self):
+        # a partial batch would wait a minute, a full one is stored right away
+        auditor = self.auditor(batch_size=3, flush_interval=60)
+        for employee_id in range(3):
+            auditor.record('jsmith', 'read', 'Employees.salary', employee_id)
+
+        deadline = time.monotonic() + 5
+        while auditor.count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(auditor.count(), 3)
+
+    def test_partial_batch_waits_for_interval(self):
+        auditor = self.auditor(batch_size=3, flush_interval=60)
+        auditor.record('jsmith', 'read', 'Employees.salary', 1)
+        time.sleep(0.2)
+
+        self.assertEqual(auditor.count(), 0)
+        self.assertTrue(auditor.flush(timeout=5))
+        self.assertEqual(auditor.count(), 1)
+
+    def test_close_stores_queued_events(self):
+        auditor = self.auditor(batch_size=100, flush_interval=60)
+        auditor.record('jsmith', 'read', 'Employees.salary', 1)
+        auditor.record('akowalski', 'export', 'Employees.salary')
+        auditor.close()
+
+        self.assertEqual(auditor.count(), 2)
+        # a closed auditor reopens the same store
+        self.assertEqual(self.auditor().count(user='akowalski'), 1)
+
+    def test_query_filters(self):
+        auditor = self.auditor()
+        auditor.record('jsmith', 'read', 'Employees.salary', 1, details={'view': 'dashboard'}, timestamp=100)
+        auditor.record('jsmith', 'read', 'Employees.salary', 2, timestamp=200)
+        auditor.record('akowalski', 'read', 'Employees.salary', 1, timestamp=300)
+        auditor.record('akowalski', 'update', 'Employees.salary', 1, timestamp=400)
+        auditor.record('akowalski', 'read', 'Employees.email', 1, timestamp=500)
+        auditor.flush(timeout=5)
+
+        self.assertEqual([event.timestamp for event in auditor.query(user='jsmith')], [200, 100])
+        self.assertEqual([event.user for event in auditor.query(resource='Employees.salary', resource_id=1)],
+                         ['akowalski', 'akowalski', 'jsmith'])
+        self.assertEqual([event.timestamp for event in auditor.query(action='read', since=200, until=500)],
+                         [300, 200])
+        self.assertEqual([event.timestamp for event in auditor.query(limit=2)], [500, 400])
+        self.assertEqual(auditor.count(user='akowalski', resource='Employees.salary'), 2)
+
+        event = auditor.query(since=100, until=101)[0]
+        self.assertEqual((event.user, event.resource_id, event.details), ('jsmith', '1', {'view': 'dashboard'}))
+        self.assertIsNone(auditor.query(user='jsmith', limit=1)[0].details)
+
+
+if __name__ == '__main__':
+    unittest.main()
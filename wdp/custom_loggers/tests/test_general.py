@@ -0,0 +1,56 @@
+import io
+import logging
+import unittest
+import pathlib
+import sys
+from unittest import mock
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers import general
+from wdp.custom_loggers.general import LazyArguments
+
+
+class Broken:
+
+    def __repr__(self):
+        raise RuntimeError('no repr')
+
+
+class TestLazyArguments(unittest.TestCase):
+
+    def test_format(self):
+        self.assertEqual(str(LazyArguments((1, 'a'), {'key': [2]})), "1, 'a', key=[2]")
+        self.assertEqual(str(LazyArguments((), {})), 'No args')
+
+    def test_unrepresentable_argument(self):
+        self.assertEqual(str(LazyArguments((Broken(), 1), {'other': Broken()})),
+                         '<unrepresentable Broken>, 1, other=<unrepresentable Broken>')
+
+
+class TestLogDecorator(unittest.TestCase):
+
+    def setUp(self):
+        # the root logger and the general log file are left alone
+        patcher = mock.patch.object(general, '_configured', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.logger = logging.getLogger('test_general')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+
+    def test_call_with_unrepresentable_argument_is_logged(self):
+        @general.log(new_logger=self.logger, message='parsing')
+        def parse(record):
+            return 'parsed'
+
+        self.assertEqual(parse(Broken()), 'parsed')
+        line, = self.stream.getvalue().splitlines()
+        self.assertIn('Message: parsing, Class: ', line)
+        self.assertIn('called with args: <unrepresentable Broken>, from module test_general', line)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import pathlib
+import sys
+import threading
+import tracemalloc
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.memory_tracker import track_memory
+
+MB = 1024 * 1024
+
+
+class TestTrackMemory(unittest.TestCase):
+
+    def assertAbout(self, value, expected, delta=0.1 * MB):
+        self.assertAlmostEqual(value, expected, delta=delta)
+
+    def test_kept_and_freed_allocations(self):
+        with track_memory() as memory:
+            kept = bytearray(8 * MB)
+            freed = bytearray(4 * MB)
+            del freed
+
+        self.assertAbout(memory.net, 8 * MB)
+        self.assertAbout(memory.peak, 12 * MB)
+        self.assertAlmostEqual(memory.as_dict()['memory_net'], 8, delta=0.1)
+        self.assertFalse(tracemalloc.is_tracing())
+        del kept
+
+    def test_nested_calls(self):
+        with track_memory() as parent:
+            with track_memory() as child:
+                data = bytearray(6 * MB)
+                del data
+            data = bytearray(2 * MB)
+
+        self.assertAbout(child.net, 0)
+        self.assertAbout(child.peak, 6 * MB)
+        # the child's peak is carried over into the parent, although the peak counter was reset for the child
+        self.assertAbout(parent.peak, 6 * MB)
+        self.assertAbout(parent.net, 2 * MB)
+        del data
+
+    def test_top_allocations(self):
+        with track_memory(top_allocations=1) as memory:
+            data = bytearray(4 * MB)
+
+        site, = memory.top_allocations
+        self.assertIn('test_memory_tracker.py:', site['site'])
+        self.assertAlmostEqual(site['size_diff_kb'], 4 * 1024, delta=1)
+        del data
+
+    def test_calls_in_threads(self):
+        # thread a:  enter outer, ............ allocate and free 8 MB, enter inner, exit inner, exit outer
+        # thread b:  ............ enter call, ................................................................ exit call
+        steps = {name: threading.Event() for name in ('a_entered', 'b_entered', 'a_done')}
+        results = {}
+
+        def thread_a():
+            with track_memory() as outer:
+                steps['a_entered'].set()
+                steps['b_entered'].wait(5)
+                data = bytearray(8 * MB)
+                del data
+                with track_memory() as inner:
+                    pass
+            results.update(outer=outer, inner=inner)
+            steps['a_done'].set()
+
+        def thread_b():
+            steps['a_entered'].wait(5)
+            with track_memory() as call:
+                steps['b_entered'].set()
+                steps['a_done'].wait(5)
+            results['call'] = call
+
+        threads = [threading.Thread(target=thread_a), threading.Thread(target=thread_b)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # entering inner reset the shared peak counter, the 8 MB reached before are kept by outer, the parent in
+        # the same thread, and by the call running in b (other threads' allocations are attributed to it)
+        self.assertAbout(results['outer'].peak, 8 * MB)
+        self.assertAbout(results['inner'].peak, 0)
+        self.assertAbout(results['call'].peak, 8 * MB)
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == '__main__':
+    unittest.main()
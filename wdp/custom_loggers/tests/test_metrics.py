@@ -0,0 +1,116 @@
+import random
+import statistics
+import unittest
+import pathlib
+import sys
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.metrics import (Histogram, MetricsExporter, MetricsRegistry, bucket_bounds, bucket_index,
+                                        window_percentiles)
+
+
+def sample(size, seed):
+    # latencies between 50 microseconds and a few seconds, most of them around 10 ms
+    rng = random.Random(seed)
+    return [min(rng.lognormvariate(-4.5, 1.2), 5.0) + 0.00005 for _ in range(size)]
+
+
+def histogram_of(values):
+    histogram = Histogram()
+    for value in values:
+        histogram.observe(value)
+    return histogram
+
+
+class TestBuckets(unittest.TestCase):
+
+    def test_bucket_bounds(self):
+        for value in (0, 1, 127, 128, 129, 255, 256, 1000, 123_456, 5_000_000):
+            low, high = bucket_bounds(bucket_index(value))
+            self.assertLessEqual(low, value)
+            self.assertGreaterEqual(high, value)
+            # buckets are exact below 128 microseconds, then at most 1/64 of their values wide
+            self.assertLessEqual(high - low, max(0, low / 64))
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles_match_exact_quantiles(self):
+        values = sample(10_000, seed=1)
+        histogram = histogram_of(values)
+        exact = statistics.quantiles(values, n=100, method='inclusive')
+
+        for percent in (1, 10, 25, 50, 75, 90, 95, 99):
+            self.assertAlmostEqual(histogram.percentile(percent), exact[percent - 1],
+                                   delta=exact[percent - 1] * 0.02 + 1e-6, msg=f'p{percent}')
+        self.assertEqual(histogram.percentile(100), max(values))
+        self.assertEqual((histogram.count, histogram.min, histogram.max), (10_000, min(values), max(values)))
+        self.assertAlmostEqual(histogram.sum, sum(values))
+
+    def test_count_below(self):
+        values = sample(10_000, seed=2)
+        histogram = histogram_of(values)
+
+        for limit in (0.001, 0.01, 0.05, 0.5):
+            exact = sum(value <= limit for value in values)
+            self.assertAlmostEqual(histogram.count_below(limit), exact, delta=exact * 0.02 + 1)
+        self.assertEqual(histogram.count_below(10), 10_000)
+        self.assertEqual(histogram_of([0.002] * 4).count_below(0.001), 0)
+
+    def test_empty(self):
+        self.assertIsNone(Histogram().percentile(50))
+        self.assertEqual(Histogram().summary((50,)), {'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'p50': None})
+
+    def test_merge(self):
+        first, second = sample(3_000, seed=3), sample(5_000, seed=4)
+        merged = histogram_of(first)
+        other = histogram_of(second)
+        merged.merge(other.buckets, other.sum)
+        combined = histogram_of(first + second)
+
+        self.assertEqual(merged.buckets, combined.buckets)
+        self.assertEqual(merged.count, 8_000)
+        self.assertAlmostEqual(merged.sum, combined.sum)
+        for percent in (50, 90, 99):
+            self.assertAlmostEqual(merged.percentile(percent), combined.percentile(percent), delta=1e-6)
+        # min and max of merged buckets are bucket bounds, they enclose the real ones
+        self.assertLessEqual(merged.min, combined.min)
+        self.assertGreaterEqual(merged.max, combined.max)
+
+    def test_subtract(self):
+        histogram = histogram_of(sample(1_000, seed=5))
+        earlier = histogram.copy()
+        later = sample(500, seed=6)
+        for value in later:
+            histogram.observe(value)
+
+        window = histogram.subtract(earlier)
+        self.assertEqual(window.buckets, histogram_of(later).buckets)
+        self.assertEqual(window.count, 500)
+        self.assertAlmostEqual(window.sum, sum(later))
+
+
+class TestExport(unittest.TestCase):
+
+    def test_window_percentiles_of_exported_snapshots(self):
+        registry = MetricsRegistry()
+        entries = []
+        exporter = MetricsExporter(registry, entries.append, interval=60)
+        first, second = sample(2_000, seed=7), sample(2_000, seed=8)
+        for values in (first, second):
+            for value in values:
+                registry.observe_call('convert_data', value)
+            exporter.export()
+        # nothing changed since the last export
+        self.assertEqual(exporter.export(), [])
+
+        self.assertEqual([entry['metrics_snapshot']['count'] for entry in entries], [2_000, 2_000])
+        summary = window_percentiles(entries, 'convert_data')
+        exact = statistics.quantiles(first + second, n=100, method='inclusive')
+        self.assertEqual(summary['count'], 4_000)
+        self.assertAlmostEqual(summary['p95'], exact[94], delta=exact[94] * 0.02)
+        self.assertEqual(window_percentiles(entries, 'other_function')['count'], 0)
+        self.assertEqual(registry.counter('wdp_function_calls_total', function='convert_data').value, 4_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
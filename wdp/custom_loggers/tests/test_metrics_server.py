@@ -0,0 +1,88 @@
+import unittest
+import pathlib
+import sys
+import urllib.error
+import urllib.request
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers import config
+from wdp.custom_loggers.metrics import MetricsRegistry
+from wdp.custom_loggers.metrics_server import MetricsServer, render_metrics
+
+# none of them is close to a bucket bound, so every bucket counts them in full
+OBSERVATIONS = (0.002, 0.002, 0.002, 0.02, 0.7)
+
+HISTOGRAM_LINES = [
+    '# HELP wdp_step_duration_seconds Duration of converter steps',
+    '# TYPE wdp_step_duration_seconds histogram',
+] + [
+    f'wdp_step_duration_seconds_bucket{{step="parse",le="{bound!r}"}} {sum(value <= bound for value in OBSERVATIONS)}'
+    for bound in sorted(config.METRICS_BUCKETS)
+] + [
+    'wdp_step_duration_seconds_bucket{step="parse",le="+Inf"} 5',
+    f'wdp_step_duration_seconds_sum{{step="parse"}} {sum(OBSERVATIONS)!r}',
+    'wdp_step_duration_seconds_count{step="parse"} 5',
+]
+
+
+class TestMetricsServer(unittest.TestCase):
+
+    def setUp(self):
+        registry = MetricsRegistry()
+        registry.describe('wdp_rows_total', 'Rows converted')
+        registry.describe('wdp_step_duration_seconds', 'Duration of converter steps')
+        registry.counter('wdp_rows_total', stage='parse').inc(3)
+        registry.counter('wdp_rows_total', stage='write "db"').inc(2)
+        for seconds in OBSERVATIONS:
+            registry.histogram('wdp_step_duration_seconds', step='parse').observe(seconds)
+        self.server = MetricsServer('127.0.0.1', 0, registry)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.registry = registry
+
+    def scrape(self, path='/metrics', accept=None):
+        host, port = self.server.address
+        request = urllib.request.Request(f'http://{host}:{port}{path}', headers={'Accept': accept} if accept else {})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.headers['Content-Type'], response.read().decode('utf-8')
+
+    def test_prometheus(self):
+        content_type, body = self.scrape()
+
+        self.assertEqual(content_type, 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertEqual(body.splitlines(), [
+            '# HELP wdp_rows_total Rows converted',
+            '# TYPE wdp_rows_total counter',
+            'wdp_rows_total{stage="parse"} 3',
+            'wdp_rows_total{stage="write \\"db\\""} 2',
+        ] + HISTOGRAM_LINES)
+
+    def test_openmetrics(self):
+        content_type, body = self.scrape(accept='application/openmetrics-text; version=1.0.0,text/plain;q=0.5')
+
+        self.assertEqual(content_type, 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        # counter families drop _total, their samples keep it
+        self.assertEqual(body.splitlines(), [
+            '# HELP wdp_rows Rows converted',
+            '# TYPE wdp_rows counter',
+            'wdp_rows_total{stage="parse"} 3',
+            'wdp_rows_total{stage="write \\"db\\""} 2',
+        ] + HISTOGRAM_LINES + ['# EOF'])
+        self.assertTrue(body.endswith('# EOF\n'))
+
+    def test_custom_buckets(self):
+        lines = render_metrics(self.registry, buckets=(0.01, 0.001)).splitlines()
+
+        self.assertEqual([line for line in lines if '_bucket' in line], [
+            'wdp_step_duration_seconds_bucket{step="parse",le="0.001"} 0',
+            'wdp_step_duration_seconds_bucket{step="parse",le="0.01"} 3',
+            'wdp_step_duration_seconds_bucket{step="parse",le="+Inf"} 5',
+        ])
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.scrape('/other')
+        self.assertEqual(raised.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
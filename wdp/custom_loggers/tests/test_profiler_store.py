@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+import os
+import unittest
+import pathlib
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.profiler_store import NDJSONStore, fcntl
+
+
+def append_entries(path, writer, count):
+    store = NDJSONStore(path, max_bytes=2000, backup_count=1000)
+    for index in range(count):
+        store.append({'writer': writer, 'index': index})
+
+
+class TestNDJSONStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = str(pathlib.Path(self.tmp_dir.name) / 'profiler_logs.ndjson')
+
+    def test_append_and_read(self):
+        store = NDJSONStore(self.path)
+        for index in range(3):
+            store.append({'index': index, 'name': f'entry {index}'})
+
+        self.assertEqual(list(store.read()), [{'index': index, 'name': f'entry {index}'} for index in range(3)])
+        with open(self.path) as file:
+            self.assertEqual(len(file.readlines()), 3)
+
+    def test_rotation_keeps_backup_count_files(self):
+        # every entry is 12 bytes, so a file holds 2 of them
+        store = NDJSONStore(self.path, max_bytes=25, backup_count=2)
+        for index in range(10):
+            store.append({'index': index})
+
+        self.assertEqual(store.files(), [f'{self.path}.2', f'{self.path}.1', self.path])
+        self.assertFalse(os.path.exists(f'{self.path}.3'))
+        # the oldest entries were rotated out, the rest is read oldest first
+        self.assertEqual([entry['index'] for entry in store.read()], [4, 5, 6, 7, 8, 9])
+        self.assertEqual([entry['index'] for entry in store.read(include_rotated=False)], [8, 9])
+        self.assertTrue(all(os.path.getsize(path) <= 25 for path in store.files()))
+
+    def test_read_skips_broken_lines_and_includes_legacy(self):
+        legacy_path = str(pathlib.Path(self.tmp_dir.name) / 'profiler_logs.json')
+        with open(legacy_path, 'w') as file:
+            json.dump([{'index': 'legacy'}], file)
+        store = NDJSONStore(self.path, legacy_path=legacy_path)
+        store.append({'index': 0})
+        with open(self.path, 'a') as file:
+            file.write('{"index": 1, "cut off')
+
+        self.assertEqual(list(store.read()), [{'index': 'legacy'}, {'index': 0}])
+        self.assertEqual(list(store.read(include_rotated=False)), [{'index': 0}])
+
+    @unittest.skipIf(fcntl is None, 'needs fcntl')
+    def test_processes_rotate_shared_file(self):
+        processes = [multiprocessing.Process(target=append_entries, args=(self.path, writer, 200))
+                     for writer in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        store = NDJSONStore(self.path, max_bytes=2000, backup_count=1000)
+        entries = list(store.read())
+        # no entry is lost or written twice and no file outgrew max_bytes
+        self.assertEqual(sorted((entry['writer'], entry['index']) for entry in entries),
+                         [(writer, index) for writer in range(4) for index in range(200)])
+        self.assertTrue(all(os.path.getsize(path) <= 2000 for path in store.files()))
+
+
+if __name__ == '__main__':
+    unittest.main()
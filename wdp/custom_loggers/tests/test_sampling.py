@@ -0,0 +1,148 @@
+import io
+import logging
+import random
+import unittest
+import pathlib
+import sys
+from unittest import mock
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers import general
+from wdp.custom_loggers.sampling import EveryNFilter, IntervalFilter, RateLimitFilter, SamplingFilter
+
+
+def run(sampler, events):
+    """ Passes (time, key) events to the filter with a mocked clock, returns what check() answered """
+    results = []
+    with mock.patch('time.monotonic') as monotonic:
+        for now, key in events:
+            monotonic.return_value = now
+            results.append(sampler.check(key))
+    return results
+
+
+def random_events(seed, count=2000, keys=('a', 'b', 'c')):
+    # irregular arrivals from a few call sites
+    rng = random.Random(seed)
+    now = 0.0
+    events = []
+    for _ in range(count):
+        now += rng.expovariate(50)
+        events.append((now, rng.choice(keys)))
+    return events
+
+
+class TestSamplingFilters(unittest.TestCase):
+
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            SamplingFilter()
+
+    def test_every_n(self):
+        events = random_events(seed=1)
+        results = run(EveryNFilter(10), events)
+
+        for key in ('a', 'b', 'c'):
+            answers = [result for result, (_, event_key) in zip(results, events) if event_key == key]
+            allowed = [index for index, result in enumerate(answers) if result is not None]
+            # the 1st, 11th, 21st ... occurrence of every call site, each reporting the 9 suppressed before it
+            self.assertEqual(allowed, list(range(0, len(answers), 10)))
+            self.assertEqual({answers[index] for index in allowed[1:]}, {9})
+            self.assertEqual(answers[0], 0)
+
+    def test_interval(self):
+        events = random_events(seed=2)
+        results = run(IntervalFilter(0.5), events)
+
+        last = {}
+        for result, (now, key) in zip(results, events):
+            expected = key not in last or now - last[key] >= 0.5
+            self.assertEqual(result is not None, expected)
+            if expected:
+                last[key] = now
+
+    def test_rate_limit(self):
+        # 2000 events in about 40 seconds, the bucket refills 5 tokens per second and starts full with a burst of 20
+        events = random_events(seed=3, keys=('a',))
+        sampler = RateLimitFilter(5, burst=20)
+        results = run(sampler, events)
+
+        allowed = sum(result is not None for result in results)
+        duration = events[-1][0] - events[0][0]
+        self.assertAlmostEqual(allowed, 20 + 5 * duration, delta=1)
+        # the first 20 events pass as a burst
+        self.assertTrue(all(result is not None for result in results[:20]))
+        # every suppressed event is reported by the next one let through, or still pending
+        reported = sum(result for result in results if result)
+        self.assertEqual(reported + sampler.pending().get('a', 0), len(events) - allowed)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            EveryNFilter(0)
+        with self.assertRaises(ValueError):
+            RateLimitFilter(0)
+
+    def test_filter_on_logger(self):
+        logger = logging.getLogger('test_sampling.filter')
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        logger.addHandler(handler)
+        logger.addFilter(EveryNFilter(100))
+        self.addCleanup(logger.removeHandler, handler)
+
+        for index in range(250):
+            logger.debug('record %d', index)
+
+        self.assertEqual(stream.getvalue().splitlines(), [
+            'record 0', 'record 100 [99 similar messages suppressed]', 'record 200 [99 similar messages suppressed]'])
+
+
+class TestLogDecoratorSampling(unittest.TestCase):
+
+    def setUp(self):
+        # the root logger and the general log file are left alone
+        patcher = mock.patch.object(general, '_configured', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.logger = logging.getLogger('test_sampling.decorator')
+        self.logger.propagate = False
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s%(message)s'))
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+
+    def test_sampled_calls(self):
+        self.logger.setLevel(logging.DEBUG)
+        sampler = EveryNFilter(3)
+
+        @general.log(new_logger=self.logger, level=logging.INFO, sampler=sampler)
+        def parse(record):
+            return record * 2
+
+        self.assertEqual([parse(index) for index in range(7)], [0, 2, 4, 6, 8, 10, 12])
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line.startswith('INFO') for line in lines))
+        self.assertIn('called with args: 3,', lines[1])
+        self.assertTrue(lines[1].endswith('[2 similar messages suppressed]'))
+
+    def test_disabled_level_skips_sampler(self):
+        self.logger.setLevel(logging.WARNING)
+        sampler = EveryNFilter(3)
+
+        @general.log(new_logger=self.logger, level=logging.INFO, sampler=sampler)
+        def parse(record):
+            return record
+
+        for index in range(5):
+            parse(index)
+
+        self.assertEqual(self.stream.getvalue(), '')
+        # suppressed by the level, not by the sampler
+        self.assertEqual(sampler.seen, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
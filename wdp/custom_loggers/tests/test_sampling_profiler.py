@@ -0,0 +1,96 @@
+import cProfile
+import unittest
+import pathlib
+import sys
+import threading
+import time
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.sampling_profiler import ProfileAggregator, StackSampler
+
+
+def inner(started, release):
+    started.set()
+    release.wait(5)
+
+
+def outer(sampler, started, release):
+    sampler.enter('outer', outer.__code__)
+    try:
+        inner(started, release)
+    finally:
+        sampler.exit()
+
+
+class TestStackSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.summaries = []
+        self.aggregator = ProfileAggregator(self.summaries.append, flush_interval=60, top_entries=5,
+                                            stack_interval=0.01)
+        self.sampler = StackSampler(self.aggregator, interval=0.01)
+
+    def run_profiled(self, samples):
+        # takes the given number of samples while a thread waits inside outer() -> inner()
+        started, release = threading.Event(), threading.Event()
+        thread = threading.Thread(target=outer, args=(self.sampler, started, release))
+        thread.start()
+        started.wait(5)
+        for _ in range(samples):
+            self.sampler.sample()
+        release.set()
+        thread.join()
+
+    def test_samples_stack_of_profiled_function(self):
+        self.run_profiled(3)
+        summary, = self.aggregator.flush()
+
+        data = summary['aggregated_data']
+        self.assertEqual((data['function_name'], data['stack_samples']), ('outer', 3))
+        top_stack, = data['top_stacks']
+        self.assertEqual((top_stack['samples'], top_stack['estimated_time']), (3, 0.03))
+        # the stack starts at the profiled function, the frames of the thread above it are left out
+        names = [frame.split(' ')[0] for frame in top_stack['stack'].split(';')]
+        self.assertEqual(names[:2], ['outer', 'inner'])
+        self.assertIn('test_sampling_profiler.py:', top_stack['stack'])
+        self.assertEqual(self.summaries, [summary])
+
+    def test_thread_outside_profiled_function_is_not_sampled(self):
+        self.run_profiled(0)
+        self.sampler.sample()
+
+        self.assertEqual(self.aggregator.flush(), [])
+
+    def test_sampler_thread(self):
+        self.sampler.start()
+        self.addCleanup(self.sampler.stop)
+        started, release = threading.Event(), threading.Event()
+        thread = threading.Thread(target=outer, args=(self.sampler, started, release))
+        thread.start()
+        started.wait(5)
+        time.sleep(0.2)
+        release.set()
+        thread.join()
+
+        samples = self.aggregator.flush()[0]['aggregated_data']['stack_samples']
+        self.assertGreater(samples, 0)
+
+
+class TestProfileAggregator(unittest.TestCase):
+
+    def test_record_calls(self):
+        aggregator = ProfileAggregator(lambda summary: None, flush_interval=60, top_entries=3)
+        profiler = cProfile.Profile()
+        profiler.runcall(sorted, range(1000))
+        aggregator.record_call('work', 0.5, profiler)
+        aggregator.record_call('work', 1.5)
+
+        data = aggregator.flush()[0]['aggregated_data']
+        self.assertEqual((data['calls'], data['sampled_calls'], data['total_time'], data['max_time']),
+                         (2, 1, 2.0, 1.5))
+        self.assertTrue(any('sorted' in entry['function'] for entry in data['top_functions']))
+        # a flush starts a new window
+        self.assertEqual(aggregator.flush(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import io
+import logging
+import queue
+import unittest
+import pathlib
+import sys
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers.shipping import (BatchingQueueListener, BoundedQueueHandler, disable_queue_logging,
+                                         enable_queue_logging)
+
+
+class CountingHandler(logging.StreamHandler):
+
+    def __init__(self):
+        super().__init__(io.StringIO())
+        self.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+    def lines(self):
+        return self.stream.getvalue().splitlines()
+
+
+class TestShipping(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger(f'test_shipping.{self.id()}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.target = CountingHandler()
+
+    def ship(self, log_queue, **kwargs):
+        handler = BoundedQueueHandler(log_queue, **kwargs)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        return handler
+
+    def test_round_trip(self):
+        log_queue = queue.Queue(100)
+        self.ship(log_queue)
+        listener = BatchingQueueListener(log_queue, self.target)
+        listener.start()
+        items = ['a']
+        self.logger.info('items: %s', items)
+        # the message shows the arguments at the time of the call
+        items.append('b')
+        self.logger.debug('second')
+        listener.stop()
+
+        self.assertEqual(self.target.lines(), ["INFO items: ['a']", 'DEBUG second'])
+
+    def test_stop_writes_queued_records_in_batches(self):
+        log_queue = queue.Queue(1000)
+        self.ship(log_queue)
+        for index in range(250):
+            self.logger.info('record %d', index)
+        # the records and the stop signal were queued before the writer started, it takes them 100 at a time and
+        # flushes once per batch
+        listener = BatchingQueueListener(log_queue, self.target, batch_size=100)
+        listener.enqueue_sentinel()
+        listener.start()
+        listener._thread.join()
+
+        self.assertEqual(self.target.lines(), [f'INFO record {index}' for index in range(250)])
+        self.assertEqual(self.target.flushes, 3)
+
+    def test_handler_level_is_respected(self):
+        log_queue = queue.Queue(100)
+        self.ship(log_queue)
+        self.target.setLevel(logging.WARNING)
+        listener = BatchingQueueListener(log_queue, self.target)
+        listener.start()
+        self.logger.info('skipped')
+        self.logger.warning('written')
+        listener.stop()
+
+        self.assertEqual(self.target.lines(), ['WARNING written'])
+
+    def test_full_queue_drops(self):
+        handler = self.ship(queue.Queue(2), policy='drop')
+        for index in range(5):
+            self.logger.info('record %d', index)
+
+        self.assertEqual(handler.dropped, 3)
+
+    def test_full_queue_blocks_until_timeout(self):
+        handler = self.ship(queue.Queue(1), policy='block', block_timeout=0.05)
+        self.logger.info('queued')
+        self.logger.info('dropped after waiting')
+
+        self.assertEqual(handler.dropped, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedQueueHandler(queue.Queue(), policy='wait')
+
+    def test_stop_signal_waits_for_free_space(self):
+        log_queue = queue.Queue(1)
+        log_queue.put_nowait(logging.makeLogRecord({'msg': 'queued'}))
+        listener = BatchingQueueListener(log_queue, self.target, stop_timeout=0.05)
+
+        with self.assertRaises(queue.Full):
+            listener.enqueue_sentinel()
+
+
+class TestQueueLogging(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.handlers, self.level = list(root.handlers), root.level
+        for handler in self.handlers:
+            root.removeHandler(handler)
+        self.target = CountingHandler()
+        root.addHandler(self.target)
+        root.setLevel(logging.INFO)
+
+    def test_enable_and_disable(self):
+        root = logging.getLogger()
+        listener = enable_queue_logging(max_size=100, batch_size=10)
+        self.assertIs(enable_queue_logging(), listener)
+        self.assertNotIn(self.target, root.handlers)
+        for index in range(25):
+            logging.getLogger('test_shipping').info('record %d', index)
+        disable_queue_logging()
+
+        self.assertEqual(root.handlers, [self.target])
+        self.assertEqual(self.target.lines(), [f'INFO record {index}' for index in range(25)])
+        self.assertFalse(listener._thread)
+
+    def tearDown(self):
+        disable_queue_logging()
+        root = logging.getLogger()
+        root.removeHandler(self.target)
+        for handler in self.handlers:
+            root.addHandler(handler)
+        root.setLevel(self.level)
+
+
+if __name__ == '__main__':
+    unittest.main()
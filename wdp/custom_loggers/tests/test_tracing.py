@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+import unittest
+import pathlib
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parents[3]))
+from wdp.custom_loggers import tracing
+from wdp.custom_loggers.tracing import (add_span, bind, current_context, disable_tracing, enable_tracing,
+                                        export_chrome_trace, span, traced)
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = pathlib.Path(tmp_dir.name)
+        self.addCleanup(setattr, tracing.trace_store, 'path', tracing.trace_store.path)
+        self.addCleanup(setattr, tracing, 'tracing_enabled', tracing.tracing_enabled)
+        enable_tracing(str(self.tmp_path / 'traces.ndjson'))
+
+    def export(self, **kwargs):
+        path = self.tmp_path / 'trace.json'
+        exported = export_chrome_trace(str(path), **kwargs)
+        with open(path) as file:
+            events = json.load(file)['traceEvents']
+        spans = {event['name']: event for event in events if event['ph'] == 'X'}
+        self.assertEqual(len(spans), exported)
+        return events, spans
+
+    def assertInside(self, child, parent):
+        self.assertEqual(child['args']['parent_id'], parent['args']['span_id'])
+        self.assertEqual(child['args']['trace_id'], parent['args']['trace_id'])
+        self.assertGreaterEqual(child['ts'], parent['ts'])
+        # within a microsecond, ts and dur are floats
+        self.assertLessEqual(child['ts'] + child['dur'], parent['ts'] + parent['dur'] + 1)
+
+    def test_nested_spans(self):
+        @traced('dump_data')
+        def dump_data():
+            time.sleep(0.01)
+
+        with span('ingest', path='employees.csv') as ingest:
+            with span('read_csv') as read:
+                read.set(rows=3)
+            dump_data()
+        self.assertIsNone(current_context())
+
+        events, spans = self.export()
+        self.assertEqual(set(spans), {'ingest', 'read_csv', 'dump_data'})
+        self.assertIsNone(spans['ingest']['args']['parent_id'])
+        self.assertEqual(spans['ingest']['args']['path'], 'employees.csv')
+        self.assertEqual(spans['read_csv']['args']['rows'], 3)
+        self.assertInside(spans['read_csv'], spans['ingest'])
+        self.assertInside(spans['dump_data'], spans['ingest'])
+        self.assertGreaterEqual(spans['dump_data']['dur'], 10_000)
+        self.assertEqual(spans['ingest']['args']['trace_id'], ingest.context.trace_id)
+        # spans of one thread are nested by time, no flow events are needed
+        self.assertEqual([event for event in events if event['ph'] in ('s', 'f')], [])
+        self.assertEqual([event['args']['name'] for event in events if event['ph'] == 'M'],
+                         [threading.current_thread().name])
+
+    def test_bind_hands_over_to_thread(self):
+        def convert():
+            with span('convert_data'):
+                pass
+
+        with span('ingest'):
+            worker = threading.Thread(target=bind(convert), name='converter')
+            worker.start()
+            worker.join()
+
+        events, spans = self.export()
+        ingest, converted = spans['ingest'], spans['convert_data']
+        self.assertInside(converted, ingest)
+        self.assertNotEqual(converted['tid'], ingest['tid'])
+        # the hand-over is drawn as an arrow from the parent's thread to the child's
+        start, finish = [event for event in events if event['ph'] in ('s', 'f')]
+        self.assertEqual((start['ph'], start['tid'], start['id']), ('s', ingest['tid'], converted['args']['span_id']))
+        self.assertEqual((finish['ph'], finish['tid'], finish['id'], finish['bp']),
+                         ('f', converted['tid'], converted['args']['span_id'], 'e'))
+        self.assertEqual(start['ts'], converted['ts'])
+        self.assertEqual({event['args']['name'] for event in events if event['ph'] == 'M'},
+                         {threading.current_thread().name, 'converter'})
+
+    def test_add_span_and_trace_filter(self):
+        with span('first') as first:
+            add_span('queue_wait', first.start - 1, first.start)
+        with span('second'):
+            pass
+
+        _, spans = self.export(trace_id=first.context.trace_id)
+        self.assertEqual(set(spans), {'first', 'queue_wait'})
+        self.assertEqual(spans['queue_wait']['dur'], 1_000_000)
+        self.assertEqual(spans['queue_wait']['args']['parent_id'], first.context.span_id)
+
+    def test_disabled(self):
+        disable_tracing()
+        with span('ingest') as ingest:
+            self.assertIsNone(ingest)
+
+        self.assertEqual(self.export(), ([], {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,280 @@
+"""
+Hierarchical trace spans exported as Chrome trace-event JSON.
+
+A span measures one stage of work and knows its parent, so the time spent on one file can be broken down stage by
+stage: FileWatcher -> QueueConverter -> convert_data -> read_csv -> dump_data -> disk. The current span is kept in a
+contextvar, so nested spans in the same thread (or asyncio task) get their parent automatically. Work handed over
+to another thread or process gets it through bind(), or by passing current_context() along and opening the span
+there with span(..., parent=context).
+
+Finished spans are buffered in memory and appended to a JSON lines file (TRACE_PATH, shared by all processes)
+whenever the outermost span of a process ends. export_chrome_trace() turns that file into a trace that can be
+opened in chrome://tracing or https://ui.perfetto.dev - spans of one thread are nested by time and hand-overs between
+threads or processes are drawn as arrows.
+
+Tracing is off by default and spans then cost a single check. Switch it on with TRACING_ENABLED in config.py
+or at runtime.
+
+Usage:
+    from wdp.custom_loggers import enable_tracing, span, traced, bind, export_chrome_trace
+
+    enable_tracing()
+
+    @traced()
+    def parse(path):
+        with span("read", path=path):
+            ...
+
+    with span("ingest", path=path):
+        thread = threading.Thread(target=bind(parse), args=(path,))
+        executor.submit(bind(parse), path)         # functions passed to processes must be picklable
+
+    export_chrome_trace("trace.json")
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+from wdp.custom_loggers import config
+from wdp.custom_loggers.profiler_store import NDJSONStore
+
+__all__ = (
+    'TraceContext',
+    'Span',
+    'span',
+    'traced',
+    'bind',
+    'add_span',
+    'current_context',
+    'enable_tracing',
+    'disable_tracing',
+    'flush_spans',
+    'export_chrome_trace',
+)
+
+dir_path = os.path.dirname(os.path.abspath(__file__))
+
+tracing_enabled: bool = config.TRACING_ENABLED
+trace_store = NDJSONStore(
+    os.path.join(dir_path, config.SUB_FOLDER, config.TRACE_PATH),
+    max_bytes=config.TRACE_MAX_BYTES,
+    backup_count=config.TRACE_BACKUP_COUNT,
+)
+
+_current: contextvars.ContextVar[Optional["TraceContext"]] = contextvars.ContextVar("wdp_trace_span", default=None)
+_finished: list[dict] = []
+_finished_lock = threading.Lock()
+
+
+class TraceContext(NamedTuple):
+    """ Identifies a span across threads and processes, picklable """
+    trace_id: str
+    span_id: str
+    pid: int
+    tid: int
+    local: bool = True
+
+
+class Span:
+    """ One timed stage of work """
+    __slots__ = ("name", "context", "parent", "start", "end", "attributes", "thread_name")
+
+    def __init__(self, name: str, parent: Optional[TraceContext], attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.parent = parent
+        self.context = TraceContext(
+            parent.trace_id if parent is not None else uuid.uuid4().hex,
+            uuid.uuid4().hex[:16],
+            os.getpid(),
+            threading.get_ident(),
+        )
+        self.attributes = attributes
+        self.thread_name = threading.current_thread().name
+        self.start = time.time()
+        self.end: Optional[float] = None
+
+    def set(self, **attributes: Any) -> None:
+        """ Adds attributes shown with the span in the trace viewer """
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict[str, Any]:
+        parent = self.parent
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": parent.span_id if parent is not None else None,
+            "parent_pid": parent.pid if parent is not None else None,
+            "parent_tid": parent.tid if parent is not None else None,
+            "pid": self.context.pid,
+            "tid": self.context.tid,
+            "thread_name": self.thread_name,
+            "start": self.start,
+            "end": self.end,
+            "attributes": {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                           for key, value in self.attributes.items()},
+        }
+
+
+def current_context() -> Optional[TraceContext]:
+    """ Context of the current span, to be passed to another thread or process """
+    return _current.get()
+
+
+def _finish(finished: Span) -> None:
+    finished.end = time.time()
+    with _finished_lock:
+        _finished.append(finished.as_dict())
+    if finished.parent is None or not finished.parent.local or finished.parent.pid != os.getpid():
+        flush_spans()
+
+
+def flush_spans() -> None:
+    """ Appends all finished spans of this process to the trace file """
+    with _finished_lock:
+        finished = _finished[:]
+        _finished.clear()
+    for entry in finished:
+        trace_store.append({"span": entry})
+
+
+@contextlib.contextmanager
+def span(name: str, parent: Optional[TraceContext] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Measures the code in the with block as a child of the current span
+
+    :param name: stage name shown in the trace viewer
+    :param parent: context from current_context() in another thread or process, by default the current span
+    :param attributes: values shown with the span, e.g. path or size
+    :return: the Span (to add attributes while it runs) or None when tracing is disabled
+    """
+    if not tracing_enabled:
+        yield None
+        return
+    if parent is None:
+        parent = _current.get()
+    elif parent.pid != os.getpid() or parent.tid != threading.get_ident():
+        parent = parent._replace(local=False)
+    current = Span(name, parent, attributes)
+    token = _current.set(current.context)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        _finish(current)
+
+
+def add_span(name: str, start: float, end: float, parent: Optional[TraceContext] = None, **attributes: Any) -> None:
+    """ Records a span that already happened, e.g. time spent waiting in a queue (start and end are time.time()) """
+    if not tracing_enabled:
+        return
+    finished = Span(name, parent if parent is not None else _current.get(), attributes)
+    finished.start = start
+    with _finished_lock:
+        finished.end = end
+        _finished.append(finished.as_dict())
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """ Decorator running every call of the function in a span named after it """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not tracing_enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _run_in_context(parent: Optional[TraceContext], func: Callable, *args: Any, **kwargs: Any) -> Any:
+    if parent is None or not tracing_enabled:
+        return func(*args, **kwargs)
+    if parent.pid != os.getpid() or parent.tid != threading.get_ident():
+        parent = parent._replace(local=False)
+    token = _current.set(parent)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current.reset(token)
+
+
+def bind(func: Callable) -> Callable:
+    """ Wraps the function so that spans opened by it, in whatever thread or process runs it, are children of the
+    current span. The result is picklable when the function is """
+    return functools.partial(_run_in_context, current_context(), func)
+
+
+def enable_tracing(path: Optional[str] = None) -> None:
+    """
+    Switches tracing on
+
+    :param path: trace file, TRACE_PATH in the logs folder by default
+    """
+    global tracing_enabled
+    if path is not None:
+        trace_store.path = path
+    tracing_enabled = True
+
+
+def disable_tracing() -> None:
+    """ Switches tracing off and writes out spans still buffered """
+    global tracing_enabled
+    tracing_enabled = False
+    flush_spans()
+
+
+def export_chrome_trace(path: str, trace_id: Optional[str] = None, since: float = 0.0) -> int:
+    """
+    Writes recorded spans as Chrome trace-event JSON
+
+    :param path: output file, open it in chrome://tracing or ui.perfetto.dev
+    :param trace_id: only export this trace (one ingested file), all traces by default
+    :param since: only export spans started after this unix timestamp
+    :return: number of exported spans
+    """
+    flush_spans()
+    events: list[dict] = []
+    threads: dict[tuple[int, int], str] = {}
+    exported = 0
+    for entry in trace_store.read():
+        recorded = entry.get("span") if isinstance(entry, dict) else None
+        if not recorded or (trace_id is not None and recorded["trace_id"] != trace_id) or recorded["start"] < since:
+            continue
+        exported += 1
+        threads[(recorded["pid"], recorded["tid"])] = recorded["thread_name"]
+        start = recorded["start"] * 1_000_000
+        events.append({
+            "name": recorded["name"],
+            "cat": "wdp",
+            "ph": "X",
+            "ts": start,
+            "dur": max((recorded["end"] - recorded["start"]) * 1_000_000, 0),
+            "pid": recorded["pid"],
+            "tid": recorded["tid"],
+            "args": {
+                "trace_id": recorded["trace_id"],
+                "span_id": recorded["span_id"],
+                "parent_id": recorded["parent_id"],
+                **recorded["attributes"],
+            },
+        })
+        if recorded["parent_id"] and (recorded["parent_pid"], recorded["parent_tid"]) != (recorded["pid"],
+                                                                                           recorded["tid"]):
+            flow = {"name": "handover", "cat": "wdp", "id": recorded["span_id"], "ts": start}
+            events.append({**flow, "ph": "s", "pid": recorded["parent_pid"], "tid": recorded["parent_tid"]})
+            events.append({**flow, "ph": "f", "bp": "e", "pid": recorded["pid"], "tid": recorded["tid"]})
+    for (pid, tid), thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    return exported
@@ -26,6 +26,8 @@ from queue import Queue, Empty
 import pandas as pd
 import csv
 
+from wdp.custom_loggers.metrics import REGISTRY
+from wdp.custom_loggers.tracing import add_span, span, traced
 from wdp.utilities import app_path
 
 
@@ -41,6 +43,11 @@ DATA_TARGET_DIRECTORY: pathlib.Path = pathlib.Path(
 logger = logging.getLogger(__name__)
 _logger_exception_once = functools.lru_cache(logger.exception)
 
+REGISTRY.describe('wdp_converter_files_total', 'Number of files converted to JSON')
+REGISTRY.describe('wdp_converter_bytes_total', 'Number of input bytes converted to JSON')
+REGISTRY.describe('wdp_converter_errors_total', 'Number of files that could not be converted')
+REGISTRY.describe('wdp_converter_duration_seconds', 'Time spent converting one file')
+
 
 class CorruptFileError(Exception):
     """Exception raised for corrupt files."""
@@ -61,6 +68,7 @@ class CorruptFileError(Exception):
         return decorator
 
 
+@traced()
 def convert_file(
         filename_or_buf: os.PathLike | str | typing.BinaryIO,
         encoding: str = DEFAULT_ENCODING,
@@ -76,27 +84,42 @@ def convert_file(
     return convert_data(data, encoding)
 
 
+@traced('convert_data')
 @CorruptFileError.reraise(UnicodeDecodeError)
 def convert_data(
         buf: typing.BinaryIO,
         encoding: str = DEFAULT_ENCODING,
 ) -> str:
     """Read a byte buffer and return the data in the JSON format."""
+    start = time.perf_counter()
     ch = buf.read(2)
     buf.seek(0)
+    arr = buf.read()
     if ch != MAGIC_EXCEL:
-        arr = buf.read()
         string = arr.decode(encoding)
         if ch and ch[0] in b'{[':
+            data_format = 'json'
             data = read_json(string)
         else:
+            data_format = 'csv'
             data = read_csv(string)
     else:
-        data = read_xlsx(buf.read())
-    json_data = dump_data(data)
+        data_format = 'xlsx'
+        data = read_xlsx(arr)
+    with span('dump_data', format=data_format):
+        json_data = dump_data(data)
+    record_conversion(data_format, len(arr), time.perf_counter() - start)
     return json_data
 
 
+def record_conversion(data_format: str, size: int, elapsed: float) -> None:
+    """Record throughput and latency of one conversion in the metrics registry."""
+    REGISTRY.counter('wdp_converter_files_total', format=data_format).inc()
+    REGISTRY.counter('wdp_converter_bytes_total', format=data_format).inc(size)
+    REGISTRY.histogram('wdp_converter_duration_seconds', format=data_format).observe(elapsed)
+
+
+@traced('read_csv')
 @CorruptFileError.reraise(csv.Error, pd.errors.ParserError)
 def read_csv(data: str) -> str:
     """Reads a CSV file."""
@@ -105,12 +128,14 @@ def read_csv(data: str) -> str:
     return pd.read_csv(io.StringIO(data), dialect=dialect)  # type: ignore
 
 
+@traced('read_json')
 @CorruptFileError.reraise(json.JSONDecodeError)
 def read_json(data: str) -> dict:
     """Reads a JSON file."""
     return json.loads(data)
 
 
+@traced('read_xlsx')
 @CorruptFileError.reraise(pd.errors.ParserError)
 def read_xlsx(data: bytes) -> pd.DataFrame:
     """Reads an Excel file."""
@@ -151,6 +176,7 @@ def jsonify_directory(
             jsonify(os.path.join(root, file), encoding)
 
 
+@traced()
 def jsonify(
         path: os.PathLike | str,
         encoding: str = DEFAULT_ENCODING,
@@ -167,10 +193,11 @@ def jsonify(
             try:
                 json_data = convert_file(file, encoding)
             except CorruptFileError:
+                REGISTRY.counter('wdp_converter_errors_total').inc()
                 _logger_exception_once('Error processing file %s', path)
         if json_data is not None:
             new_path = f'{str(path).replace(str(DATA_SOURCE_DIRECTORY), str(DATA_TARGET_DIRECTORY))}.json'
-            with open(new_path, 'wb') as file:
+            with span('write', path=new_path), open(new_path, 'wb') as file:
                 file.write(json_data.encode(encoding))
     else:
         if not allow_directory:
@@ -198,9 +225,18 @@ class QueueConverter(threading.Thread):
             except Empty:
                 logger.debug('Queue is empty, no action taken.')
             else:
-                jsonify(path, allow_directory=False)
+                self.convert(path)
             time.sleep(self.interval)
 
+    def convert(self, path):
+        """Converts one file, traced from the moment the watcher found it."""
+        discovered = getattr(self.queue, 'discovered', {}).pop(path, None)
+        with span('ingest', path=path) as ingest:
+            if ingest is not None and discovered is not None:
+                ingest.start = discovered
+                add_span('FileWatcher.queued', discovered, time.time(), path=path)
+            jsonify(path, allow_directory=False)
+
     def stop(self):
         self.queue.put(None)
 
@@ -215,6 +251,7 @@ class FileWatcher(Queue):
     ):
         super().__init__()
         self.queue = set()
+        self.discovered = {}
         self.directory = directory
         self.recursive = recursive
 
@@ -231,6 +268,7 @@ class FileWatcher(Queue):
             for file in files:
                 path = os.path.join(root, file)
                 if os.path.isfile(path):
+                    self.discovered.setdefault(path, time.time())
                     super().put(path, block=False)
 
     def get(self, block: bool = True, timeout: float | None = None):
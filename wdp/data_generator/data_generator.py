@@ -11,6 +11,7 @@ e.g. what proportion of job offers is for specialization X e.g. Frontend Develop
 
 from faker.config import AVAILABLE_LOCALES
 from wdp.custom_loggers.general import log
+from wdp.custom_loggers.sampling import EveryNFilter
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Iterable
@@ -26,6 +27,9 @@ roles_path = os.path.join(dir_name, "..\\control_panel\\roles.json")
 sepcializations_path = os.path.join(dir_name, "..\\control_panel\\fields_and_skills.json")
 UPLOADS_PATH = os.path.join(dir_name, "..\\input_and_output\\uploads\\")
 LOGGER = logging.getLogger(__name__)
+# logged once per generated employee, keep 1 in 1000
+SEED_LOGGER = LOGGER.getChild("pseudo_seed")
+SEED_LOGGER.addFilter(EveryNFilter(1000))
 
 __all__ = (
     'Config',
@@ -196,8 +200,8 @@ class GeneratedEmployee:
         for loc in CONFIG.illegal_locales:
             if loc in legal_locales:
                 legal_locales.remove(loc)
-        LOGGER.debug(
-            f"Pseudo seed: {len(CONFIG.illegal_locales)} illegal locales found ({len(AVAILABLE_LOCALES)}-{len(CONFIG.illegal_locales)})")
+        SEED_LOGGER.debug("Pseudo seed: %d illegal locales found (%d-%d)", len(CONFIG.illegal_locales),
+                          len(AVAILABLE_LOCALES), len(CONFIG.illegal_locales))
 
         locale = random.choice(legal_locales)
         job = random.choice(ROLES)
@@ -0,0 +1,170 @@
+"""
+Materialized headcount and salary summaries of the Employees table.
+
+For every dimension (role, country, city and project) a summary table holds the number of employees and the
+running count, sum, sum of squares, minimum and maximum of their salaries. Triggers on Employees keep the
+summaries current on every insert, update and delete, so reports read a handful of pre-aggregated rows
+instead of scanning Employees. Minimum and maximum are recomputed only when the removed salary was the
+current extreme, through an index on (dimension columns, salary).
+
+Employees with NULL in a dimension column (e.g. no project yet) are left out of that dimension's summary.
+
+Usage:
+    import connector_wdp
+    import aggregates
+
+    db = connector_wdp.Database()
+    aggregates.install_aggregates(db)          # once: tables, indexes, triggers and initial fill
+    aggregates.salary_summary(db, 'country')   # -> [{'country': 'Poland', 'headcount': 4, 'salary_avg': ...}, ...]
+    aggregates.rebuild_aggregates(db)          # refresh job, recomputes everything from scratch
+"""
+import math
+
+# dimension name -> (summary table, grouping columns of Employees)
+dimensions = {
+    'role': ('SummaryByRole', ('last_role',)),
+    'country': ('SummaryByCountry', ('country',)),
+    'city': ('SummaryByCity', ('country', 'city')),
+    'project': ('SummaryByProject', ('project_id',)),
+}
+
+_table_ddl = """CREATE TABLE IF NOT EXISTS {table}(
+    {key_definitions},
+    headcount INTEGER NOT NULL,
+    salaried_count INTEGER NOT NULL,
+    salary_sum REAL NOT NULL,
+    salary_sq_sum REAL NOT NULL,
+    salary_min REAL,
+    salary_max REAL,
+    PRIMARY KEY ({keys})
+)"""
+
+_index_ddl = """CREATE INDEX IF NOT EXISTS idx_employees_{name}_salary ON Employees({keys}, salary)"""
+
+_add_employee = """INSERT INTO {table} ({keys}, headcount, salaried_count, salary_sum, salary_sq_sum, salary_min, salary_max)
+    VALUES ({new_keys}, 1, NEW.salary IS NOT NULL, COALESCE(NEW.salary, 0), COALESCE(NEW.salary * NEW.salary, 0),
+            NEW.salary, NEW.salary)
+    ON CONFLICT ({keys}) DO UPDATE SET
+        headcount = headcount + 1,
+        salaried_count = salaried_count + excluded.salaried_count,
+        salary_sum = salary_sum + excluded.salary_sum,
+        salary_sq_sum = salary_sq_sum + excluded.salary_sq_sum,
+        salary_min = min(COALESCE(salary_min, excluded.salary_min), COALESCE(excluded.salary_min, salary_min)),
+        salary_max = max(COALESCE(salary_max, excluded.salary_max), COALESCE(excluded.salary_max, salary_max));"""
+
+_remove_employee = """UPDATE {table} SET
+        headcount = headcount - 1,
+        salaried_count = salaried_count - (OLD.salary IS NOT NULL),
+        salary_sum = salary_sum - COALESCE(OLD.salary, 0),
+        salary_sq_sum = salary_sq_sum - COALESCE(OLD.salary * OLD.salary, 0),
+        salary_min = CASE WHEN OLD.salary <= salary_min
+                          THEN (SELECT MIN(salary) FROM Employees WHERE {match_old}) ELSE salary_min END,
+        salary_max = CASE WHEN OLD.salary >= salary_max
+                          THEN (SELECT MAX(salary) FROM Employees WHERE {match_old}) ELSE salary_max END
+    WHERE {match_old};
+    DELETE FROM {table} WHERE {match_old} AND headcount <= 0;"""
+
+_triggers_ddl = (
+    """CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON Employees WHEN {new_not_null}
+    BEGIN {add_employee} END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON Employees WHEN {old_not_null}
+    BEGIN {remove_employee} END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_update_old AFTER UPDATE OF {keys}, salary ON Employees WHEN {old_not_null}
+    BEGIN {remove_employee} END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_update_new AFTER UPDATE OF {keys}, salary ON Employees WHEN {new_not_null}
+    BEGIN {add_employee} END""",
+)
+
+_rebuild_sql = """INSERT INTO {table} ({keys}, headcount, salaried_count, salary_sum, salary_sq_sum, salary_min, salary_max)
+    SELECT {keys}, COUNT(*), COUNT(salary), COALESCE(SUM(salary), 0), COALESCE(SUM(salary * salary), 0),
+           MIN(salary), MAX(salary)
+    FROM Employees WHERE {not_null} GROUP BY {keys}"""
+
+
+def _check_dimension(dimension):
+    if dimension not in dimensions:
+        raise ValueError('Wrong dimension')
+    return dimensions[dimension]
+
+
+def _statements(dimension):
+    """DDL statements creating the summary table, its supporting index and triggers"""
+    table, keys = _check_dimension(dimension)
+    fields = {
+        'table': table,
+        'keys': ', '.join(keys),
+        'new_keys': ', '.join(f'NEW.{key}' for key in keys),
+        'key_definitions': ',\n    '.join(f'{key} {"VARCHAR(250)" if key in ("country", "city") else "INTEGER"}'
+                                          for key in keys),
+        'match_old': ' AND '.join(f'{key} = OLD.{key}' for key in keys),
+        'new_not_null': ' AND '.join(f'NEW.{key} IS NOT NULL' for key in keys),
+        'old_not_null': ' AND '.join(f'OLD.{key} IS NOT NULL' for key in keys),
+    }
+    fields['add_employee'] = _add_employee.format(**fields)
+    fields['remove_employee'] = _remove_employee.format(**fields)
+    return [_table_ddl.format(**fields), _index_ddl.format(name=dimension, keys=fields['keys'])] + \
+        [trigger.format(**fields) for trigger in _triggers_ddl]
+
+
+def install_aggregates(database):
+    """Create summary tables, indexes and triggers (if missing) and fill the summaries
+
+    :param database: connector_wdp.Database instance
+    """
+    database.cursor.execute('BEGIN TRANSACTION')
+    try:
+        for dimension in dimensions:
+            for statement in _statements(dimension):
+                database.cursor.execute(statement)
+    except Exception:
+        database.connection.rollback()
+        raise
+    database.cursor.execute('COMMIT')
+    rebuild_aggregates(database)
+
+
+def rebuild_aggregates(database, dimension=None):
+    """Recompute summaries from the Employees table, e.g. as a periodic consistency job
+
+    :param database: connector_wdp.Database instance
+    :param dimension: one of 'role', 'country', 'city', 'project', or None for all of them
+    """
+    selected = [dimension] if dimension else list(dimensions)
+    database.cursor.execute('BEGIN TRANSACTION')
+    try:
+        for name in selected:
+            table, keys = _check_dimension(name)
+            database.cursor.execute(f"""DELETE FROM {table}""")
+            database.cursor.execute(_rebuild_sql.format(
+                table=table, keys=', '.join(keys), not_null=' AND '.join(f'{key} IS NOT NULL' for key in keys)))
+    except Exception:
+        database.connection.rollback()
+        raise
+    database.cursor.execute('COMMIT')
+
+
+def salary_summary(database, dimension):
+    """Headcount and salary statistics per group of the given dimension
+
+    :param database: connector_wdp.Database instance
+    :param dimension: one of 'role', 'country', 'city', 'project'
+    :return: list of dicts with grouping columns, headcount, salary_avg, salary_std, salary_min and salary_max;
+        the read is recorded by the database's audit callable
+    """
+    table, keys = _check_dimension(dimension)
+    database.audit_salary_read(summary=dimension)
+    cursor = database.connection.cursor()
+    cursor.execute(f"""SELECT {', '.join(keys)}, headcount, salaried_count, salary_sum, salary_sq_sum, salary_min,
+                       salary_max FROM {table} ORDER BY {', '.join(keys)}""")
+    summary = []
+    for row in cursor.fetchall():
+        headcount, salaried, total, sq_total, salary_min, salary_max = row[len(keys):]
+        entry = dict(zip(keys, row))
+        entry['headcount'] = headcount
+        entry['salary_avg'] = total / salaried if salaried else None
+        entry['salary_std'] = math.sqrt(max(sq_total / salaried - (total / salaried) ** 2, 0)) if salaried else None
+        entry['salary_min'] = salary_min
+        entry['salary_max'] = salary_max
+        summary.append(entry)
+    cursor.close()
+    return summary
@@ -0,0 +1,219 @@
+"""
+Workload benchmark for connector_wdp.Database.
+
+Creates a fresh database from ddl.sql for every requested scale, fills it with synthetic data and runs a fixed,
+seeded mix of inserts, selects, updates, deletes and skill joins through the connector. Latency percentiles
+(p50/p99) and throughput of every operation are written to a JSON file, so connection tuning or index changes
+can be compared run to run.
+
+Usage:
+    python wdp/database/benchmark.py --scales 10000 100000 1000000 --operations 5000 --output results.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+
+import connector_wdp
+
+default_scales = (10_000, 100_000, 1_000_000)
+default_operations = 5_000
+skills_per_employee = 5
+employees_per_project = 50
+
+# operation name -> share of the workload
+workload_mix = {
+    'insert': 0.10,
+    'select_by_id': 0.30,
+    'select_by_city': 0.10,
+    'update': 0.20,
+    'delete': 0.10,
+    'skill_join': 0.20,
+}
+
+roles = ('Data Scientist', 'Data Engineer', 'Data Analyst', 'Web Developer', 'Scrum Master', 'Project Manager',
+         'Product Owner', 'Database Administrator', 'UX Designer', 'Cloud Engineer', 'DevOps', 'QA Tester')
+skill_names = ('Python', 'SQL', 'Java', 'C++', 'Ruby', 'Spark', 'Kafka', 'Excel', 'Tableau', 'Power BI',
+               'AWS Cloud', 'Azure Cloud', 'Google Cloud', 'Docker', 'Kubernetes', 'Go', 'Scala', 'Rust')
+cities = (('Poland', 'Warsaw'), ('Poland', 'Wroclaw'), ('Poland', 'Krakow'), ('Germany', 'Berlin'),
+          ('Germany', 'Dortmund'), ('England', 'London'), ('USA', 'Chicago'), ('USA', 'Portland'),
+          ('Holland', 'Den Haag'), ('Belarus', 'Minsk'))
+
+skill_join_query = """SELECT e.employee_id, e.first_name, e.last_name FROM Employees e
+    JOIN EmployeesSkillsRelations r ON r.employee_id = e.employee_id
+    JOIN Skills s ON s.skill_id = r.skill_id
+    WHERE s.skill_name = ? AND s.experience >= ?"""
+
+
+def employee_row(employee_id, rng, project_count):
+    """Synthetic Employees row that satisfies the table constraints"""
+    country, city = rng.choice(cities)
+    birth_year = rng.randint(1960, 2000)
+    return (employee_id, f'First{employee_id}', f'Last{employee_id}', f'www.avatar{employee_id}.com',
+            rng.choice(roles), f'{birth_year + rng.randint(20, 23)}-{rng.randint(1, 12):02}-01',
+            f'employee{employee_id}@email.com', f'+{employee_id:011}', f'{birth_year}-{rng.randint(1, 12):02}-15',
+            country, city, rng.randint(1, project_count), rng.randint(1, len(roles)), rng.randint(1, len(roles)),
+            rng.randint(3_000, 30_000), rng.choice(skill_names))
+
+
+def populate(db, scale, rng, batch=10_000):
+    """Fill an empty database with scale employees and related rows
+
+    :return: seconds spent populating
+    """
+    started = time.perf_counter()
+    project_count = max(1, scale // employees_per_project)
+    skill_count = len(skill_names) * 5
+    db.insert_many_role([(role_id, name) for role_id, name in enumerate(roles, 1)])
+    db.insert_many_skill([(skill_id, skill_names[(skill_id - 1) // 5], (skill_id - 1) % 5 + 1)
+                          for skill_id in range(1, skill_count + 1)])
+    db.insert_many_clients([(client_id, f'Company {client_id}', city, country, 'Consulting')
+                            for client_id, (country, city) in enumerate(cities, 1)])
+    db.insert_many_project([(project_id, f'Project {project_id}', rng.randint(1, len(cities)), '2020-01-01',
+                             '2025-01-01', rng.randint(1_000_000, 500_000_000))
+                            for project_id in range(1, project_count + 1)])
+    for first in range(1, scale + 1, batch):
+        ids = range(first, min(first + batch, scale + 1))
+        db.insert_many_employees([employee_row(employee_id, rng, project_count) for employee_id in ids])
+        db.insert_many_relation([(employee_id, skill_id) for employee_id in ids
+                                 for skill_id in rng.sample(range(1, skill_count + 1), skills_per_employee)])
+    return time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_workload(db, scale, operations, rng):
+    """Run the operation mix and collect latencies in nanoseconds per operation"""
+    project_count = max(1, scale // employees_per_project)
+    live_ids = list(range(1, scale + 1))
+    next_id = scale + 1
+    latencies = {name: [] for name in workload_mix}
+    names = list(workload_mix)
+    weights = list(workload_mix.values())
+    for name in rng.choices(names, weights, k=operations):
+        if name == 'insert':
+            row = employee_row(next_id, rng, project_count)
+            started = time.perf_counter_ns()
+            db.insert_one_employee(*row)
+            elapsed = time.perf_counter_ns() - started
+            live_ids.append(next_id)
+            next_id += 1
+        elif name == 'select_by_id':
+            employee_id = rng.choice(live_ids)
+            started = time.perf_counter_ns()
+            db.select('Employees', 'employee_id', employee_id)
+            elapsed = time.perf_counter_ns() - started
+        elif name == 'select_by_city':
+            city = rng.choice(cities)[1]
+            started = time.perf_counter_ns()
+            db.select('Employees', 'city', city)
+            elapsed = time.perf_counter_ns() - started
+        elif name == 'update':
+            employee_id = rng.choice(live_ids)
+            salary = rng.randint(3_000, 30_000)
+            started = time.perf_counter_ns()
+            db.update('Employees', 'salary', 'employee_id', salary, employee_id)
+            elapsed = time.perf_counter_ns() - started
+        elif name == 'delete':
+            employee_id = live_ids.pop(rng.randrange(len(live_ids)))
+            started = time.perf_counter_ns()
+            db.delete('EmployeesSkillsRelations', 'employee_id', employee_id)
+            db.delete('Employees', 'employee_id', employee_id)
+            elapsed = time.perf_counter_ns() - started
+        else:
+            skill_name = rng.choice(skill_names)
+            experience = rng.randint(1, 5)
+            started = time.perf_counter_ns()
+            db.cursor.execute(skill_join_query, (skill_name, experience))
+            db.cursor.fetchall()
+            elapsed = time.perf_counter_ns() - started
+        latencies[name].append(elapsed)
+    return latencies
+
+
+def summarize(latencies):
+    """Per-operation count, p50/p99/mean latency in milliseconds and throughput"""
+    summary = {}
+    for name, values in latencies.items():
+        values = sorted(values)
+        total = sum(values)
+        summary[name] = {
+            'count': len(values),
+            'p50_ms': percentile(values, 0.50) / 1e6 if values else None,
+            'p99_ms': percentile(values, 0.99) / 1e6 if values else None,
+            'mean_ms': total / len(values) / 1e6 if values else None,
+            'ops_per_second': len(values) / (total / 1e9) if total else None,
+        }
+    return summary
+
+
+def benchmark_scale(scale, operations, seed, directory):
+    """Populate a fresh database of the given scale, run the workload and return its results"""
+    rng = random.Random(seed)
+    path = os.path.join(directory, f'benchmark_{scale}.db')
+    db = connector_wdp.Database(path)
+    try:
+        db.create_schema()
+        populate_seconds = populate(db, scale, rng)
+        started = time.perf_counter()
+        latencies = run_workload(db, scale, operations, rng)
+        workload_seconds = time.perf_counter() - started
+    finally:
+        db.connection.close()
+        os.remove(path)
+    return {
+        'scale': scale,
+        'populate_seconds': populate_seconds,
+        'populate_rows_per_second': scale * (1 + skills_per_employee) / populate_seconds,
+        'operations': operations,
+        'workload_seconds': workload_seconds,
+        'throughput_ops_per_second': operations / workload_seconds,
+        'latencies': summarize(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark connector_wdp.Database at growing data sizes.')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(default_scales),
+                        help='numbers of employees to benchmark with')
+    parser.add_argument('--operations', type=int, default=default_operations,
+                        help='number of operations in the workload mix for every scale')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the data and workload generators')
+    parser.add_argument('--output', default='benchmark_results.json', help='path of the JSON results file')
+    parser.add_argument('--directory', default=None, help='where temporary databases are created')
+    args = parser.parse_args(argv)
+
+    results = {
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'seed': args.seed,
+        'workload_mix': workload_mix,
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        for scale in args.scales:
+            run = benchmark_scale(scale, args.operations, args.seed, directory)
+            results['runs'].append(run)
+            print(f"{scale} employees: {run['throughput_ops_per_second']:.0f} ops/s, " +
+                  ', '.join(f"{name} p50 {stats['p50_ms']:.3f} ms p99 {stats['p99_ms']:.3f} ms"
+                            for name, stats in run['latencies'].items() if stats['count']))
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+    main()
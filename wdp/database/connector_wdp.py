@@ -1,23 +1,103 @@
+import functools
+import getpass
+import os
 import sqlite3
+import time
 
 valid_table = ('Employees', 'Clients', 'Projects', 'Skills', 'Roles', 'EmployeesSkillsRelations')
 valid_column = ('employee_id', 'first_name', 'last_name', 'avatar_url', 'job_title', 'joined_on', 'email',
-                'phone_number', 'birthday', 'country', 'city', 'project_id', 'last_role', ' role_preferred',
+                'phone_number', 'birthday', 'country', 'city', 'project_id', 'last_role', 'role_preferred',
                 'salary', 'specification', 'role_id', 'role_name', 'skill_id', 'skill_name', 'experience', 'client_id',
                 'client_name', 'business', 'project_name', 'started_on', 'deadline_on', 'budget')
 
+upsert_batch_size = 500
+ddl_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ddl.sql')
+
+
+def measured(method):
+    """Record the duration of a Database call in the database's metrics registry, when one is configured"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metrics.histogram('wdp_database_call_duration_seconds',
+                                   method=method.__name__).observe(time.perf_counter() - start)
+    return wrapper
+
 
 class Database:
-    def __init__(self):
-        """create connection to database"""
-        self.connection = sqlite3.connect("wdp_database.db")
+    def __init__(self, db_path="wdp_database.db", cache=None, metrics=None, audit=None, user=None):
+        """create connection to database
+
+        :param db_path: path to the SQLite database file
+        :param cache: optional query_cache.QueryCache serving repeated select calls
+        :param metrics: optional registry (e.g. wdp.custom_loggers.metrics.REGISTRY) recording call latencies
+        :param audit: optional callable (e.g. wdp.custom_loggers.auditor.audit) called on every salary read
+        :param user: who reads the data, recorded by audit; the login name by default
+        """
+        self.connection = sqlite3.connect(db_path)
         self.cursor = self.connection.cursor()
         self.cursor.execute("PRAGMA foreign_keys = ON")
+        self.write_hooks = []
+        self.cache = cache
+        self.metrics = metrics
+        self.audit = audit
+        self.user = user or getpass.getuser()
+        if metrics is not None:
+            metrics.describe('wdp_database_call_duration_seconds', 'Duration of Database calls')
+        if cache is not None:
+            self.add_write_hook(cache.bump)
 
     def __exit__(self):
         """close connection to database after function usage"""
         self.connection.close()
 
+    def create_schema(self, path=ddl_path):
+        """Create all tables defined in the DDL file
+
+        :param path: path to the DDL file, ddl.sql next to this module by default
+        """
+        with open(path) as file:
+            lines = [line for line in file if not line.lstrip().startswith('--')]
+        for statement in ''.join(lines).split(';'):
+            statement = statement.strip()
+            if statement and not statement.upper().startswith('CREATE DATABASE'):
+                self.cursor.execute(statement)
+        self.connection.commit()
+
+    def add_write_hook(self, hook):
+        """Register a callable notified after every committed write
+
+        :param hook: callable taking table name and operation ('insert', 'update', 'delete' or 'upsert')
+        """
+        self.write_hooks.append(hook)
+
+    def remove_write_hook(self, hook):
+        """Unregister a callable added with add_write_hook
+
+        :param hook: previously registered callable
+        """
+        self.write_hooks.remove(hook)
+
+    def _notify_write(self, table, operation):
+        """Call every registered write hook"""
+        for hook in self.write_hooks:
+            hook(table, operation)
+
+    def audit_salary_read(self, resource_id=None, **details):
+        """Record a read of Employees.salary with the configured audit callable, if any
+
+        :param resource_id: employee_id of the read row, None when several rows were read
+        :param details: context of the read, e.g. the where condition
+        """
+        if self.audit is not None:
+            self.audit(self.user, 'read', 'Employees.salary', resource_id=resource_id, details=details or None)
+
+    @measured
     def select(self, table, condition, value):
         """Select all from table where condition = value
 
@@ -30,10 +110,45 @@ class Database:
             raise ValueError('Wrong condition')
         if table not in valid_table:
             raise ValueError('Wrong condition')
-        self.cursor.execute(f"""SELECT * FROM {table} WHERE {condition} = ?""", (value,))
+        if table == 'Employees':
+            self.audit_salary_read(value if condition == 'employee_id' else None, condition=condition, value=value)
+        return self._fetch(f"""SELECT * FROM {table} WHERE {condition} = ?""", (value,), (table,))
+
+    @measured
+    def select_query(self, query, params=(), tables=()):
+        """Run a read-only query, served from the cache when one is configured and tables are given
+
+        :param query: SELECT statement with ? placeholders
+        :param params: values for the placeholders
+        :param tables: tables read by the query, their writes invalidate the cached result; without them the
+            query always reads SQLite
+        :return: select results, a query over Employees reading salary (or *) is audited
+        """
+        if not query.lstrip().upper().startswith(('SELECT', 'WITH')):
+            raise ValueError('Only SELECT queries are allowed')
+        if any(table not in valid_table for table in tables):
+            raise ValueError('Wrong condition')
+        lowered = query.lower()
+        if 'employees' in lowered and ('salary' in lowered or '*' in lowered):
+            self.audit_salary_read(query=' '.join(query.split()))
+        return self._fetch(query, params, tables)
+
+    def _fetch(self, query, params, tables):
+        """Execute a select, reading through the cache when one is configured"""
+        cache = self.cache if tables else None
+        if cache is not None:
+            result = cache.get(query, params, tables)
+            if result is not None:
+                return result
+            # taken before the query runs, so a write committed meanwhile leaves the result stale
+            versions = cache.table_versions(tables)
+        self.cursor.execute(query, params)
         result = self.cursor.fetchall()
-        return print(result)
+        if cache is not None:
+            cache.put(query, params, tables, result, versions)
+        return result
 
+    @measured
     def update(self, table, set_condition, where_condition, set_value, where_value):
         """
 
@@ -50,7 +165,9 @@ class Database:
         self.cursor.execute(f"""UPDATE {table} SET {set_condition} = ? WHERE {where_condition} = ?""", (set_value,
                                                                                                         where_value))
         self.connection.commit()
+        self._notify_write(table, 'update')
 
+    @measured
     def delete(self, table, condition, value):
         """
 
@@ -64,7 +181,85 @@ class Database:
             raise ValueError('Wrong condition')
         self.cursor.execute(f"""DELETE FROM {table} WHERE {condition} = ?""", (value,))
         self.connection.commit()
+        self._notify_write(table, 'delete')
+
+    @measured
+    def upsert(self, table, rows, key='employee_id', batch_size=upsert_batch_size):
+        """Insert new rows and update existing ones, matched by a unique column
 
+        Each batch looks up which of its keys already exist, in the same transaction as the writes. Existing rows
+        are sent as plain UPDATEs of the supplied columns only, so they may carry just the changed columns (e.g. a
+        row of update_employee.xlsx); new rows are INSERTed and must carry all NOT NULL columns.
+
+        :param table: table name
+        :param rows: iterable of dicts mapping column names to values, each dict must contain the key column
+        :param key: unique column name used to match existing rows, e.g. employee_id or email
+        :param batch_size: number of rows written in a single transaction
+        :return: dict with number of inserted and updated rows, an existing row given only by its key is neither
+        """
+        if table not in valid_table:
+            raise ValueError('Wrong condition')
+        if key not in valid_column:
+            raise ValueError('Wrong condition')
+        if batch_size < 1:
+            raise ValueError('Wrong batch size')
+        counts = {'inserted': 0, 'updated': 0}
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                self._upsert_batch(table, batch, key, counts)
+                batch = []
+        if batch:
+            self._upsert_batch(table, batch, key, counts)
+        return counts
+
+    def _upsert_batch(self, table, batch, key, counts):
+        """Write one batch of upsert rows in a single transaction, rolled back when any row fails, and add its
+        results to counts"""
+        for row in batch:
+            if key not in row:
+                raise ValueError('Missing key column')
+            if any(column not in valid_column for column in row):
+                raise ValueError('Wrong condition')
+
+        keys = [row[key] for row in batch]
+        inserted = updated = 0
+        statement, values = None, []
+        with self.connection:
+            if not self.connection.in_transaction:
+                # the lookup belongs to the transaction, so no other connection adds a key before the writes
+                self.cursor.execute('BEGIN')
+            self.cursor.execute(f"""SELECT {key} FROM {table} WHERE {key} IN ({', '.join('?' * len(keys))})""", keys)
+            existing = {found for found, in self.cursor.fetchall()}
+            for row in batch:
+                columns = [column for column in row if column != key]
+                if row[key] in existing:
+                    if not columns:
+                        continue
+                    updated += 1
+                    assignments = ', '.join(f'{column} = ?' for column in columns)
+                    query = f"""UPDATE {table} SET {assignments} WHERE {key} = ?"""
+                    params = tuple(row[column] for column in columns) + (row[key],)
+                else:
+                    inserted += 1
+                    # a key repeated later in the batch is an update of this row
+                    existing.add(row[key])
+                    query = f"""INSERT INTO {table} ({', '.join((key, *columns))})
+                                VALUES ({', '.join('?' * (len(columns) + 1))})"""
+                    params = (row[key],) + tuple(row[column] for column in columns)
+                if query != statement:
+                    if values:
+                        self.cursor.executemany(statement, values)
+                    statement, values = query, []
+                values.append(params)
+            if values:
+                self.cursor.executemany(statement, values)
+        self._notify_write(table, 'upsert')
+        counts['inserted'] += inserted
+        counts['updated'] += updated
+
+    @measured
     def insert_one_employee(self, employee_id, first_name, last_name, avatar_url, job_title, joined_on,
                             email, phone_number, birthday, country, city, project_id, last_role, role_preferred,
                             salary, specification):
@@ -91,7 +286,9 @@ class Database:
                             (employee_id, first_name, last_name, avatar_url, job_title, joined_on, email, phone_number,
                              birthday, country, city, project_id, last_role, role_preferred, salary, specification,))
         self.connection.commit()
+        self._notify_write('Employees', 'insert')
 
+    @measured
     def insert_many_employees(self, emp_data):
         """Insert many positions into Employees table
 
@@ -102,7 +299,9 @@ class Database:
             self.cursor.execute("""INSERT INTO Employees VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                                 x)
         self.cursor.execute('COMMIT')
+        self._notify_write('Employees', 'insert')
 
+    @measured
     def insert_one_client(self, client_id, client_name, city, country, business):
         """Insert one position into Clients table
 
@@ -115,7 +314,9 @@ class Database:
         self.cursor.execute("""INSERT INTO Clients VALUES (?, ?, ?, ?, ?)""", (client_id, client_name, city, country,
                                                                                business))
         self.connection.commit()
+        self._notify_write('Clients', 'insert')
 
+    @measured
     def insert_many_clients(self, client_data):
         """Insert many positions into Clients table
 
@@ -125,7 +326,9 @@ class Database:
         for x in client_data:
             self.cursor.execute("""INSERT INTO Clients VALUES (?, ?, ?, ?, ?)""", x)
         self.cursor.execute('COMMIT')
+        self._notify_write('Clients', 'insert')
 
+    @measured
     def insert_one_project(self, project_id, project_name, client_id, started_on, deadline_on, budget):
         """Insert one position into Projects table
 
@@ -139,7 +342,9 @@ class Database:
         self.cursor.execute("""INSERT INTO Projects VALUES (?, ?, ?, ?, ?, ?)""", (project_id, project_name, client_id,
                                                                                    started_on, deadline_on, budget))
         self.connection.commit()
+        self._notify_write('Projects', 'insert')
 
+    @measured
     def insert_many_project(self, project_data):
         """Insert many positions into Projects table
 
@@ -149,7 +354,9 @@ class Database:
         for x in project_data:
             self.cursor.execute("""INSERT INTO Projects VALUES (?, ?, ?, ?, ?, ?)""", x)
         self.cursor.execute('COMMIT')
+        self._notify_write('Projects', 'insert')
 
+    @measured
     def insert_one_skill(self, skill_id, skill_name, experience):
         """Insert one position into Skills table
 
@@ -159,7 +366,9 @@ class Database:
         """
         self.cursor.execute("""INSERT INTO Skills VALUES (?, ?, ?)""", (skill_id, skill_name, experience))
         self.connection.commit()
+        self._notify_write('Skills', 'insert')
 
+    @measured
     def insert_many_skill(self, skill_data):
         """Insert many positions into Skills table
 
@@ -169,7 +378,9 @@ class Database:
         for x in skill_data:
             self.cursor.execute("""INSERT INTO Skills VALUES (?, ?, ?)""", x)
         self.cursor.execute('COMMIT')
+        self._notify_write('Skills', 'insert')
 
+    @measured
     def insert_one_role(self, role_id, role_name):
         """Insert one position into Roles table
 
@@ -178,7 +389,9 @@ class Database:
         """
         self.cursor.execute("""INSERT INTO Roles VALUES (?, ?)""", (role_id, role_name))
         self.connection.commit()
+        self._notify_write('Roles', 'insert')
 
+    @measured
     def insert_many_role(self, role_data):
         """Insert many positions into Roles table
 
@@ -188,7 +401,9 @@ class Database:
         for x in role_data:
             self.cursor.execute("""INSERT INTO Roles VALUES (?, ?)""", x)
         self.cursor.execute('COMMIT')
+        self._notify_write('Roles', 'insert')
 
+    @measured
     def insert_one_relation(self, employee_id, skill_id):
         """Insert one position into EmployeesSkillsRelations table
 
@@ -197,7 +412,9 @@ class Database:
         """
         self.cursor.execute("""INSERT INTO EmployeesSkillsRelations VALUES (?, ?)""", (employee_id, skill_id))
         self.connection.commit()
+        self._notify_write('EmployeesSkillsRelations', 'insert')
 
+    @measured
     def insert_many_relation(self, rel_data):
         """Insert many positions into EmployeesSkillsRelations table
 
@@ -207,7 +424,9 @@ class Database:
         for x in rel_data:
             self.cursor.execute("""INSERT INTO EmployeesSkillsRelations VALUES (?, ?)""", x)
         self.cursor.execute('COMMIT')
+        self._notify_write('EmployeesSkillsRelations', 'insert')
 
+    @measured
     def select_all(self, table):
         """Select all from table
 
@@ -217,6 +436,6 @@ class Database:
 
         if table not in valid_table:
             raise ValueError('Wrong condition')
-        self.cursor.execute(f"""SELECT * FROM {table}""")
-        result = self.cursor.fetchall()
-        return print(result)
+        if table == 'Employees':
+            self.audit_salary_read()
+        return self._fetch(f"""SELECT * FROM {table}""", (), (table,))
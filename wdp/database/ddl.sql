@@ -1,12 +1,12 @@
 --Creating databse
-CREATE DATABASE wdp_database
+CREATE DATABASE wdp_database;
 
 --Creating Roles table
 CREATE TABLE Roles(
 	role_id INTEGER AUTO_INCREMENT,
 	role_name VARCHAR(250),
 	PRIMARY KEY (role_id)
-)
+);
 
 --Creating Skills table
 CREATE TABLE Skills(
@@ -14,7 +14,7 @@ CREATE TABLE Skills(
 	skill_name VARCHAR(250),
 	experience INTEGER,
 	PRIMARY KEY (skill_id)
-)
+);
 
 --Creating Clients table
 CREATE TABLE Clients(
@@ -24,7 +24,7 @@ CREATE TABLE Clients(
 	country VARCHAR(50),
 	business VARCHAR(250),
 	PRIMARY KEY (client_id)
-)
+);
 
 --Creating Projects table 
 CREATE TABLE Projects(
@@ -36,7 +36,7 @@ CREATE TABLE Projects(
 	budget INTEGER,
 	PRIMARY KEY (project_id),
 	FOREIGN KEY (client_id) REFERENCES Clients(client_id)
-)
+);
 
 --Creating Employees table
 CREATE TABLE Employees(
@@ -61,7 +61,7 @@ CREATE TABLE Employees(
 	FOREIGN KEY (project_id) REFERENCES Projects(project_id),
 	FOREIGN KEY (last_role) REFERENCES Roles(role_id),
 	FOREIGN KEY (role_preferred) REFERENCES Roles(role_id)
-)
+);
 
 
 --Creating relation table for many-to-many relation between Employees and Skills
@@ -70,7 +70,4 @@ CREATE TABLE EmployeesSkillsRelations(
 	skill_id INTEGER,
 	FOREIGN KEY (employee_id) REFERENCES Employees(employee_id),
 	FOREIGN KEY (skill_id) REFERENCES Skills(skill_id)
-)
-"INSERT INTO Employees VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (employee_id, first_name, last_name, avatar_url, job_title, joined_on, email, phone_number,
-                             birthday, country, city, project_id, last_role, role_preferred, salary, specification)
\ No newline at end of file
+);
@@ -0,0 +1,141 @@
+"""
+Read-through cache for connector_wdp.Database select calls.
+
+Results are keyed by the exact query text and its parameters (a sequence, or a mapping for named placeholders).
+Every cached entry remembers the version of each table it read, taken before the query ran; the Database bumps a
+table's version after every committed write to it (through its write hooks), which makes all entries that depend on
+the table stale, also results of a query that ran while the write was made. Entries are evicted in LRU order once either the
+entry limit or the approximate memory limit is exceeded.
+
+Usage:
+    import connector_wdp
+    from query_cache import QueryCache
+
+    db = connector_wdp.Database(cache=QueryCache(max_entries=2048, max_bytes=32 * 1024 * 1024))
+    db.select_all('Roles')                  # read from SQLite
+    db.select_all('Roles')                  # served from the cache
+    db.insert_one_role(18, 'Data Steward')  # bumps the Roles version, next select_all reads SQLite again
+    db.select_query('SELECT city, COUNT(*) FROM Employees GROUP BY city', tables=('Employees',))
+
+Only writes made through the same Database object are seen; writes from other connections or processes are not.
+Queries over the summary tables of aggregates.py should list 'Employees' in tables, as their triggers update them.
+select_query calls without tables are never cached, as no write could invalidate them.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+default_max_entries = 1024
+default_max_bytes = 64 * 1024 * 1024
+
+
+def cache_key(query, params):
+    """Hashable key of a query and its parameters, named parameters match in any order"""
+    if isinstance(params, Mapping):
+        return query, tuple(sorted(params.items()))
+    return query, tuple(params)
+
+
+def estimate_size(rows):
+    """Approximate memory taken by a list of result rows, in bytes"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    def __init__(self, max_entries=default_max_entries, max_bytes=default_max_bytes):
+        """create an empty cache
+
+        :param max_entries: maximum number of cached results
+        :param max_bytes: approximate memory limit of all cached results
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.versions = {}
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def bump(self, table, operation=None):
+        """Invalidate results that read the table, signature matches Database write hooks
+
+        :param table: table name
+        :param operation: write operation, ignored
+        """
+        with self._lock:
+            self.versions[table] = self.versions.get(table, 0) + 1
+
+    def table_versions(self, tables):
+        """Current versions of the tables, to be taken before the query runs and passed to put
+
+        :param tables: table names
+        :return: tuple of versions in the order of the tables
+        """
+        with self._lock:
+            return tuple(self.versions.get(table, 0) for table in tables)
+
+    def get(self, query, params, tables):
+        """Cached rows of the query or None when missing or stale
+
+        :param query: SQL query
+        :param params: query parameters
+        :param tables: tables read by the query
+        :return: list of rows or None
+        """
+        key = cache_key(query, params)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                versions, rows, size = entry
+                if versions == tuple(self.versions.get(table, 0) for table in tables):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return list(rows)
+                del self.entries[key]
+                self.size -= size
+            self.misses += 1
+            return None
+
+    def put(self, query, params, tables, rows, versions=None):
+        """Store query results tagged with the versions of the tables
+
+        :param query: SQL query
+        :param params: query parameters
+        :param tables: tables read by the query
+        :param rows: list of result rows
+        :param versions: table_versions(tables) taken before the query ran, the current versions by default; a write
+            committed while the query ran makes the stored entry stale right away
+        """
+        key = cache_key(query, params)
+        if versions is None:
+            versions = self.table_versions(tables)
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[key] = (tuple(versions), tuple(rows), size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Counters describing the cache usage
+
+        :return: dict with entries, bytes, hits and misses
+        """
+        return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,170 @@
+"""
+In-memory lookup structures for the many-to-many relation between Employees and Skills.
+
+The index keeps, for every skill, a bitmap of employees who have it (a Python int in which bit N stands for
+the N-th known employee) and, for every employee, the set of their skill ids. Questions such as "which employees
+know Python at level 3 or higher" are answered with a few bitwise operations instead of a three-table join.
+
+Usage:
+    import connector_wdp
+    from skill_index import SkillIndex
+
+    db = connector_wdp.Database()
+    index = SkillIndex(db)
+
+    index.employees_with_skill('Python', min_experience=3)     # -> [1, 2]
+    index.employees_with_skills({'Python': 3, 'SQL': 4})       # -> employees that know both
+    index.skills_of(7)                                         # -> [('Java', 4), ('Python', 1)]
+
+The index registers itself as a write hook of the given Database. Relations inserted through the connector
+are picked up incrementally (only rows added since the last refresh are read); updates or deletes of
+relations, skills or employees mark the index stale and it is rebuilt on the next query.
+"""
+
+
+class SkillIndex:
+    def __init__(self, database):
+        """build the index from the database and start listening for its writes
+
+        :param database: connector_wdp.Database instance
+        """
+        self.database = database
+        self.skills = {}
+        self.skill_ids_by_name = {}
+        self.employee_skills = {}
+        self.skill_bitmaps = {}
+        self.employee_ids = []
+        self.positions = {}
+        self._last_skill_rowid = 0
+        self._last_relation_rowid = 0
+        self._stale = False
+        self.rebuild()
+        database.add_write_hook(self.on_write)
+
+    def close(self):
+        """stop listening for database writes"""
+        self.database.remove_write_hook(self.on_write)
+
+    def on_write(self, table, operation):
+        """write hook registered in the Database
+
+        :param table: table name
+        :param operation: 'insert', 'update', 'delete' or 'upsert'
+        """
+        if table not in ('Skills', 'EmployeesSkillsRelations', 'Employees'):
+            return
+        if operation == 'insert':
+            if table != 'Employees' and not self._stale:
+                self.refresh()
+        elif table != 'Employees' or operation == 'delete':
+            self._stale = True
+
+    def rebuild(self):
+        """drop everything and read all skills and relations again"""
+        self.skills = {}
+        self.skill_ids_by_name = {}
+        self.employee_skills = {}
+        self.skill_bitmaps = {}
+        self.employee_ids = []
+        self.positions = {}
+        self._last_skill_rowid = 0
+        self._last_relation_rowid = 0
+        self._stale = False
+        self.refresh()
+
+    def refresh(self):
+        """read skills and relations added since the last refresh"""
+        cursor = self.database.connection.cursor()
+        cursor.execute("""SELECT rowid, skill_id, skill_name, experience FROM Skills WHERE rowid > ? ORDER BY rowid""",
+                       (self._last_skill_rowid,))
+        for rowid, skill_id, skill_name, experience in cursor:
+            self._add_skill(skill_id, skill_name, experience)
+            self._last_skill_rowid = rowid
+        cursor.execute("""SELECT rowid, employee_id, skill_id FROM EmployeesSkillsRelations WHERE rowid > ?
+                          ORDER BY rowid""", (self._last_relation_rowid,))
+        for rowid, employee_id, skill_id in cursor:
+            self._add_relation(employee_id, skill_id)
+            self._last_relation_rowid = rowid
+        cursor.close()
+
+    def _add_skill(self, skill_id, skill_name, experience):
+        self.skills[skill_id] = (skill_name, experience)
+        levels = self.skill_ids_by_name.setdefault(skill_name, [])
+        levels.append((experience or 0, skill_id))
+        levels.sort()
+
+    def _add_relation(self, employee_id, skill_id):
+        position = self.positions.get(employee_id)
+        if position is None:
+            position = self.positions[employee_id] = len(self.employee_ids)
+            self.employee_ids.append(employee_id)
+        self.skill_bitmaps[skill_id] = self.skill_bitmaps.get(skill_id, 0) | (1 << position)
+        self.employee_skills.setdefault(employee_id, set()).add(skill_id)
+
+    def _ensure_fresh(self):
+        if self._stale:
+            self.rebuild()
+
+    def _skill_bitmap(self, skill_name, min_experience):
+        bitmap = 0
+        for experience, skill_id in self.skill_ids_by_name.get(skill_name, ()):
+            if experience >= min_experience:
+                bitmap |= self.skill_bitmaps.get(skill_id, 0)
+        return bitmap
+
+    def _decode(self, bitmap):
+        employee_ids = []
+        while bitmap:
+            lowest = bitmap & -bitmap
+            employee_ids.append(self.employee_ids[lowest.bit_length() - 1])
+            bitmap ^= lowest
+        return sorted(employee_ids)
+
+    def employees_with_skill(self, skill_name, min_experience=0):
+        """Employees that have a skill at the given level or higher
+
+        :param skill_name: skill name, e.g. 'Python'
+        :param min_experience: lowest accepted experience level
+        :return: sorted list of employee ids
+        """
+        self._ensure_fresh()
+        return self._decode(self._skill_bitmap(skill_name, min_experience))
+
+    def employees_with_skills(self, requirements, match_all=True):
+        """Employees that satisfy all (or any) of the skill requirements
+
+        :param requirements: dict mapping skill name to the lowest accepted experience level
+        :param match_all: True to require every skill, False to accept any of them
+        :return: sorted list of employee ids
+        """
+        self._ensure_fresh()
+        result = None
+        for skill_name, min_experience in requirements.items():
+            bitmap = self._skill_bitmap(skill_name, min_experience)
+            if result is None:
+                result = bitmap
+            elif match_all:
+                result &= bitmap
+            else:
+                result |= bitmap
+        return self._decode(result or 0)
+
+    def count_employees_with_skill(self, skill_name, min_experience=0):
+        """Number of employees that have a skill at the given level or higher
+
+        :param skill_name: skill name
+        :param min_experience: lowest accepted experience level
+        :return: number of employees
+        """
+        self._ensure_fresh()
+        return self._skill_bitmap(skill_name, min_experience).bit_count()
+
+    def skills_of(self, employee_id):
+        """Skills of one employee
+
+        :param employee_id: employee id
+        :return: sorted list of (skill_name, experience) tuples
+        """
+        self._ensure_fresh()
+        return sorted(self.skills[skill_id] for skill_id in self.employee_skills.get(employee_id, ())
+                      if skill_id in self.skills)
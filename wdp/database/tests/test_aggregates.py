@@ -0,0 +1,84 @@
+import unittest
+import math
+import pathlib
+import random
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import aggregates
+import connector_wdp
+from benchmark import populate
+
+
+class TestAggregates(unittest.TestCase):
+    # the summaries kept by the triggers are checked against GROUP BY queries over Employees
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = connector_wdp.Database(str(pathlib.Path(self.tmp_dir.name) / 'test_aggregates.db'))
+        self.db.create_schema()
+        populate(self.db, 200, random.Random(0))
+        aggregates.install_aggregates(self.db)
+
+    def expected(self, dimension):
+        _, keys = aggregates.dimensions[dimension]
+        self.db.cursor.execute(f"""SELECT {', '.join(keys)}, salary FROM Employees
+                                   WHERE {' AND '.join(f'{key} IS NOT NULL' for key in keys)}""")
+        groups = {}
+        for row in self.db.cursor.fetchall():
+            groups.setdefault(row[:-1], []).append(row[-1])
+        return {group: (len(salaries), sum(salaries) / len(salaries), min(salaries), max(salaries),
+                        math.sqrt(sum(s * s for s in salaries) / len(salaries) - (sum(salaries) / len(salaries)) ** 2))
+                for group, salaries in groups.items()}
+
+    def assertSummariesCurrent(self):
+        for dimension, (_, keys) in aggregates.dimensions.items():
+            summary = {tuple(entry[key] for key in keys): (entry['headcount'], entry['salary_avg'], entry['salary_min'],
+                                                            entry['salary_max'], entry['salary_std'])
+                       for entry in aggregates.salary_summary(self.db, dimension)}
+            expected = self.expected(dimension)
+            self.assertEqual(summary.keys(), expected.keys(), dimension)
+            for group, values in expected.items():
+                headcount, average, low, high, std = summary[group]
+                self.assertEqual((headcount, low, high), (values[0], values[2], values[3]), (dimension, group))
+                self.assertAlmostEqual(average, values[1], places=6)
+                self.assertAlmostEqual(std, values[4], places=3)
+
+    def test_initial_fill(self):
+        self.assertSummariesCurrent()
+
+    def test_writes_keep_summaries_current(self):
+        self.db.update('Employees', 'salary', 'employee_id', 50_000, 3)
+        self.db.update('Employees', 'city', 'employee_id', 'Gdansk', 4)
+        self.db.update('Employees', 'salary', 'employee_id', 1, 5)
+        self.db.delete('EmployeesSkillsRelations', 'employee_id', 6)
+        self.db.delete('Employees', 'employee_id', 6)
+
+        self.assertSummariesCurrent()
+
+    def test_extremes_are_recomputed_on_delete(self):
+        self.db.cursor.execute("""SELECT employee_id FROM Employees ORDER BY salary DESC LIMIT 1""")
+        employee_id, = self.db.cursor.fetchone()
+        self.db.delete('EmployeesSkillsRelations', 'employee_id', employee_id)
+        self.db.delete('Employees', 'employee_id', employee_id)
+
+        self.assertSummariesCurrent()
+
+    def test_rebuild(self):
+        self.db.cursor.execute("""UPDATE SummaryByRole SET headcount = 0""")
+        self.db.connection.commit()
+        aggregates.rebuild_aggregates(self.db, 'role')
+
+        self.assertSummariesCurrent()
+
+    def test_wrong_dimension(self):
+        with self.assertRaises(ValueError):
+            aggregates.salary_summary(self.db, 'salary')
+
+    def tearDown(self):
+        self.db.connection.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import aggregates
+import connector_wdp
+from test_upsert import employee
+
+
+class TestSalaryAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.events = []
+        self.db = connector_wdp.Database(str(pathlib.Path(self.tmp_dir.name) / 'test_audit.db'),
+                                         audit=self.record, user='jsmith')
+        self.db.create_schema()
+        self.db.insert_one_role(1, 'Data Engineer')
+        self.db.upsert('Employees', [employee(1), employee(2)])
+
+    def record(self, user, action, resource, resource_id=None, details=None):
+        self.events.append((user, action, resource, resource_id, details))
+
+    def test_employee_reads_are_audited(self):
+        self.db.select('Employees', 'employee_id', 2)
+        self.db.select('Employees', 'city', 'Warsaw')
+        self.db.select_all('Employees')
+
+        self.assertEqual(self.events, [
+            ('jsmith', 'read', 'Employees.salary', 2, {'condition': 'employee_id', 'value': 2}),
+            ('jsmith', 'read', 'Employees.salary', None, {'condition': 'city', 'value': 'Warsaw'}),
+            ('jsmith', 'read', 'Employees.salary', None, None),
+        ])
+
+    def test_salary_queries_are_audited(self):
+        self.db.select_query('SELECT AVG(salary) FROM Employees', tables=('Employees',))
+        self.db.select_query('SELECT first_name FROM Employees')
+        aggregates.install_aggregates(self.db)
+        aggregates.salary_summary(self.db, 'country')
+
+        self.assertEqual(self.events, [
+            ('jsmith', 'read', 'Employees.salary', None, {'query': 'SELECT AVG(salary) FROM Employees'}),
+            ('jsmith', 'read', 'Employees.salary', None, {'summary': 'country'}),
+        ])
+
+    def test_other_tables_are_not_audited(self):
+        self.db.select_all('Roles')
+        self.db.select('Roles', 'role_id', 1)
+
+        self.assertEqual(self.events, [])
+
+    def tearDown(self):
+        self.db.connection.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
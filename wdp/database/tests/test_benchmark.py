@@ -0,0 +1,31 @@
+import unittest
+import pathlib
+import random
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import connector_wdp
+from benchmark import percentile, populate, run_workload
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 11))
+
+        self.assertEqual(percentile(values, 0.5), 5)
+        self.assertEqual(percentile(values, 0.25), 3)
+        self.assertEqual(percentile(values, 0.99), 10)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_workload(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = connector_wdp.Database(str(pathlib.Path(tmp_dir) / 'test_benchmark.db'))
+            db.create_schema()
+            rng = random.Random(1)
+            populate(db, 200, rng)
+            latencies = run_workload(db, 200, 100, rng)
+            db.connection.close()
+
+        self.assertEqual(sum(len(values) for values in latencies.values()), 100)
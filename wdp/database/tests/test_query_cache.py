@@ -0,0 +1,86 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import connector_wdp
+from query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = QueryCache()
+        self.db = connector_wdp.Database(str(pathlib.Path(self.tmp_dir.name) / 'test_wdp.db'), cache=self.cache)
+        self.db.create_schema()
+        self.db.insert_one_role(1, 'Developer')
+
+    def test_repeated_select_is_served_from_cache(self):
+        self.assertEqual(self.db.select_all('Roles'), [(1, 'Developer')])
+        self.assertEqual(self.db.select_all('Roles'), [(1, 'Developer')])
+
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_write_invalidates_cached_results(self):
+        self.db.select_all('Roles')
+        self.db.insert_one_role(2, 'Tester')
+
+        self.assertEqual(self.db.select_all('Roles'), [(1, 'Developer'), (2, 'Tester')])
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    def test_query_without_tables_is_not_cached(self):
+        query = 'SELECT role_name FROM Roles'
+        self.db.select_query(query)
+        self.db.insert_one_role(2, 'Tester')
+
+        self.assertEqual(self.db.select_query(query), [('Developer',), ('Tester',)])
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_queries_differing_in_literals_are_cached_apart(self):
+        self.db.insert_one_role(2, 'Data  Engineer')
+        one_space = self.db.select_query("SELECT role_id FROM Roles WHERE role_name = 'Data Engineer'",
+                                         tables=('Roles',))
+        two_spaces = self.db.select_query("SELECT role_id FROM Roles WHERE role_name = 'Data  Engineer'",
+                                          tables=('Roles',))
+
+        self.assertEqual(one_space, [])
+        self.assertEqual(two_spaces, [(2,)])
+
+    def test_named_parameters(self):
+        self.db.insert_one_role(2, 'Tester')
+        query = 'SELECT role_name FROM Roles WHERE role_id >= :low AND role_id <= :high'
+        self.assertEqual(self.db.select_query(query, {'low': 1, 'high': 1}, tables=('Roles',)), [('Developer',)])
+        self.assertEqual(self.db.select_query(query, {'high': 1, 'low': 1}, tables=('Roles',)), [('Developer',)])
+        self.assertEqual(self.db.select_query(query, {'low': 2, 'high': 2}, tables=('Roles',)), [('Tester',)])
+
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+    def test_write_during_query_leaves_result_stale(self):
+        query = 'SELECT * FROM Roles'
+        versions = self.cache.table_versions(('Roles',))
+        rows = self.db.select_query(query)
+        # committed after the query read the table, before its result is stored
+        self.cache.bump('Roles')
+        self.cache.put(query, (), ('Roles',), rows, versions)
+
+        self.assertIsNone(self.cache.get(query, (), ('Roles',)))
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_entries=2)
+        for table in ('Roles', 'Skills', 'Clients'):
+            cache.put(f'SELECT * FROM {table}', (), (table,), [])
+        cache.get('SELECT * FROM Roles', (), ('Roles',))
+
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def tearDown(self):
+        self.db.connection.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import pathlib
+import random
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import connector_wdp
+from benchmark import populate, skill_join_query
+from skill_index import SkillIndex
+
+
+class TestSkillIndex(unittest.TestCase):
+    # every answer of the index is checked against the join it replaces
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = connector_wdp.Database(str(pathlib.Path(self.tmp_dir.name) / 'test_skill_index.db'))
+        self.db.create_schema()
+        populate(self.db, 100, random.Random(0))
+        self.index = SkillIndex(self.db)
+
+    def joined(self, skill_name, min_experience):
+        self.db.cursor.execute(skill_join_query, (skill_name, min_experience))
+        return sorted({employee_id for employee_id, _, _ in self.db.cursor.fetchall()})
+
+    def test_employees_with_skill(self):
+        for skill_name in ('Python', 'SQL', 'Rust'):
+            for min_experience in (1, 3, 5):
+                self.assertEqual(self.index.employees_with_skill(skill_name, min_experience),
+                                 self.joined(skill_name, min_experience))
+                self.assertEqual(self.index.count_employees_with_skill(skill_name, min_experience),
+                                 len(self.joined(skill_name, min_experience)))
+
+    def test_employees_with_skills(self):
+        python, sql = set(self.joined('Python', 2)), set(self.joined('SQL', 3))
+
+        self.assertEqual(self.index.employees_with_skills({'Python': 2, 'SQL': 3}), sorted(python & sql))
+        self.assertEqual(self.index.employees_with_skills({'Python': 2, 'SQL': 3}, match_all=False),
+                         sorted(python | sql))
+
+    def test_skills_of(self):
+        self.db.cursor.execute("""SELECT s.skill_name, s.experience FROM EmployeesSkillsRelations r
+                                  JOIN Skills s ON s.skill_id = r.skill_id WHERE r.employee_id = 7""")
+
+        self.assertEqual(self.index.skills_of(7), sorted(self.db.cursor.fetchall()))
+
+    def test_inserted_relation_is_picked_up(self):
+        skill_id = next(skill_id for skill_id, (name, level) in self.index.skills.items()
+                        if (name, level) == ('Go', 5) and 7 not in self.index.employee_skills.get(skill_id, ()))
+        self.db.insert_one_relation(7, skill_id)
+
+        self.assertIn(7, self.index.employees_with_skill('Go', 5))
+        self.assertEqual(self.index.employees_with_skill('Go', 5), self.joined('Go', 5))
+
+    def test_deleted_relations_are_picked_up(self):
+        self.db.delete('EmployeesSkillsRelations', 'employee_id', 7)
+
+        self.assertEqual(self.index.skills_of(7), [])
+        self.assertEqual(self.index.employees_with_skill('Python'), self.joined('Python', 0))
+
+    def test_closed_index_stops_listening(self):
+        self.index.close()
+
+        self.assertNotIn(self.index.on_write, self.db.write_hooks)
+
+    def tearDown(self):
+        if self.index.on_write in self.db.write_hooks:
+            self.index.close()
+        self.db.connection.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
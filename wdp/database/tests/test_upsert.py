@@ -0,0 +1,79 @@
+import unittest
+import pathlib
+import sqlite3
+import sys
+import tempfile
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+import connector_wdp
+
+
+def employee(employee_id, **changes):
+    row = {'employee_id': employee_id, 'first_name': f'First{employee_id}', 'last_name': f'Last{employee_id}',
+           'avatar_url': f'www.avatar{employee_id}.com', 'job_title': 'Data Engineer', 'joined_on': '2020-01-01',
+           'email': f'employee{employee_id}@email.com', 'phone_number': f'+{employee_id:011}',
+           'birthday': '1990-01-01', 'country': 'Poland', 'city': 'Warsaw', 'project_id': None, 'last_role': 1,
+           'role_preferred': 1, 'salary': 10000, 'specification': 'Python'}
+    row.update(changes)
+    return row
+
+
+class TestUpsert(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db = connector_wdp.Database(str(pathlib.Path(self.tmp_dir.name) / 'test_upsert.db'))
+        self.db.create_schema()
+        self.db.insert_one_role(1, 'Data Engineer')
+        self.db.upsert('Employees', [employee(1), employee(2)])
+
+    def test_inserts_and_updates(self):
+        counts = self.db.upsert('Employees', [employee(2, salary=12000), employee(3), employee(4)], batch_size=2)
+
+        self.assertEqual(counts, {'inserted': 2, 'updated': 1})
+        self.assertEqual(self.db.select('Employees', 'employee_id', 2)[0][14], 12000)
+        self.assertEqual(len(self.db.select_all('Employees')), 4)
+
+    def test_match_by_email(self):
+        counts = self.db.upsert('Employees', [employee(1, salary=15000)], key='email')
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 1})
+        self.assertEqual(self.db.select('Employees', 'email', 'employee1@email.com')[0][14], 15000)
+
+    def test_partial_row_updates_supplied_columns(self):
+        counts = self.db.upsert('Employees', [{'employee_id': 1, 'city': 'Wroclaw', 'job_title': 'DS'},
+                                              {'employee_id': 2}, employee(3)])
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1})
+        updated = self.db.select('Employees', 'employee_id', 1)[0]
+        self.assertEqual((updated[4], updated[10], updated[14]), ('DS', 'Wroclaw', 10000))
+        self.assertEqual(self.db.select('Employees', 'employee_id', 2)[0], tuple(employee(2).values()))
+
+    def test_repeated_key_in_batch(self):
+        counts = self.db.upsert('Employees', [employee(3), {'employee_id': 3, 'salary': 11000}])
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1})
+        self.assertEqual(self.db.select('Employees', 'employee_id', 3)[0][14], 11000)
+
+    def test_failing_batch_is_rolled_back(self):
+        rows = [employee(2, salary=12000), employee(3), employee(4, role_preferred=None)]
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.upsert('Employees', rows)
+
+        self.assertEqual(self.db.select('Employees', 'employee_id', 2)[0][14], 10000)
+        self.assertEqual(self.db.select('Employees', 'employee_id', 3), [])
+        # the connection is usable again
+        self.assertEqual(self.db.upsert('Employees', [employee(3)]), {'inserted': 1, 'updated': 0})
+
+    def test_wrong_column(self):
+        with self.assertRaises(ValueError):
+            self.db.upsert('Employees', [{'employee_id': 5, 'password': 'secret'}])
+        with self.assertRaises(ValueError):
+            self.db.upsert('Employees', [{'first_name': 'No key'}])
+
+    def tearDown(self):
+        self.db.connection.close()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()